@@ -0,0 +1,105 @@
+import atexit
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import auth
+from django.core.cache import cache
+from django.utils import timezone
+
+from background import run_in_background
+
+'''
+Last-seen tracking. Authenticated requests only update an in-process
+buffer and a short-lived cache entry (used for the "active now" flag);
+the buffered timestamps are written to `User.last_login` in a single
+bulk UPDATE at most once every FLUSH_INTERVAL seconds per process, so
+busy users no longer turn their row into a write hot spot. The flush runs
+on the background executor, never on the request that made it due.
+'''
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 60,
+    'RESOLUTION': 30,
+    'ACTIVE_WINDOW': 300,
+    'BATCH_SIZE': 500,
+}
+
+
+def _options():
+    return dict(DEFAULTS, **getattr(settings, 'USER_ACTIVITY', {}))
+
+
+def _cache_key(user_id):
+    return 'last-seen:{}'.format(user_id)
+
+
+class ActivityTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._recorded = {}
+        self._last_flush = time.monotonic()
+
+    def touch(self, user_id):
+        options = _options()
+        now = timezone.now()
+        with self._lock:
+            recorded = self._recorded.get(user_id)
+            if recorded is not None and (now - recorded).total_seconds() < options['RESOLUTION']:
+                return
+            self._recorded[user_id] = now
+            self._pending[user_id] = now
+            due = time.monotonic() - self._last_flush >= options['FLUSH_INTERVAL']
+            if due:
+                # Only the request that makes the flush due queues it.
+                self._last_flush = time.monotonic()
+        cache.set(_cache_key(user_id), now, options['ACTIVE_WINDOW'])
+        if due:
+            run_in_background(self.flush, key='user-activity-flush')
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._recorded = {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        User = auth.get_user_model()
+        users = [User(pk=user_id, last_login=seen) for user_id, seen in pending.items()]
+        User.objects.bulk_update(users, ['last_login'], batch_size=_options()['BATCH_SIZE'])
+        return len(users)
+
+
+tracker = ActivityTracker()
+atexit.register(tracker.flush)
+
+
+def record_activity(user):
+    tracker.touch(user.pk)
+
+
+def last_seen(user):
+    """ Most recent activity, including timestamps not yet flushed to the database. """
+    return cache.get(_cache_key(user.pk)) or user.last_login
+
+
+def activity_period():
+    """ Number of the current RESOLUTION-long period; "active now" flags only change between periods. """
+    return int(time.time() // _options()['RESOLUTION'])
+
+
+def is_active_now(user):
+    seen = cache.get(_cache_key(user.pk))
+    if seen is None:
+        return False
+    return timezone.now() - seen < timedelta(seconds=_options()['ACTIVE_WINDOW'])
+
+
+def active_user_ids(user_ids):
+    """ The ids among `user_ids` that are active now, looked up in one cache round trip. """
+    keys = {_cache_key(user_id): user_id for user_id in user_ids}
+    cutoff = timezone.now() - timedelta(seconds=_options()['ACTIVE_WINDOW'])
+    return {keys[key] for key, seen in cache.get_many(list(keys)).items() if seen > cutoff}
@@ -0,0 +1,88 @@
+import hashlib
+
+from django.core.cache import caches
+from django.utils import timezone
+from hmac import compare_digest
+
+from knox.auth import TokenAuthentication
+from knox.models import AuthToken
+from knox.settings import CONSTANTS, knox_settings
+
+from accounts.activity import record_activity
+
+TOKEN_CACHE_ALIAS = 'auth_tokens'
+
+
+def get_token_cache():
+    return caches[TOKEN_CACHE_ALIAS]
+
+
+def token_cache_key(token_key):
+    return 'knox:{}'.format(token_key)
+
+
+def evict_token(token_key):
+    """ Drops the cached verification result for a token, if any. """
+    get_token_cache().delete(token_cache_key(token_key))
+
+
+def _fingerprint(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    Knox token authentication backed by the `auth_tokens` cache.
+
+    A successful verification is remembered under the token's public
+    `token_key` together with a SHA-256 fingerprint of the full token and
+    the token row's primary key, so repeated calls skip knox's scan of the
+    token_key matches, the salted digest check and the separate user fetch:
+    a cache hit costs one primary-key query that joins the user. Reading
+    the row on every hit means a logout, an expiry or a deactivated user is
+    seen at once by every worker, even while `auth_tokens` is a per-process
+    cache; the `AuthToken`/`User` signals in `accounts.signals` only keep
+    the local entries tidy.
+
+    Every cache miss (at least once per cache TIMEOUT for an active token)
+    goes through knox's own lookup, which runs `_cleanup_token` and so
+    still deletes the user's expired tokens.
+    '''
+
+    def authenticate(self, request):
+        credentials = super().authenticate(request)
+        if credentials is not None:
+            record_activity(credentials[0])
+        return credentials
+
+    def authenticate_credentials(self, token):
+        # Refreshing the expiry has to write to the token row, so the cache
+        # only short-circuits the lookup for fixed-lifetime tokens.
+        if knox_settings.AUTO_REFRESH:
+            return super().authenticate_credentials(token)
+
+        token = token.decode('utf-8')
+        token_key = token[:CONSTANTS.TOKEN_KEY_LENGTH]
+        fingerprint = _fingerprint(token)
+        cache = get_token_cache()
+
+        cached = cache.get(token_cache_key(token_key))
+        if cached is not None:
+            cached_fingerprint, digest = cached
+            if compare_digest(cached_fingerprint, fingerprint):
+                auth_token = AuthToken.objects.select_related('user').filter(pk=digest).first()
+                if auth_token is not None and (auth_token.expiry is None or auth_token.expiry > timezone.now()):
+                    return self.validate_user(auth_token)
+            # Gone, expired or not this token: knox decides (and cleans up).
+            cache.delete(token_cache_key(token_key))
+
+        user, auth_token = super().authenticate_credentials(token.encode('utf-8'))
+
+        timeout = cache.default_timeout
+        if auth_token.expiry is not None:
+            remaining = (auth_token.expiry - timezone.now()).total_seconds()
+            timeout = min(timeout, remaining, knox_settings.TOKEN_TTL.total_seconds())
+        if timeout > 0:
+            cache.set(token_cache_key(token_key), (fingerprint, auth_token.digest), timeout)
+
+        return (user, auth_token)
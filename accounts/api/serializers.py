@@ -1,9 +1,15 @@
+import json
+
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
 from django.contrib import auth
 
 from rest_framework import serializers
 
+from accounts.avatars import avatar_variant_urls
+from accounts.hashing import run_hashing
+from accounts.models import UserImport
+
 User = auth.get_user_model()
 
 
@@ -22,17 +28,17 @@ class RegisterUserSerializer(serializers.ModelSerializer):
     def validate_username(self, value):
         """ Checking for pre-existing user with same username. """
 
-        qs = User.objects.filter(username__iexact=value)
+        qs = User.objects.filter_by_username(value)
         if qs.exists():
-            raise serializers.ValidationError(_('User with this email already exists.'))
+            raise serializers.ValidationError(_('User with this username already exists.'))
         return value
 
     def validate_email(self, value):
         """ Checking for pre-existing user with same email. """
 
-        qs = User.objects.filter(email__iexact=value)
+        qs = User.objects.filter_by_email(value)
         if qs.exists():
-            raise serializers.ValidationError(_('User with this username already exists'))
+            raise serializers.ValidationError(_('User with this email already exists.'))
         return value
 
     # def validate(self, data):
@@ -63,31 +69,61 @@ class RegisterUserSerializer(serializers.ModelSerializer):
             first_name=validated_data.get('first_name'),
             last_name=validated_data.get('last_name'),
         )
-        user_instance.set_password(validated_data.get('password'))
+        run_hashing(user_instance.set_password, validated_data.get('password'))
         user_instance.save()
 
         return user_instance
 
+class BulkUserRowSerializer(serializers.Serializer):
+    """
+    Validates a single row of a roster import. Uniqueness is deliberately
+    not checked here; `accounts.provisioning` does that for a whole batch
+    at once.
+    """
+    username = serializers.CharField(max_length=30)
+    email = serializers.EmailField(max_length=60)
+    first_name = serializers.CharField(max_length=30, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=30, required=False, allow_blank=True, default='')
+    is_student = serializers.BooleanField(required=False, default=False)
+    is_teacher = serializers.BooleanField(required=False, default=False)
+    password = serializers.CharField(write_only=True)
+
+    def validate(self, data):
+        if data.get('is_student') == data.get('is_teacher'):
+            raise serializers.ValidationError(_('Choose exactly one of the roles.'))
+        return data
+
 class UserProfileSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = (
             'id', 'username',
             'email', 'first_name',
             'last_name', 'avatar',
+            'avatar_variants',
             'is_student', 'is_teacher'
         )
 
+    def get_avatar_variants(self, obj):
+        return avatar_variant_urls(obj)
+
 class UserSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = (
             'id', 'username',
             'email', 'first_name',
             'last_name', 'is_student',
-            'is_teacher'
+            'is_teacher', 'avatar_variants'
         )
 
+    def get_avatar_variants(self, obj):
+        return avatar_variant_urls(obj)
+
 
 class LoginUserSerializer(serializers.Serializer):
     email = serializers.CharField()
@@ -101,7 +137,8 @@ class LoginUserSerializer(serializers.Serializer):
             '''
             Checking whether the credentials provided are correct or not
             '''
-            user = authenticate(
+            user = run_hashing(
+                authenticate,
                 request=self.context.get('request'),
                 email=email,
                 password=password
@@ -131,7 +168,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         email = data.get('email')
-        qs = User.objects.filter(email__iexact=email).exclude(username__iexact=self.instance.username)
+        qs = User.objects.filter_by_email(email).exclude(pk=self.instance.pk)
         if qs.exists():
             raise serializers.ValidationError(_('This email address is already being used by another user.'))
         return data
@@ -142,3 +179,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         instance.email = validated_data.get('email')
         instance.save()
         return instance
+
+class UserImportSerializer(serializers.ModelSerializer):
+    report = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserImport
+        fields = ('id', 'format', 'status', 'users_created', 'rows_failed', 'report', 'error', 'created', 'finished', )
+
+    def get_report(self, obj):
+        return json.loads(obj.report) if obj.report else None
@@ -9,4 +9,6 @@ urlpatterns = [
     re_path(r'^auth/logout$', LogoutView.as_view()),
     re_path(r'^auth/user$', UserRetrieveUpdateAPIView.as_view()),
     re_path(r'^auth/user/update$', UserRetrieveUpdateAPIView.as_view()),
+    re_path(r'^auth/users/bulk$', BulkUserImportAPIView.as_view()),
+    re_path(r'^auth/users/bulk/(?P<pk>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$', UserImportAPIView.as_view()),
 ]
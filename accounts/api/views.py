@@ -1,13 +1,28 @@
+import shutil
+import tempfile
+
 from django.utils.translation import gettext_lazy as _
 from django.contrib import auth
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from knox.models import AuthToken
 
+from accounts.activity import record_activity
+from accounts.hashing import run_hashing
+from accounts.models import UserImport
+from accounts.provisioning import FORMATS, detect_format, start_user_import
+from permissions import IsSuperUser
 from .serializers import *
 
 User = auth.get_user_model()
 
+BODY_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+}
+SPOOL_SIZE = 1024 * 1024
+
 
 class RegistrationAPIView(generics.GenericAPIView):
     serializer_class = RegisterUserSerializer
@@ -31,6 +46,7 @@ class LoginAPIView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
+        record_activity(user)
 
         return Response({
             "user": UserSerializer(user, context=self.get_serializer_context()).data,
@@ -50,7 +66,7 @@ class UserRetrieveUpdateAPIView(generics.GenericAPIView):
     def patch(self, request, *args, **kwargs):
         user = request.user
 
-        if not user.check_password(request.data.get('password')):
+        if not run_hashing(user.check_password, request.data.get('password')):
             return Response({
                 'error': 'Password doesn\'t match. Provide correct password.',
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -62,3 +78,50 @@ class UserRetrieveUpdateAPIView(generics.GenericAPIView):
         return Response({
             'user': UserSerializer(user, context=self.get_serializer_context()).data
         }, status=status.HTTP_200_OK)
+
+
+class BulkUserImportAPIView(generics.GenericAPIView):
+    """
+    Creates many users at once. Accepts either a JSON array (or JSON Lines,
+    as `application/x-ndjson`) of users in the body or an uploaded `file`
+    (CSV, JSON or JSON Lines; pass `format` to override the extension). The
+    rows are imported in the background; the response carries the import
+    id, whose per-row error report is served by UserImportAPIView.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsSuperUser, ]
+
+    def post(self, request, *args, **kwargs):
+        # Bodies are copied to the import unparsed, so a large array is
+        # never held in memory.
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type in BODY_FORMATS:
+            body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            shutil.copyfileobj(request._request, body)
+            stream, import_format = body, BODY_FORMATS[content_type]
+        else:
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({
+                    'error': _('Provide a list of users or upload a file.'),
+                }, status=status.HTTP_400_BAD_REQUEST)
+            stream, import_format = upload, request.data.get('format') or detect_format(upload.name)
+        if import_format not in FORMATS:
+            return Response({
+                'error': _('Unsupported import format.'),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        user_import = start_user_import(request.user, stream, import_format)
+        return Response({
+            'import': UserImportSerializer(user_import).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class UserImportAPIView(generics.GenericAPIView):
+    """ Progress and error report of an import, for the user who started it. """
+    permission_classes = [permissions.IsAuthenticated, IsSuperUser, ]
+
+    def get(self, request, *args, **kwargs):
+        user_import = get_object_or_404(UserImport, pk=kwargs.get('pk'), requested_by=request.user)
+        return Response({
+            'import': UserImportSerializer(user_import).data
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from background import run_in_background
+
+'''
+Fixed-size avatar variants. Variants live next to the original under
+`avatars/variants/` and are named after a hash of the original's full
+storage name, so two uploads never share a variant; generation overwrites
+whatever is already there, and the user's post_save refreshes the variants
+whenever the avatar changes, so a reused name is regenerated too. Their
+URLs are cached; when they are missing the original URL is served and
+generation is queued in the background, so nothing is resized on the
+request path. An image that cannot be processed is remembered for a while
+and not queued again on every request.
+'''
+
+logger = logging.getLogger(__name__)
+
+FAILURE_TIMEOUT = 60 * 10
+
+DEFAULTS = {
+    'SIZES': (32, 64, 256),
+    'FORMAT': 'JPEG',
+    'QUALITY': 85,
+}
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+    'PNG': 'png',
+}
+
+
+def _options():
+    return dict(DEFAULTS, **getattr(settings, 'AVATAR_VARIANTS', {}))
+
+
+def _cache_key(name):
+    return 'avatar-variants:{}'.format(name)
+
+
+def variant_name(name, size):
+    options = _options()
+    digest = hashlib.sha256(name.encode()).hexdigest()[:32]
+    return 'avatars/variants/{digest}-{size}.{extension}'.format(
+        digest=digest, size=size, extension=EXTENSIONS[options['FORMAT']]
+    )
+
+
+def variant_names(name):
+    return [variant_name(name, size) for size in _options()['SIZES']]
+
+
+def generate_avatar_variants(name):
+    options = _options()
+    urls = {}
+    try:
+        with default_storage.open(name, 'rb') as original:
+            image = Image.open(original)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Cannot build avatar variants of %s', name, exc_info=True)
+        cache.set(_cache_key(name), False, FAILURE_TIMEOUT)
+        return None
+    image = ImageOps.exif_transpose(image)
+    if options['FORMAT'] == 'JPEG':
+        image = image.convert('RGB')
+
+    for size in options['SIZES']:
+        path = variant_name(name, size)
+        buffer = io.BytesIO()
+        ImageOps.fit(image, (size, size), Image.LANCZOS).save(
+            buffer, options['FORMAT'], quality=options['QUALITY']
+        )
+        # The storage never overwrites, so a left-over variant goes first.
+        default_storage.delete(path)
+        path = default_storage.save(path, ContentFile(buffer.getvalue()))
+        urls[str(size)] = default_storage.url(path)
+
+    cache.set(_cache_key(name), urls, None)
+    return urls
+
+
+def schedule_avatar_variants(name):
+    if cache.get(_cache_key(name)) is None:
+        run_in_background(generate_avatar_variants, name, key=_cache_key(name))
+
+
+def refresh_avatar_variants(name):
+    """ Regenerates the variants of a new avatar, even if its name was used before. """
+    cache.delete(_cache_key(name))
+    schedule_avatar_variants(name)
+
+
+def avatar_variant_urls(user):
+    """
+    Returns {size: url} for the user's avatar, or None without one. Falls
+    back to the original image until the variants have been generated.
+    """
+    if not user.avatar:
+        return None
+    urls = cache.get(_cache_key(user.avatar.name))
+    if urls:
+        return urls
+
+    if urls is None:
+        schedule_avatar_variants(user.avatar.name)
+    original = user.avatar.url
+    return {str(size): original for size in _options()['SIZES']}
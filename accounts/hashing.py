@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions, status
+
+'''
+Password hashing (PBKDF2) is deliberately slow. Running it on a small,
+dedicated pool keeps a login rush from occupying every request worker:
+a request is admitted while one of the WORKERS hashing threads is free
+or one of QUEUE_SIZE waiting places is, so a short burst waits for at
+most a couple of hashes ahead of it; anything beyond that is turned away
+immediately with a 503 instead of queueing behind the rest. The
+benchmark_logins command measures login p99 under parallel traffic.
+
+Each hashing thread keeps its own database connection for the jobs it
+runs (authentication looks the user up), replacing it only after an
+error left it unusable, rather than connecting afresh for every login.
+'''
+
+DEFAULTS = {
+    'WORKERS': 4,
+    'QUEUE_SIZE': 8,
+    'TIMEOUT': 10,
+    'RETRY_AFTER': 1,
+}
+
+
+class HashingUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The server is busy processing logins. Please try again shortly.')
+    default_code = 'hashing_unavailable'
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+def _drop_broken_connections():
+    # Like close_old_connections(), minus CONN_MAX_AGE: these threads are not
+    # request workers, so a healthy connection is kept for the next job.
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        if connection.get_autocommit() != connection.settings_dict['AUTOCOMMIT']:
+            connection.close()
+        elif connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+
+
+class HashingExecutor:
+    def __init__(self, workers, queue_size, timeout, retry_after):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _run(self, fn, args, kwargs):
+        try:
+            _drop_broken_connections()
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def run(self, fn, *args, **kwargs):
+        """ Runs `fn` on the hashing pool and waits for its result. """
+        if not self._slots.acquire(blocking=False):
+            raise HashingUnavailable(wait=self.retry_after)
+        try:
+            future = self._pool.submit(self._run, fn, args, kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingUnavailable(wait=self.retry_after)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                options = dict(DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {}))
+                _executor = HashingExecutor(
+                    workers=options['WORKERS'],
+                    queue_size=options['QUEUE_SIZE'],
+                    timeout=options['TIMEOUT'],
+                    retry_after=options['RETRY_AFTER'],
+                )
+    return _executor
+
+
+def run_hashing(fn, *args, **kwargs):
+    return get_hashing_executor().run(fn, *args, **kwargs)
+
+
+def init_hashing_process(settings_module):
+    """ Initializer for process pools that hash passwords in bulk. """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
@@ -0,0 +1,111 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib import auth
+from django.core.management.base import BaseCommand
+from django.db import connections
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+
+from accounts.hashing import get_hashing_executor
+
+User = auth.get_user_model()
+
+PASSWORD = 'bench-password'
+
+
+def _percentile(values, q):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test for logins: fires LOGINS concurrent logins through the hashing pool '
+        'while other threads keep calling a cheap authenticated endpoint, and reports '
+        'the p50/p99 latency of both, plus how many logins were turned away with a 503. '
+        'The synthetic users are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20, help='Logins in flight at once.')
+        parser.add_argument('--background', type=int, default=4, help='Threads calling auth/user meanwhile.')
+        parser.add_argument('--users', type=int, default=20)
+
+    def _create_users(self, count):
+        users = []
+        for number in range(count):
+            user = User(username='bench-login-{}'.format(number), email='bench-login-{}@example.test'.format(number), is_student=True)
+            user.set_password(PASSWORD)
+            user.save()
+            users.append(user)
+        return users
+
+    def _login(self, email):
+        client = APIClient(SERVER_NAME='localhost')
+        started = time.perf_counter()
+        try:
+            response = client.post('/auth/login', {'email': email, 'password': PASSWORD}, format='json')
+            return response.status_code, time.perf_counter() - started
+        finally:
+            connections.close_all()
+
+    def _background(self, token, done, latencies):
+        client = APIClient(SERVER_NAME='localhost', HTTP_AUTHORIZATION='Token ' + token)
+        try:
+            while not done.is_set():
+                started = time.perf_counter()
+                client.get('/auth/user')
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+
+    def _report(self, name, latencies):
+        latencies = [latency * 1000 for latency in latencies]
+        self.stdout.write('{:<22} {:6} calls, p50 {:8.1f} ms, p99 {:8.1f} ms, max {:8.1f} ms'.format(
+            name, len(latencies), statistics.median(latencies) if latencies else float('nan'),
+            _percentile(latencies, 99), max(latencies, default=float('nan')),
+        ))
+
+    def handle(self, *args, **options):
+        users = self._create_users(options['users'])
+        try:
+            token = AuthToken.objects.create(users[0])[1]
+            executor = get_hashing_executor()
+            self.stdout.write('Hashing pool: {} workers, {} queued at most.'.format(
+                executor.workers, executor.queue_size
+            ))
+
+            done, background = threading.Event(), []
+            threads = [
+                threading.Thread(target=self._background, args=(token, done, background))
+                for _ in range(options['background'])
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                emails = [users[number % len(users)].email for number in range(options['logins'])]
+                started = time.monotonic()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+                    results = list(clients.map(self._login, emails))
+                elapsed = time.monotonic() - started
+            finally:
+                done.set()
+                for thread in threads:
+                    thread.join()
+
+            admitted = [latency for status_code, latency in results if status_code == 200]
+            rejected = [latency for status_code, latency in results if status_code == 503]
+            self.stdout.write('{} logins in {:.1f}s: {} admitted, {} turned away, {} other.'.format(
+                len(results), elapsed, len(admitted), len(rejected), len(results) - len(admitted) - len(rejected)
+            ))
+            self._report('admitted logins', admitted)
+            self._report('rejected logins (503)', rejected)
+            self._report('auth/user meanwhile', background)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
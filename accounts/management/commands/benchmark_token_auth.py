@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.contrib import auth
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from knox.auth import TokenAuthentication
+from knox.models import AuthToken
+
+from accounts.api.authentication import CachedTokenAuthentication, evict_token
+
+User = auth.get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the per-request cost of knox TokenAuthentication with '
+        'CachedTokenAuthentication (milliseconds and queries per call). The user '
+        'and its tokens are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Authentications timed per method.')
+        parser.add_argument('--tokens', type=int, default=5, help='Tokens the user holds (knox scans every match).')
+
+    def _time(self, authentication, token, count):
+        # One call first, so the cached method is measured on its hits.
+        authentication.authenticate_credentials(token)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                authentication.authenticate_credentials(token)
+            elapsed = time.perf_counter() - started
+        return elapsed * 1000 / count, len(queries) / count
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    username='bench-token-user', email='bench-token-user@example.test', is_student=True
+                )
+                tokens = [AuthToken.objects.create(user, timedelta(hours=1)) for _ in range(options['tokens'])]
+                auth_token, token = tokens[-1]
+                token = token.encode('utf-8')
+
+                methods = (
+                    ('knox', TokenAuthentication()),
+                    ('cached', CachedTokenAuthentication()),
+                )
+                for name, authentication in methods:
+                    milliseconds, queries = self._time(authentication, token, count)
+                    self.stdout.write('{:<8} {:8.3f} ms, {:.1f} queries per request'.format(name, milliseconds, queries))
+                evict_token(auth_token.token_key)
+                raise Rollback
+        except Rollback:
+            pass
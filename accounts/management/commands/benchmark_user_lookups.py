@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.contrib import auth
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+User = auth.get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares case-insensitive username/email lookups through __iexact with the '
+        'LOWER() lookups of CustomUserManager on a table of synthetic users. The '
+        'users are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help='Synthetic users to create.')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per method.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def _create_users(self, count, batch_size):
+        password = make_password(None)
+        for start in range(0, count, batch_size):
+            User.objects.bulk_create([
+                User(
+                    username='bench{}'.format(number), email='bench{}@example.test'.format(number),
+                    is_student=True, password=password,
+                )
+                for number in range(start, min(start + batch_size, count))
+            ])
+
+    def _time(self, lookup, values):
+        started = time.perf_counter()
+        for value in values:
+            lookup(value).exists()
+        return (time.perf_counter() - started) * 1000 / len(values)
+
+    def handle(self, *args, **options):
+        count, lookups = options['users'], options['lookups']
+        try:
+            with transaction.atomic():
+                started = time.monotonic()
+                self._create_users(count, options['batch_size'])
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE accounts_user;')
+                self.stdout.write('Created {} users in {:.1f}s.'.format(count, time.monotonic() - started))
+
+                numbers = [random.randrange(count) for _ in range(lookups)]
+                usernames = ['Bench{}'.format(number) for number in numbers]
+                emails = ['BENCH{}@Example.test'.format(number) for number in numbers]
+                methods = (
+                    ('username __iexact', lambda value: User.objects.filter(username__iexact=value), usernames),
+                    ('username LOWER()', User.objects.filter_by_username, usernames),
+                    ('email __iexact', lambda value: User.objects.filter(email__iexact=value), emails),
+                    ('email LOWER()', User.objects.filter_by_email, emails),
+                )
+                for name, lookup, values in methods:
+                    self.stdout.write('{:<20} {:8.3f} ms per lookup'.format(name, self._time(lookup, values)))
+                    if connection.vendor == 'postgresql':
+                        self.stdout.write(lookup(values[0]).explain())
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,56 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisioning import BATCH_SIZE, FORMATS, detect_format, iter_rows, provision_users, resume_user_imports
+
+
+class Command(BaseCommand):
+    help = 'Bulk-creates users from a CSV, JSON or JSON Lines roster file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Roster file to import.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Instead of a file, run the API imports a restart left unfinished.'
+        )
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, then csv.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--processes', type=int, default=None, help='Password hashing processes.')
+        parser.add_argument('--report', help='Write the per-row error report to this JSON file.')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            count = resume_user_imports()
+            self.stdout.write(self.style.SUCCESS('Ran {} unfinished imports.'.format(count)))
+            return
+        path = options['path']
+        if not path:
+            raise CommandError('Give a roster file to import, or --resume.')
+        import_format = options['format'] or detect_format(path)
+
+        started = time.monotonic()
+        try:
+            with open(path, 'rb') as stream:
+                report = provision_users(
+                    iter_rows(stream, import_format),
+                    batch_size=options['batch_size'],
+                    processes=options['processes'],
+                )
+        except OSError as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump(report.as_dict(), output, indent=2, default=str)
+        else:
+            for error in report.errors:
+                self.stderr.write('row {}: {}'.format(error['row'], json.dumps(error['errors'])))
+
+        if report.parse_error:
+            self.stderr.write('Stopped reading {}: {}'.format(path, report.parse_error))
+        self.stdout.write(self.style.SUCCESS(
+            'Created {} users, {} rows rejected in {:.1f}s.'.format(report.created, len(report.errors), elapsed)
+        ))
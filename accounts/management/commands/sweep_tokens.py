@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from knox.models import AuthToken
+from knox.settings import knox_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes expired knox tokens and trims every user down to their newest '
+        'tokens, in small chunks so no long lock is held. Meant to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=knox_settings.TOKEN_LIMIT_PER_USER,
+            help='Tokens to keep per user (defaults to TOKEN_LIMIT_PER_USER).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+
+    def _delete_in_chunks(self, queryset, chunk_size, pause):
+        removed = 0
+        while True:
+            digests = list(queryset.values_list('pk', flat=True)[:chunk_size])
+            if not digests:
+                return removed
+            # Deleting through the ORM fires post_delete, which also evicts
+            # each token from the authentication cache.
+            removed += AuthToken.objects.filter(pk__in=digests).delete()[0]
+            if pause:
+                time.sleep(pause)
+
+    def handle(self, *args, **options):
+        chunk_size, pause, keep = options['chunk_size'], options['pause'], options['keep']
+        started = time.monotonic()
+
+        expired = self._delete_in_chunks(
+            AuthToken.objects.filter(expiry__lt=timezone.now()), chunk_size, pause
+        )
+
+        surplus = 0
+        if keep is not None:
+            crowded = (
+                AuthToken.objects.values('user')
+                .annotate(tokens=Count('pk'))
+                .filter(tokens__gt=keep)
+                .values_list('user', flat=True)
+            )
+            for user_id in crowded.iterator():
+                newest = AuthToken.objects.filter(user_id=user_id).order_by('-created').values_list('pk', flat=True)[:keep]
+                surplus += self._delete_in_chunks(
+                    AuthToken.objects.filter(user_id=user_id).exclude(pk__in=list(newest)), chunk_size, pause
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Removed {} expired and {} surplus tokens in {:.2f}s.'.format(expired, surplus, elapsed)
+        ))
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+INDEXES = (
+    ('accounts_user_username_lower_uniq', 'username'),
+    ('accounts_user_email_lower_uniq', 'email'),
+)
+
+
+def _concurrently(schema_editor):
+    # Postgres can build the index without locking the table against writes,
+    # but only outside a transaction (hence atomic = False below).
+    return 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+
+
+def create_indexes(apps, schema_editor):
+    concurrently = _concurrently(schema_editor)
+    for name, column in INDEXES:
+        # An interrupted concurrent build leaves an INVALID index behind.
+        schema_editor.execute('DROP INDEX {}IF EXISTS {};'.format(concurrently, name))
+        schema_editor.execute(
+            'CREATE UNIQUE INDEX {}{} ON accounts_user (LOWER({}));'.format(concurrently, name, column)
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    concurrently = _concurrently(schema_editor)
+    for name, _column in INDEXES:
+        schema_editor.execute('DROP INDEX {}IF EXISTS {};'.format(concurrently, name))
+
+
+class Migration(migrations.Migration):
+    '''
+    Functional unique indexes backing CustomUserManager.filter_by_username
+    and filter_by_email. They also make usernames and emails unique
+    regardless of case, so existing case-only duplicates must be resolved
+    before applying this migration. On Postgres the indexes are built
+    CONCURRENTLY, so registrations and logins keep writing while they build.
+    '''
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.auth.base_user import BaseUserManager
+from django.db.models.functions import Lower
 from django.utils.translation import ugettext_lazy as _
 
 class CustomUserManager(BaseUserManager):
@@ -14,7 +18,7 @@ class CustomUserManager(BaseUserManager):
     if not password:
         raise ValueError(_("Password must be set"))
 
-    email   = self.mormalize_email(email)
+    email   = self.normalize_email(email)
     user    = self.model(email=email, username=username, is_student=is_student, is_teacher=is_teacher, **extra_fields)
     user.set_password(password)
     user.save(using=self.db)
@@ -23,7 +27,7 @@ class CustomUserManager(BaseUserManager):
 
   def create_user(self, email, password=None, username=None, is_student=False, is_teacher=False, **extra_fields):
     extra_fields.setdefault('is_superuser', False)
-    return _create_user(email, password, username, is_student, is_teacher, **extra_fields)
+    return self._create_user(email, password, username, is_student, is_teacher, **extra_fields)
 
   def create_superuser(self, email, password=None, username=None, is_student=False, is_teacher=False, **extra_fields):
     extra_fields.setdefault('is_superuser', True)
@@ -31,6 +35,23 @@ class CustomUserManager(BaseUserManager):
         raise ValueError(_('Superuser must have is_superuser=True.'))
     return self._create_user(email, password, username, is_student, is_teacher, **extra_fields)
 
+  '''
+  Case-insensitive lookups. These compare LOWER(column) against the
+  lower-cased value so that they can use the functional unique indexes
+  created in migration 0002, unlike `__iexact` which compiles to UPPER().
+  '''
+  def filter_by_username(self, username):
+    return self.annotate(username_lower=Lower('username')).filter(username_lower=username.lower())
+
+  def filter_by_email(self, email):
+    return self.annotate(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+  def filter_by_usernames(self, usernames):
+    return self.annotate(username_lower=Lower('username')).filter(username_lower__in=[value.lower() for value in usernames])
+
+  def filter_by_emails(self, emails):
+    return self.annotate(email_lower=Lower('email')).filter(email_lower__in=[value.lower() for value in emails])
+
 class User(AbstractBaseUser, PermissionsMixin):
   username            = models.CharField(_("username"), max_length=30, unique=True, blank=False, null=False)
   email               = models.EmailField(_("email"),max_length=60, unique=True, blank=False, null=False)
@@ -41,7 +62,7 @@ class User(AbstractBaseUser, PermissionsMixin):
   avatar              = models.ImageField(upload_to='avatars/', null=True, blank=True)
 
   date_joined         = models.DateTimeField(verbose_name="Date Joined", auto_now_add=True)
-  last_login          = models.DateTimeField(verbose_name="Last Login", auto_now=True)
+  last_login          = models.DateTimeField(verbose_name="Last Login", null=True, blank=True)
   is_active           = models.BooleanField(verbose_name="Active", default=True)
 
   objects = CustomUserManager()
@@ -60,6 +81,38 @@ class User(AbstractBaseUser, PermissionsMixin):
     return (self.first_name + ' ' + self.last_name).strip()
 
   def get_classrooms(self):
+    from classroom.models import Classroom
     if self.is_student:
-      return [classroom.classroom_id for classroom in self.joined_classrooms.all()]
-    return self.teaching_classrooms.all()
+      queryset = Classroom.objects.filter(students__student_id=self)
+    else:
+      queryset = self.teaching_classrooms.all()
+    return queryset.filter(deleted_at__isnull=True).select_related('teacher_id')
+
+'''
+A roster import submitted over the API. The uploaded rows are kept as
+`source` until the background job has read them; the per-row error report
+is stored as JSON once it is done.
+'''
+class UserImport(models.Model):
+  PENDING   = 'pending'
+  RUNNING   = 'running'
+  DONE      = 'done'
+  FAILED    = 'failed'
+  STATUSES = (
+    (PENDING, _('pending')),
+    (RUNNING, _('running')),
+    (DONE, _('done')),
+    (FAILED, _('failed')),
+  )
+
+  id              = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  requested_by    = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="user_imports", null=True, on_delete=models.SET_NULL)
+  format          = models.CharField(max_length=10)
+  source          = models.FileField(upload_to='imports/', blank=True)
+  status          = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+  users_created   = models.PositiveIntegerField(default=0)
+  rows_failed     = models.PositiveIntegerField(default=0)
+  report          = models.TextField(blank=True)
+  error           = models.TextField(blank=True)
+  created         = models.DateTimeField(auto_now_add=True)
+  finished        = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,307 @@
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from django.contrib import auth
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from accounts.api.serializers import BulkUserRowSerializer
+from accounts.hashing import init_hashing_process
+from accounts.models import UserImport
+from background import run_in_background
+
+User = auth.get_user_model()
+
+'''
+Roster imports. Rows are read lazily from the source and handled in
+batches: each batch is validated field-by-field, checked for existing
+usernames/emails with one set-based query per column, has its passwords
+hashed in parallel and is written with bulk_create. Every rejected row is
+reported back with its (1-based) row number.
+
+The import_users command hashes on a process pool. Imports sent to the
+API are stored as a UserImport and run by the background executor, which
+hashes on a few threads instead (PBKDF2 releases the GIL), so the web
+process never forks and the request returns at once with the import id.
+'''
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+HASHING_CHUNK_SIZE = 50
+BACKGROUND_HASHING_THREADS = 2
+READ_SIZE = 64 * 1024
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+
+class ProvisioningReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.parse_error = None
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'parse_error': self.parse_error,
+        }
+
+
+def detect_format(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'ndjson':
+        return 'jsonl'
+    return extension if extension in FORMATS else default
+
+
+def _iter_json_array(stream):
+    """ Yields the items of a JSON array one at a time, reading the stream in chunks. """
+    decoder = json.JSONDecoder()
+    buffer, position, exhausted = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, exhausted
+        chunk = '' if exhausted else stream.read(READ_SIZE)
+        exhausted = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+        return not exhausted
+
+    def next_character():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                raise ValueError(_('The JSON array of users is not closed.'))
+
+    if next_character() != '[':
+        raise ValueError(_('Expected a JSON array of users.'))
+    position += 1
+    if next_character() == ']':
+        return
+    while True:
+        next_character()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not read_more():
+                    raise
+                continue
+            # A value that ends the buffer may have been cut short (a number).
+            if end == len(buffer) and read_more():
+                continue
+            break
+        yield item
+        position = end
+        separator = next_character()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(_('Expected "," or "]" between users.'))
+        position += 1
+
+
+def iter_rows(stream, format='csv', encoding='utf-8'):
+    """
+    Yields one dict per user from a binary or text stream. Every format is
+    read incrementally, a JSON array included.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding=encoding, newline='')
+
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key.strip(): value for key, value in row.items() if key}
+    elif format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif format == 'json':
+        yield from _iter_json_array(stream)
+    else:
+        raise ValueError(_('Unsupported import format: {}').format(format))
+
+
+def _clean(row):
+    # Blank CSV cells should fall back to the serializer defaults.
+    if not isinstance(row, dict):
+        return row
+    return {key: value for key, value in row.items() if value not in ('', None)}
+
+
+def _hashing_pool(processes, threads=False):
+    if threads:
+        return ThreadPoolExecutor(max_workers=processes, thread_name_prefix='import-hashing')
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=get_context('spawn'),
+        initializer=init_hashing_process,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'iClass.settings'),),
+    )
+
+
+def _existing(field, values):
+    if not values:
+        return set()
+    return set(
+        User.objects.annotate(lookup=Lower(field))
+        .filter(lookup__in=values)
+        .values_list('lookup', flat=True)
+    )
+
+
+def _insert(users, rows, report):
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        report.created += len(users)
+    except IntegrityError:
+        # Someone registered one of these names since the batch was checked;
+        # fall back to row-by-row inserts so only the clashing rows fail.
+        for number, user in zip(rows, users):
+            try:
+                with transaction.atomic():
+                    user.save()
+                report.created += 1
+            except IntegrityError:
+                report.add_error(number, {'non_field_errors': [_('User with this username or email already exists.')]})
+
+
+def _provision_batch(batch, pool, seen_usernames, seen_emails, report):
+    valid = []
+    for number, row in batch:
+        serializer = BulkUserRowSerializer(data=_clean(row))
+        if not serializer.is_valid():
+            report.add_error(number, serializer.errors)
+            continue
+        data = serializer.validated_data
+        username, email = data['username'].lower(), data['email'].lower()
+        if username in seen_usernames:
+            report.add_error(number, {'username': [_('Duplicate username in this import.')]})
+        elif email in seen_emails:
+            report.add_error(number, {'email': [_('Duplicate email in this import.')]})
+        else:
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            valid.append((number, data))
+
+    taken_usernames = _existing('username', [data['username'].lower() for _n, data in valid])
+    taken_emails = _existing('email', [data['email'].lower() for _n, data in valid])
+
+    accepted = []
+    for number, data in valid:
+        if data['username'].lower() in taken_usernames:
+            report.add_error(number, {'username': [_('User with this username already exists.')]})
+        elif data['email'].lower() in taken_emails:
+            report.add_error(number, {'email': [_('User with this email already exists.')]})
+        else:
+            accepted.append((number, data))
+    if not accepted:
+        return
+
+    passwords = [data['password'] for _n, data in accepted]
+    hashes = pool.map(make_password, passwords, chunksize=HASHING_CHUNK_SIZE)
+
+    users = [
+        User(
+            username=data['username'],
+            email=User.objects.normalize_email(data['email']),
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            is_student=data['is_student'],
+            is_teacher=data['is_teacher'],
+            password=password,
+        )
+        for (_n, data), password in zip(accepted, hashes)
+    ]
+    _insert(users, [number for number, _d in accepted], report)
+
+
+def provision_users(rows, batch_size=BATCH_SIZE, processes=None, threads=False):
+    """
+    Creates users from an iterable of row dicts and returns a
+    ProvisioningReport. Passwords are hashed on `processes` worker processes,
+    or on that many threads with `threads`.
+    """
+    report = ProvisioningReport()
+    seen_usernames, seen_emails = set(), set()
+    numbered = enumerate(rows, start=1)
+
+    with _hashing_pool(processes, threads) as pool:
+        while True:
+            try:
+                batch = list(itertools.islice(numbered, batch_size))
+            except (ValueError, csv.Error) as error:
+                # Rows before the malformed one have already been imported.
+                report.parse_error = str(error)
+                break
+            if not batch:
+                break
+            _provision_batch(batch, pool, seen_usernames, seen_emails, report)
+
+    report.errors.sort(key=lambda error: error['row'])
+    return report
+
+
+def start_user_import(user, stream, import_format):
+    """ Stores the rows of an API import and queues it. Returns the UserImport. """
+    user_import = UserImport(requested_by=user, format=import_format)
+    user_import.source.save('{}.{}'.format(user_import.id, import_format), File(stream), save=False)
+    with transaction.atomic():
+        user_import.save()
+        run_in_background(run_user_import, user_import.pk, key='user-import:{}'.format(user_import.pk))
+    return user_import
+
+
+def run_user_import(import_id):
+    updated = UserImport.objects.filter(pk=import_id, status=UserImport.PENDING).update(status=UserImport.RUNNING)
+    if not updated:
+        return
+    user_import = UserImport.objects.get(pk=import_id)
+    try:
+        with user_import.source.open('rb') as stream:
+            report = provision_users(
+                iter_rows(stream, user_import.format),
+                processes=BACKGROUND_HASHING_THREADS,
+                threads=True,
+            )
+    except Exception as error:
+        logger.exception('User import %s failed', import_id)
+        user_import.status, user_import.error = UserImport.FAILED, str(error)
+    else:
+        report = report.as_dict()
+        user_import.status = UserImport.DONE
+        user_import.users_created, user_import.rows_failed = report['created'], report['failed']
+        user_import.report = json.dumps(report, default=str)
+    user_import.source.delete(save=False)
+    user_import.finished = timezone.now()
+    user_import.save()
+
+
+def resume_user_imports():
+    """ Runs imports left pending or interrupted by a restart, synchronously. Returns how many ran. """
+    unfinished = UserImport.objects.filter(status__in=(UserImport.PENDING, UserImport.RUNNING))
+    import_ids = list(unfinished.values_list('pk', flat=True))
+    UserImport.objects.filter(pk__in=import_ids).update(status=UserImport.PENDING)
+    for import_id in import_ids:
+        run_user_import(import_id)
+    return len(import_ids)
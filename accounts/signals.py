@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from knox.models import AuthToken
+
+from accounts.api.authentication import evict_token
+from accounts.avatars import refresh_avatar_variants
+
+
+@receiver(post_delete, sender=AuthToken)
+def evict_deleted_token(sender, instance, **kwargs):
+    ''' Logout (and expired token cleanup) must invalidate the cached token right away. '''
+    evict_token(instance.token_key)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_avatar(sender, instance, update_fields=None, **kwargs):
+    ''' post_save only rebuilds the variants when the avatar actually changed. '''
+    if update_fields is not None and 'avatar' not in update_fields:
+        instance._previous_avatar = instance.avatar.name
+        return
+    instance._previous_avatar = (
+        sender.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def build_avatar_variants(sender, instance, **kwargs):
+    if instance.avatar and instance.avatar.name != getattr(instance, '_previous_avatar', None):
+        refresh_avatar_variants(instance.avatar.name)
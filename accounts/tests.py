@@ -0,0 +1,345 @@
+import io
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from knox.models import AuthToken
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from accounts.activity import ActivityTracker, active_user_ids, record_activity
+from accounts.api.authentication import CachedTokenAuthentication, get_token_cache, token_cache_key
+from accounts.avatars import avatar_variant_urls, generate_avatar_variants, variant_name, variant_names
+from accounts.hashing import HashingExecutor, HashingUnavailable
+from accounts.models import User, UserImport
+from accounts.provisioning import run_user_import
+
+
+def image_bytes(color, format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, format)
+    return buffer.getvalue()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create(username='student', email='student@example.com', is_student=True)
+        self.auth_token, self.token = AuthToken.objects.create(self.user, timedelta(hours=1))
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self, token=None):
+        return self.authentication.authenticate_credentials((token or self.token).encode())
+
+    def test_a_verified_token_is_served_from_the_cache(self):
+        self.assertEqual(self.authenticate()[0], self.user)
+        # One primary-key query for the token row and its user.
+        with self.assertNumQueries(1):
+            user, auth_token = self.authenticate()
+        self.assertEqual((user, auth_token.pk), (self.user, self.auth_token.pk))
+
+        # A token sharing the key but not the secret is not let through.
+        forged = self.token[:-1] + ('1' if self.token.endswith('0') else '0')
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(forged)
+
+    def test_logout_evicts_the_token(self):
+        self.authenticate()
+        self.auth_token.delete()
+        self.assertIsNone(get_token_cache().get(token_cache_key(self.auth_token.token_key)))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_revocation_elsewhere_is_seen_despite_the_cached_entry(self):
+        # Another worker's logout or deactivation does not reach this cache.
+        self.authenticate()
+        with mock.patch('accounts.signals.evict_token'):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
+            User.objects.filter(pk=self.user.pk).update(is_active=True)
+            self.authenticate()
+            self.auth_token.delete()
+        self.assertIsNotNone(get_token_cache().get(token_cache_key(self.auth_token.token_key)))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertIsNone(get_token_cache().get(token_cache_key(self.auth_token.token_key)))
+
+    def test_deactivated_users_are_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_expired_tokens_are_rejected_and_cleaned_up(self):
+        expired, expired_token = AuthToken.objects.create(self.user, timedelta(hours=-1))
+        self.authenticate()
+        # The miss above went through knox, which removed the expired sibling.
+        self.assertFalse(AuthToken.objects.filter(pk=expired.pk).exists())
+
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
+        self.assertFalse(AuthToken.objects.filter(pk=self.auth_token.pk).exists())
+
+
+class SweepTokensTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='student', email='student@example.com', is_student=True)
+        self.other = User.objects.create(username='other', email='other@example.com', is_student=True)
+        now = timezone.now()
+        self.expired = [AuthToken.objects.create(self.user, timedelta(hours=-1))[0] for _ in range(3)]
+        self.valid = []
+        for age in range(5):
+            auth_token = AuthToken.objects.create(self.user, timedelta(hours=1))[0]
+            AuthToken.objects.filter(pk=auth_token.pk).update(created=now - timedelta(minutes=age))
+            self.valid.append(auth_token)
+        self.untouched = AuthToken.objects.create(self.other, timedelta(hours=1))[0]
+
+    def sweep(self, *args):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sweep_tokens', *args, stdout=out)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE')]
+        return out.getvalue(), len(deletes)
+
+    def test_expired_and_surplus_tokens_are_removed_in_chunks(self):
+        out, deletes = self.sweep('--keep', '2', '--chunk-size', '2')
+        self.assertIn('Removed 3 expired and 3 surplus tokens', out)
+        # Three expired and three surplus tokens, two per statement.
+        self.assertEqual(deletes, 4)
+        remaining = set(AuthToken.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {self.valid[0].pk, self.valid[1].pk, self.untouched.pk})
+
+    def test_users_within_the_limit_keep_their_tokens(self):
+        out, deletes = self.sweep('--keep', '5')
+        self.assertIn('Removed 3 expired and 0 surplus tokens', out)
+        self.assertEqual(deletes, 1)
+        self.assertEqual(AuthToken.objects.count(), 6)
+
+
+class AvatarVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def pixel(self, url_or_name):
+        with default_storage.open(url_or_name, 'rb') as variant:
+            return Image.open(variant).convert('RGB').getpixel((0, 0))
+
+    def test_avatars_sharing_a_stem_get_their_own_variants(self):
+        red = default_storage.save('avatars/me.png', ContentFile(image_bytes('red')))
+        blue = default_storage.save('avatars/me.jpg', ContentFile(image_bytes('blue', 'JPEG')))
+        self.assertFalse(set(variant_names(red)) & set(variant_names(blue)))
+
+        generate_avatar_variants(red)
+        generate_avatar_variants(blue)
+        self.assertGreater(self.pixel(variant_name(red, 32))[0], 200)
+        self.assertGreater(self.pixel(variant_name(blue, 32))[2], 200)
+
+    def test_existing_variants_are_overwritten(self):
+        name = default_storage.save('avatars/me.png', ContentFile(image_bytes('red')))
+        stale = default_storage.save(variant_name(name, 64), ContentFile(image_bytes('blue', 'JPEG')))
+
+        urls = generate_avatar_variants(name)
+        self.assertEqual(urls['64'], default_storage.url(stale))
+        self.assertGreater(self.pixel(stale)[0], 200)
+
+    def test_failed_generation_is_not_requeued(self):
+        user = User.objects.create(username='student', email='student@example.com')
+        user.avatar = default_storage.save('avatars/broken.png', ContentFile(b'not an image'))
+
+        with self.assertLogs('accounts.avatars', 'WARNING'):
+            self.assertIsNone(generate_avatar_variants(user.avatar.name))
+        with mock.patch('accounts.avatars.run_in_background') as run_in_background:
+            urls = avatar_variant_urls(user)
+        run_in_background.assert_not_called()
+        self.assertEqual(urls['32'], user.avatar.url)
+
+    def test_a_new_avatar_refreshes_its_variants(self):
+        user = User.objects.create(username='student', email='student@example.com')
+        name = default_storage.save('avatars/me.png', ContentFile(image_bytes('red')))
+        cache.set('avatar-variants:' + name, {'32': 'stale'}, None)
+        with mock.patch('accounts.avatars.run_in_background') as run_in_background:
+            user.avatar = name
+            user.save()
+            user.save(update_fields=['first_name'])
+        run_in_background.assert_called_once_with(generate_avatar_variants, name, key='avatar-variants:' + name)
+
+
+class HashingAdmissionTests(TestCase):
+    def test_a_login_rush_is_turned_away_once_the_workers_are_busy(self):
+        executor = HashingExecutor(workers=2, queue_size=0, timeout=5, retry_after=1)
+        release = threading.Event()
+
+        def attempt(_number):
+            started = time.monotonic()
+            try:
+                executor.run(release.wait, 5)
+                return 'hashed', time.monotonic() - started
+            except HashingUnavailable:
+                return 'rejected', time.monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=50) as clients:
+            futures = [clients.submit(attempt, number) for number in range(50)]
+            time.sleep(0.5)
+            # Everyone but the two running hashes has been answered already.
+            self.assertEqual(sum(not future.done() for future in futures), 2)
+            release.set()
+            results = [future.result() for future in futures]
+
+        outcomes = [outcome for outcome, _elapsed in results]
+        self.assertEqual(outcomes.count('hashed'), 2)
+        self.assertEqual(outcomes.count('rejected'), 48)
+        self.assertTrue(all(elapsed < 0.5 for outcome, elapsed in results if outcome == 'rejected'))
+
+        # The slots are free again once the hashes are done.
+        self.assertTrue(executor.run(lambda: True))
+
+    def test_a_short_burst_waits_in_the_queue(self):
+        executor = HashingExecutor(workers=2, queue_size=2, timeout=5, retry_after=1)
+        release = threading.Event()
+
+        def attempt(_number):
+            try:
+                return executor.run(release.wait, 5)
+            except HashingUnavailable:
+                return 'rejected'
+
+        with ThreadPoolExecutor(max_workers=6) as clients:
+            futures = [clients.submit(attempt, number) for number in range(6)]
+            time.sleep(0.5)
+            # Two hashing, two waiting for a worker, two turned away.
+            self.assertEqual(sum(not future.done() for future in futures), 4)
+            release.set()
+            outcomes = [future.result() for future in futures]
+        self.assertEqual(outcomes.count(True), 4)
+        self.assertEqual(outcomes.count('rejected'), 2)
+
+    def test_busy_hashing_answers_503_with_retry_after(self):
+        executor = HashingExecutor(workers=1, queue_size=0, timeout=5, retry_after=3)
+        executor._slots.acquire()
+        self.addCleanup(executor._slots.release)
+        with mock.patch('accounts.hashing._executor', executor):
+            response = APIClient().post('/auth/login', {'email': 'student@example.com', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create(username='admin', email='admin@example.com', is_superuser=True)
+        User.objects.create(username='taken', email='taken@example.com', is_student=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def run_import(self, response):
+        self.assertEqual(response.status_code, 202)
+        import_id = response.data['import']['id']
+        self.assertEqual(response.data['import']['status'], UserImport.PENDING)
+        run_user_import(import_id)
+        return self.client.get('/auth/users/bulk/{}'.format(import_id)).data['import']
+
+    def test_rows_are_validated_and_duplicates_reported(self):
+        rows = [
+            {'username': 'alice', 'email': 'alice@example.com', 'password': 'secret', 'is_student': True},
+            {'username': 'bob', 'password': 'secret', 'is_student': True},
+            {'username': 'ALICE', 'email': 'alice2@example.com', 'password': 'secret', 'is_student': True},
+            {'username': 'carol', 'email': 'Alice@example.com', 'password': 'secret', 'is_student': True},
+            {'username': 'dave', 'email': 'TAKEN@example.com', 'password': 'secret', 'is_student': True},
+            {'username': 'taken', 'email': 'erin@example.com', 'password': 'secret', 'is_student': True},
+            {'username': 'frank', 'email': 'frank@example.com', 'password': 'secret', 'is_student': True, 'is_teacher': True},
+        ]
+        user_import = self.run_import(self.client.post('/auth/users/bulk', rows, format='json'))
+
+        self.assertEqual(user_import['status'], UserImport.DONE)
+        self.assertEqual((user_import['users_created'], user_import['rows_failed']), (1, 6))
+        errors = {error['row']: error['errors'] for error in user_import['report']['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6, 7])
+        self.assertIn('email', errors[2])
+        self.assertIn('username', errors[3])
+        self.assertIn('email', errors[4])
+        self.assertIn('email', errors[5])
+        self.assertIn('username', errors[6])
+        self.assertIn('non_field_errors', errors[7])
+        self.assertTrue(User.objects.get(username='alice').check_password('secret'))
+        # The stored rows are removed once read.
+        self.assertFalse(UserImport.objects.get(pk=user_import['id']).source)
+
+    def test_json_lines_and_csv_files_are_imported(self):
+        lines = '\n'.join([
+            '{"username": "alice", "email": "alice@example.com", "password": "secret", "is_teacher": true}',
+            '{"username": "bob", "email": "bob@example.com", "password": "secret", "is_student": true}',
+        ])
+        response = self.client.post('/auth/users/bulk', lines, content_type='application/x-ndjson')
+        self.assertEqual(self.run_import(response)['users_created'], 2)
+
+        roster = 'username,email,password,is_student\ncarol,carol@example.com,secret,true\ncarol,dave@example.com,secret,true\n'
+        response = self.client.post('/auth/users/bulk', {'file': SimpleUploadedFile('roster.csv', roster.encode())}, format='multipart')
+        user_import = self.run_import(response)
+        self.assertEqual((user_import['users_created'], user_import['rows_failed']), (1, 1))
+        self.assertEqual(user_import['report']['errors'][0]['row'], 2)
+
+    def test_imports_are_private_to_their_requester(self):
+        response = self.client.post('/auth/users/bulk', [], format='json')
+        other = User.objects.create(username='other', email='other@example.com', is_superuser=True)
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertEqual(client.get('/auth/users/bulk/{}'.format(response.data['import']['id'])).status_code, 404)
+
+
+@override_settings(USER_ACTIVITY={'FLUSH_INTERVAL': 0, 'RESOLUTION': 30, 'ACTIVE_WINDOW': 300})
+class ActivityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number))
+            for number in range(3)
+        ]
+
+    def test_the_flush_is_queued_instead_of_run_on_the_request(self):
+        tracker = ActivityTracker()
+        with mock.patch('accounts.activity.run_in_background') as run_in_background:
+            with self.assertNumQueries(0):
+                tracker.touch(self.users[0].pk)
+        run_in_background.assert_called_once_with(tracker.flush, key='user-activity-flush')
+
+        self.assertEqual(tracker.flush(), 1)
+        self.users[0].refresh_from_db()
+        self.assertIsNotNone(self.users[0].last_login)
+
+    def test_activity_of_many_users_is_read_at_once(self):
+        with mock.patch('accounts.activity.tracker', ActivityTracker()), \
+                mock.patch('accounts.activity.run_in_background'):
+            record_activity(self.users[0])
+            record_activity(self.users[2])
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertEqual(active_user_ids([user.pk for user in self.users]), {self.users[0].pk, self.users[2].pk})
+        get_many.assert_called_once()
@@ -0,0 +1,56 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+'''
+A small in-process pool for work that should not run on the request
+path (image processing, cleanup jobs, ...). Jobs are submitted once the
+surrounding transaction commits and can be de-duplicated by key, so the
+same piece of work is never queued twice while it is still pending.
+'''
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                thread_name_prefix='background',
+            )
+    return _executor
+
+
+def _run(key, fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception('Background job %s failed', key or fn.__name__)
+    finally:
+        connections.close_all()
+        if key is not None:
+            with _lock:
+                _pending.discard(key)
+
+
+def _submit(key, fn, args, kwargs):
+    if key is not None:
+        with _lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+    _get_executor().submit(_run, key, fn, args, kwargs)
+
+
+def run_in_background(fn, *args, key=None, **kwargs):
+    """ Queues `fn(*args, **kwargs)` after the current transaction commits. """
+    transaction.on_commit(lambda: _submit(key, fn, args, kwargs))
@@ -0,0 +1,82 @@
+import hashlib
+import uuid
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from classroom.models import Classroom
+from classroom.versions import current_version, with_versions
+
+
+def parse_classroom_id(value):
+  """
+  Turns a classroom id from the URL or request body into a UUID, so the
+  lookup hits the primary-key index instead of comparing `id::text`.
+  """
+  try:
+    return uuid.UUID(str(value))
+  except (TypeError, ValueError, AttributeError):
+    raise Http404
+
+
+def resolve_classroom(request, value):
+  """ Fetches the classroom (with its version) once per request and remembers it on the request. """
+  classroom_id = parse_classroom_id(value)
+  resolved = request.__dict__.setdefault('_resolved_classrooms', {})
+  if classroom_id not in resolved:
+    resolved[classroom_id] = get_object_or_404(
+      with_versions(Classroom.objects.select_related('teacher_id')), pk=classroom_id, deleted_at__isnull=True
+    )
+  return resolved[classroom_id]
+
+
+class ClassroomMixin:
+  '''
+  Shared classroom lookup for classroom-scoped views. The id is read from
+  the `classroom_url_kwarg` URL keyword argument.
+  '''
+  classroom_url_kwarg = 'classroom'
+
+  def get_classroom(self):
+    return resolve_classroom(self.request, self.kwargs.get(self.classroom_url_kwarg))
+
+
+class VersionedListMixin(ClassroomMixin):
+  '''
+  Conditional GET for classroom-scoped lists. The ETag covers the
+  classroom's version counter, the user and the full request path (query
+  string included, so every page has its own tag). Lists that show
+  something the version does not track add it through `etag_extra()`.
+  Views call `not_modified()` once access is checked and return its 304
+  response if there is one, before running any list query.
+  '''
+  etag = None
+
+  def etag_extra(self):
+    return ''
+
+  def list_etag(self):
+    classroom = self.get_classroom()
+    digest = hashlib.md5('{}|{}|{}|{}'.format(
+      current_version(classroom), self.request.user.pk, self.request.get_full_path(), self.etag_extra()
+    ).encode()).hexdigest()
+    return quote_etag(digest)
+
+  def not_modified(self):
+    self.etag = self.list_etag()
+    if self.etag in parse_etags(self.request.META.get('HTTP_IF_NONE_MATCH', '')):
+      return Response(status=status.HTTP_304_NOT_MODIFIED)
+    return None
+
+  def finalize_response(self, request, response, *args, **kwargs):
+    response = super().finalize_response(request, response, *args, **kwargs)
+    if self.etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+      response['ETag'] = self.etag
+      patch_vary_headers(response, ('Authorization', ))
+      patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,34 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+  '''
+  Cursor pagination on the primary key, so every page is an indexed range
+  scan no matter how deep the client pages. The page is returned under the
+  key the view used before pagination (`results_key`), next to opaque
+  `next`/`previous` links. Clients that send neither `cursor` nor
+  `page_size` get the whole list under the same key, as before.
+  '''
+  page_size = 50
+  page_size_query_param = 'page_size'
+  max_page_size = 500
+  ordering = 'id'
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.results_key = getattr(view, 'results_key', 'results')
+    self.paginated = any(
+      param in request.query_params for param in (self.cursor_query_param, self.page_size_query_param)
+    )
+    if not self.paginated:
+      return list(queryset)
+    return super().paginate_queryset(queryset, request, view)
+
+  def get_paginated_response(self, data):
+    if not self.paginated:
+      return Response({self.results_key: data})
+    return Response({
+      self.results_key: data,
+      'next': self.get_next_link(),
+      'previous': self.get_previous_link(),
+    })
@@ -10,8 +10,12 @@ from classroom.models import (
   JoinRequests,
   Assignment,
   ReferenceMaterial,
-  AssignmentSubmission
+  AssignmentSubmission,
+  ChunkedUpload,
+  ClassroomDeletion
 )
+from classroom.grading import STUDENT_KEYS
+from accounts.activity import active_user_ids, is_active_now
 from accounts.api.serializers import UserSerializer
 
 User = auth.get_user_model()
@@ -85,16 +89,45 @@ class JoinRequestSerializer(serializers.ModelSerializer):
 
     return instance
 
+class JoinRequestBulkSerializer(serializers.Serializer):
+  ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+  all = serializers.BooleanField(required=False, default=False)
+
+  def validate(self, data):
+    if data.get('all') == bool(data.get('ids')):
+      raise serializers.ValidationError(_('Provide either a list of request ids or "all".'))
+    return data
+
+class RosterSerializer(serializers.Serializer):
+  entries = serializers.ListField(child=serializers.CharField(max_length=60), allow_empty=False)
+
+class ClassroomStudentsListSerializer(serializers.ListSerializer):
+  ''' Looks up every listed student's activity in one cache call. '''
+  def to_representation(self, data):
+    enrollments = list(data)
+    self.child.context['active_students'] = active_user_ids(
+      [enrollment.student_id_id for enrollment in enrollments]
+    )
+    return super().to_representation(enrollments)
+
 class ClassroomStudentsSerializer(serializers.ModelSerializer):
   student = serializers.SerializerMethodField()
+  active_now = serializers.SerializerMethodField()
   class Meta:
     model = ClassroomStudents
-    fields = ('id', 'student', )
+    fields = ('id', 'student', 'active_now', )
+    list_serializer_class = ClassroomStudentsListSerializer
 
   def get_student(self, obj):
     student = UserSerializer(obj.student_id).data
     return student
 
+  def get_active_now(self, obj):
+    active = self.context.get('active_students')
+    if active is not None:
+      return obj.student_id_id in active
+    return is_active_now(obj.student_id)
+
 class AssignmentSerializer(serializers.ModelSerializer):
   class Meta:
     model = Assignment
@@ -206,6 +239,55 @@ class AssignmentSubmissionTeacherUpdateSerializer(serializers.ModelSerializer):
     instance.save()
     return instance
 
+class GradeEntrySerializer(serializers.Serializer):
+  submission  = serializers.IntegerField(required=False)
+  student_id  = serializers.IntegerField(required=False)
+  username    = serializers.CharField(required=False, max_length=30)
+  email       = serializers.CharField(required=False, max_length=254)
+  student     = serializers.CharField(required=False, max_length=254)
+  marks       = serializers.IntegerField(min_value=0)
+
+  def validate(self, data):
+    if len([key for key in ('submission', ) + STUDENT_KEYS if key in data]) != 1:
+      raise serializers.ValidationError(
+        _('Identify each entry by exactly one of submission, student_id, username, email or student.')
+      )
+    return data
+
+class GradeBulkSerializer(serializers.Serializer):
+  grades = GradeEntrySerializer(many=True, allow_empty=False)
+
+class ClassroomDeletionSerializer(serializers.ModelSerializer):
+  progress = serializers.SerializerMethodField()
+  class Meta:
+    model = ClassroomDeletion
+    fields = ('classroom_id', 'course_name', 'status', 'step', 'deleted', 'total', 'files', 'progress', 'error', 'created', 'finished', )
+
+  def get_progress(self, obj):
+    if obj.status == ClassroomDeletion.DONE:
+      return 100
+    return round(100.0 * obj.deleted / obj.total, 1) if obj.total else 0
+
+class ChunkedUploadCreateSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = ChunkedUpload
+    fields = ('target', 'object_id', 'filename', 'size', 'sha256', )
+
+  def validate_size(self, value):
+    if value <= 0:
+      raise serializers.ValidationError(_('The file size must be positive.'))
+    return value
+
+  def validate_sha256(self, value):
+    if value and len(value) != 64:
+      raise serializers.ValidationError(_('Provide the hex encoded SHA-256 of the file.'))
+    return value
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = ChunkedUpload
+    fields = ('id', 'target', 'object_id', 'filename', 'size', 'offset', 'completed', )
+
 # class AssignmentGradesSerializer(serializers.ModelSerializer):
 #   class Meta:
 #     model = AssignmentGrades
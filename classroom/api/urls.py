@@ -11,14 +11,27 @@ urlpatterns = [
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/join_requests$', JoinRequestsListAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/reference_materials$', ReferenceMaterialCreateListAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/students$', ClassroomStudentsListAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/deletion$', ClassroomDeletionAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/dashboard$', ClassroomDashboardAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/gradebook$', ClassroomGradebookAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/statistics$', ClassroomStatisticsAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/students/roster$', ClassroomRosterEnrollAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/students/(?P<pk>[0-9]+)$', ClassroomStudentsRemoveAPIView.as_view()),
 
 
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/uploads$', ChunkedUploadCreateAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/uploads/(?P<pk>[0-9A-Za-z_\-]+)$', ChunkedUploadAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/uploads/(?P<pk>[0-9A-Za-z_\-]+)/complete$', ChunkedUploadCompleteAPIView.as_view()),
+
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/join_requests/bulk$', JoinRequestBulkAcceptRejectAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/join_requests/(?P<pk>[0-9]+)$', JoinRequestAcceptRejectAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<pk>[0-9]+)$', AssignmentRetriveUpdateDeleteAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/reference_materials/(?P<pk>[0-9]+)$', ReferenceMaterialRetriveUpdateAPIView.as_view()),
 
 
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<assignment>[0-9]+)/statistics$', AssignmentStatisticsAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<assignment>[0-9]+)/submissions$', AssignmentSubmissionCreateListAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<assignment>[0-9]+)/submissions/archive$', AssignmentSubmissionArchiveAPIView.as_view()),
+    re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<assignment>[0-9]+)/submissions/grades$', AssignmentGradesBulkAPIView.as_view()),
     re_path(r'^classrooms/(?P<classroom>[0-9A-Za-z_\-]+)/assignments/(?P<assignment>[0-9]+)/submissions/(?P<pk>[0-9]+)$', AssignmentSubmissionUpdateAPIView.as_view()),
 ]
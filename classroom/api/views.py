@@ -1,16 +1,18 @@
+import csv
 import os
 
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.mixins import ListModelMixin
-from rest_framework.parsers import FileUploadParser
 
+from accounts.activity import activity_period
 from accounts.models import User
 from classroom.models import (
   Classroom,
@@ -18,14 +20,28 @@ from classroom.models import (
   JoinRequests,
   Assignment,
   ReferenceMaterial,
-  AssignmentSubmission
+  AssignmentSubmission,
+  ChunkedUpload,
+  ClassroomDeletion
 )
+from classroom.dashboard import UnknownSection, build_dashboard, parse_sections
+from classroom.deletion import mark_deleted
+from classroom.enrollment import enroll_roster, read_roster, resolve_join_requests
+from classroom.gradebook import get_gradebook, render_gradebook
+from classroom.grade_statistics import assignment_statistics, classroom_statistics
+from classroom.grading import grade_submissions, iter_grade_rows
+from classroom.archives import safe_entry_name, stream_zip
+from classroom.media import normalize_media_name, serve_media
+from classroom.membership import attends, teaches
+from classroom.uploads import UploadError, complete_upload, start_upload, write_chunk
+from .mixins import ClassroomMixin, VersionedListMixin, parse_classroom_id, resolve_classroom
+from .pagination import KeysetPagination
 from .serializers import *
 
 def hasClassroomPermission(user, classroom):
   if user.is_student:
-    return classroom.students.filter(student_id=user).exists()
-  return classroom.teacher_id.id == user.id
+    return attends(user, classroom)
+  return teaches(user, classroom)
 
 def hasCreatedAssignment(user, assignment):
   return user.id == assignment.teacher.id
@@ -72,8 +88,8 @@ class JoinClassAPIView(generics.GenericAPIView):
 
   def post(self, request, *args, **kwargs):
     try:
-      classroom = Classroom.objects.get(id__iexact=self.request.data.get('classroom_id'))
-    except:
+      classroom = Classroom.objects.get(pk=parse_classroom_id(self.request.data.get('classroom_id')), deleted_at__isnull=True)
+    except (Http404, Classroom.DoesNotExist):
       return Response({
         'message': _('Enter valid Clasroom Id')
       },status=status.HTTP_404_NOT_FOUND)
@@ -82,7 +98,7 @@ class JoinClassAPIView(generics.GenericAPIView):
     if user.is_teacher:
       return unauthorizedRequest()
 
-    if classroom.students.filter(student_id=user).exists():
+    if attends(user, classroom):
       return Response({
         'message': _('You are already enrolled in the course')
       }, status=status.HTTP_403_FORBIDDEN)
@@ -107,11 +123,12 @@ class JoinClassAPIView(generics.GenericAPIView):
       'message': _('You have been successfully enrolled to the classroom.')
     }, status.HTTP_202_ACCEPTED)
 
-class ClassRetriveUpdateDeleteAPIView(generics.GenericAPIView):
+class ClassRetriveUpdateDeleteAPIView(ClassroomMixin, generics.GenericAPIView):
   permissions = [permissions.IsAuthenticated]
+  classroom_url_kwarg = 'pk'
 
   def get_object(self):
-    return Classroom.objects.get(id__iexact=self.kwargs.get('pk'))
+    return self.get_classroom()
 
   def get(self, request, *args, **kwargs):
     classroom = self.get_object()
@@ -145,39 +162,83 @@ class ClassRetriveUpdateDeleteAPIView(generics.GenericAPIView):
     user = request.user
     if user.is_student or not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
-    classroom.delete()
+    deletion = mark_deleted(classroom, user)
     return Response({
-      'message' : 'Classroom successfully deleted.',
-    },status=status.HTTP_200_OK)
+      'message' : 'Classroom is being deleted.',
+      'deletion': ClassroomDeletionSerializer(deletion).data,
+    },status=status.HTTP_202_ACCEPTED)
+
+class ClassroomDeletionAPIView(generics.GenericAPIView):
+  ''' Progress of a classroom deletion, for the teacher who asked for it. '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    deletion = get_object_or_404(
+      ClassroomDeletion,
+      classroom_id=parse_classroom_id(kwargs.get('classroom')),
+      requested_by=request.user
+    )
+    return Response({
+      'deletion': ClassroomDeletionSerializer(deletion).data
+    }, status=status.HTTP_200_OK)
+
+class ClassroomDashboardAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  The classroom details together with the first page of its assignments,
+  reference materials, students, quizzes and (for teachers) join requests,
+  plus counts and a pending-work summary. `?sections=` takes a comma
+  separated subset of these.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    try:
+      sections = parse_sections(request.query_params.get('sections'), user)
+    except UnknownSection as error:
+      return Response({
+        'error': _('Unknown dashboard sections: {}').format(error)
+      }, status=status.HTTP_400_BAD_REQUEST)
 
-class JoinRequestsListAPIView(generics.GenericAPIView):
+    return Response({
+      'dashboard': build_dashboard(classroom, user, sections)
+    }, status=status.HTTP_200_OK)
+
+class JoinRequestsListAPIView(VersionedListMixin, generics.GenericAPIView):
   permission_classes = [permissions.IsAuthenticated]
+  pagination_class = KeysetPagination
+  results_key = 'join_requests'
 
   def get_object(self):
-    return Classroom.objects.get(id__iexact=self.kwargs.get('classroom'))
+    return self.get_classroom()
 
   def get(self, request, *args, **kwargs):
     classroom = self.get_object()
     user = request.user
     if user.is_student or not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
+    not_modified = self.not_modified()
+    if not_modified:
+      return not_modified
 
-    join_requests = classroom.pending_requests.all()
+    join_requests = self.paginate_queryset(classroom.pending_requests.select_related('student_id'))
     serializer = JoinRequestSerializer(join_requests, many=True)
-    return Response({
-      'join_requests': serializer.data,
-    }, status=status.HTTP_200_OK)
+    return self.get_paginated_response(serializer.data)
 
 
-class JoinRequestAcceptRejectAPIView(generics.GenericAPIView):
+class JoinRequestAcceptRejectAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = [permissions.IsAuthenticated,]
 
   def get_object(self):
-    return JoinRequests.objects.get(id = self.kwargs.get('pk'))
+    return get_object_or_404(self.get_classroom().pending_requests, id=self.kwargs.get('pk'))
 
   def post(self, request, *args, **kwargs):
     join_request = self.get_object()
-    classroom = join_request.classroom_id
+    classroom = self.get_classroom()
     student = join_request.student_id
     user = request.user
 
@@ -192,7 +253,7 @@ class JoinRequestAcceptRejectAPIView(generics.GenericAPIView):
 
   def delete(self, request, *args, **kwargs):
     join_request = self.get_object()
-    classroom = join_request.classroom_id
+    classroom = self.get_classroom()
     student = join_request.student_id
     user = request.user
 
@@ -203,11 +264,46 @@ class JoinRequestAcceptRejectAPIView(generics.GenericAPIView):
 
     return Response({}, status=status.HTTP_200_OK)
 
-class ClassroomStudentsListAPIView(generics.GenericAPIView):
+class JoinRequestBulkAcceptRejectAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Accepts (POST) or rejects (DELETE) many join requests at once. The body
+  holds either `ids`, a list of join request ids, or `all: true` for every
+  pending request of the classroom.
+  '''
+  permission_classes = [permissions.IsAuthenticated,]
+
+  def handle(self, request, accept):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    serializer = JoinRequestBulkSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    request_ids = None if serializer.validated_data['all'] else serializer.validated_data['ids']
+    handled = resolve_join_requests(classroom, request_ids, accept=accept)
+
+    return Response({
+      'accepted' if accept else 'rejected': handled,
+    }, status=status.HTTP_202_ACCEPTED if accept else status.HTTP_200_OK)
+
+  def post(self, request, *args, **kwargs):
+    return self.handle(request, accept=True)
+
+  def delete(self, request, *args, **kwargs):
+    return self.handle(request, accept=False)
+
+class ClassroomStudentsListAPIView(VersionedListMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated, )
+  pagination_class = KeysetPagination
+  results_key = 'students'
+
+  def etag_extra(self):
+    # `active_now` changes without any write to the classroom.
+    return activity_period()
 
   def get_object(self):
-    return Classroom.objects.get(id__iexact=self.kwargs.get('classroom'))
+    return self.get_classroom()
 
   def get(self, request, *args, **kwargs):
     classroom = self.get_object()
@@ -215,47 +311,79 @@ class ClassroomStudentsListAPIView(generics.GenericAPIView):
 
     if not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
+    not_modified = self.not_modified()
+    if not_modified:
+      return not_modified
 
-    queryset = classroom.students.all()
+    queryset = self.paginate_queryset(classroom.students.select_related('student_id'))
     students = ClassroomStudentsSerializer(queryset, many=True).data
-    return Response({
-      'students' : students
-    }, status=status.HTTP_200_OK)
+    return self.get_paginated_response(students)
+
+class ClassroomRosterEnrollAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Enrolls students from a roster of usernames or emails, given either as
+  an uploaded CSV/text `file` (one entry per row) or as a JSON `entries`
+  list. Entries that do not match a student are reported back.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def post(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
 
-class ClassroomStudentsRemoveAPIView(generics.GenericAPIView):
+    upload = request.FILES.get('file')
+    if upload is not None:
+      try:
+        entries = read_roster(upload.file)
+      except (UnicodeDecodeError, csv.Error):
+        return Response({
+          'error': _('The roster file must be UTF-8 encoded CSV or text.')
+        }, status=status.HTTP_400_BAD_REQUEST)
+    else:
+      serializer = RosterSerializer(data=request.data)
+      serializer.is_valid(raise_exception=True)
+      entries = (entry.strip() for entry in serializer.validated_data['entries'] if entry.strip())
+
+    report = enroll_roster(classroom, entries)
+    return Response(report, status=status.HTTP_200_OK)
+
+class ClassroomStudentsRemoveAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated, )
 
   def delete(self, request, *args, **kwargs):
     user = request.user
-    classroom = Classroom.objects.get(id__iexact=kwargs.get('classroom'))
+    classroom = self.get_classroom()
     if user.is_student or not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
 
-    instance = ClassroomStudents.objects.get(id__exact=kwargs.get('pk'))
+    instance = get_object_or_404(classroom.students, id=kwargs.get('pk'))
     instance.delete()
 
     return Response({
       'message' : 'Student has been removed.'
     }, status=status.HTTP_200_OK)
 
-class AssignmentCreateListAPIView(generics.GenericAPIView):
+class AssignmentCreateListAPIView(VersionedListMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated,)
-  parser_class = (FileUploadParser,)
+  pagination_class = KeysetPagination
+  results_key = 'assignments'
 
   def get_object(self):
-    return Classroom.objects.get(id__iexact = self.kwargs.get('classroom'))
+    return self.get_classroom()
 
   def get(self, request, *args, **kwargs):
     classroom = self.get_object()
     user = request.user
     if not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
-    queryset = classroom.assignments
+    not_modified = self.not_modified()
+    if not_modified:
+      return not_modified
+    queryset = self.paginate_queryset(classroom.assignments.all())
     serializer = AssignmentSerializer(queryset, many=True)
-    print(serializer.data)
-    return Response({
-      'assignments' : serializer.data
-    }, status=status.HTTP_200_OK)
+    return self.get_paginated_response(serializer.data)
 
   def post(self, request, *args, **kwargs):
     classroom = self.get_object()
@@ -275,15 +403,15 @@ class AssignmentCreateListAPIView(generics.GenericAPIView):
       'assignment': AssignmentSerializer(assignment).data
     }, status=status.HTTP_201_CREATED)
 
-class AssignmentRetriveUpdateDeleteAPIView(generics.GenericAPIView):
+class AssignmentRetriveUpdateDeleteAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = [permissions.IsAuthenticated, ]
 
   def get_object(self):
-    return Assignment.objects.get(id__iexact = self.kwargs.get('pk'))
+    return get_object_or_404(self.get_classroom().assignments, id=self.kwargs.get('pk'))
 
   def get(self, request, *args, **kwargs):
     assignment = self.get_object()
-    classroom = assignment.classroom_id
+    classroom = self.get_classroom()
     user = request.user
 
     if not hasClassroomPermission(user, classroom):
@@ -328,11 +456,11 @@ class AssignmentRetriveUpdateDeleteAPIView(generics.GenericAPIView):
       'message' : _('Assignment successfully deleted'),
     }, status=status.HTTP_200_OK)
 
-class ReferenceMaterialCreateListAPIView(generics.GenericAPIView):
+class ReferenceMaterialCreateListAPIView(VersionedListMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated, )
 
   def get_object(self):
-    return Classroom.objects.get(id__iexact=self.kwargs.get('classroom'))
+    return self.get_classroom()
 
   def get(self, request, *args, **kwargs):
     classroom = self.get_object()
@@ -340,6 +468,9 @@ class ReferenceMaterialCreateListAPIView(generics.GenericAPIView):
 
     if not hasClassroomPermission(user, classroom):
       return unauthorizedRequest()
+    not_modified = self.not_modified()
+    if not_modified:
+      return not_modified
 
     queryset = classroom.reference_materials
     serializer = ReferenceMaterialSerializer(queryset, many=True)
@@ -365,15 +496,15 @@ class ReferenceMaterialCreateListAPIView(generics.GenericAPIView):
       'reference_material': ReferenceMaterialSerializer(reference_material).data
     }, status=status.HTTP_201_CREATED)
 
-class ReferenceMaterialRetriveUpdateAPIView(generics.GenericAPIView):
+class ReferenceMaterialRetriveUpdateAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = [permissions.IsAuthenticated, ]
 
   def get_object(self):
-    return ReferenceMaterial.objects.get(id__iexact = self.kwargs.get('pk'))
+    return get_object_or_404(self.get_classroom().reference_materials, id=self.kwargs.get('pk'))
 
   def get(self, request, *args, **kwargs):
     reference_material = self.get_object()
-    classroom = reference_material.classroom_id
+    classroom = self.get_classroom()
     user = request.user
 
     if user.is_student or not hasClassroomPermission(user, classroom):
@@ -385,7 +516,7 @@ class ReferenceMaterialRetriveUpdateAPIView(generics.GenericAPIView):
 
   def patch(self, request, *args, **kwargs):
     reference_material = self.get_object()
-    classroom = reference_material.classroom_id
+    classroom = self.get_classroom()
     user = request.user
 
     if user.is_student or not hasCreatedReferenceMaterial(user, reference_material) or not hasClassroomPermission(user, classroom):
@@ -399,16 +530,18 @@ class ReferenceMaterialRetriveUpdateAPIView(generics.GenericAPIView):
       'assignment': ReferenceMaterialSerializer(instance).data
     },status=status.HTTP_200_OK)
 
-class AssignmentSubmissionCreateListAPIView(generics.GenericAPIView):
+class AssignmentSubmissionCreateListAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated, )
+  pagination_class = KeysetPagination
+  results_key = 'submissions'
 
   def get(self, request, *args, **kwargs):
     user = request.user
 
     try:
-      classroom  = Classroom.objects.get(id__exact=kwargs.get('classroom'))
-      assignment = Assignment.objects.get(id__exact=kwargs.get('assignment'))
-    except:
+      classroom  = self.get_classroom()
+      assignment = classroom.assignments.get(id__exact=kwargs.get('assignment'))
+    except (Http404, Assignment.DoesNotExist):
       return Response({
         'error' : _('No such assignment exists')
       }, status=status.HTTP_404_NOT_FOUND)
@@ -418,19 +551,16 @@ class AssignmentSubmissionCreateListAPIView(generics.GenericAPIView):
         'error': _('Not authorized to do this action')
       })
 
-    queryset = assignment.assignment_submissions.all()
-    print(queryset)
+    queryset = self.paginate_queryset(assignment.assignment_submissions.select_related('student_id'))
     serializer = AssignmentSubmissionDetailListSerializer(queryset, many=True)
-    return Response({
-      'submissions' : serializer.data
-    })
+    return self.get_paginated_response(serializer.data)
 
   def post(self, request, *args, **kwargs):
     user = request.user
     try:
-      classroom  = Classroom.objects.get(id__exact=kwargs.get('classroom'))
-      assignment = Assignment.objects.get(id__exact=kwargs.get('assignment'))
-    except:
+      classroom  = self.get_classroom()
+      assignment = classroom.assignments.get(id__exact=kwargs.get('assignment'))
+    except (Http404, Assignment.DoesNotExist):
       return Response({
         'error' : _('No such assignment exists')
       }, status=status.HTTP_404_NOT_FOUND)
@@ -456,15 +586,279 @@ class AssignmentSubmissionCreateListAPIView(generics.GenericAPIView):
       'message': 'Your file has been submitted'
     },status=status.HTTP_202_ACCEPTED)
 
-class AssignmentSubmissionUpdateAPIView(generics.GenericAPIView):
+class AssignmentSubmissionArchiveAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Streams every submission of an assignment as one ZIP archive, with one
+  entry per student. Nothing is buffered beyond a single read chunk, so
+  the download starts immediately regardless of the total size.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+    assignment = get_object_or_404(classroom.assignments, id=kwargs.get('assignment'))
+
+    submissions = (
+      assignment.assignment_submissions
+      .select_related('student_id')
+      .order_by('student_id__username')
+      .iterator()
+    )
+
+    def entries():
+      for submission in submissions:
+        if not submission.file:
+          continue
+        student = submission.student_id
+        label = student.username
+        if student.get_fullname():
+          label = '{} - {}'.format(label, student.get_fullname())
+        extension = os.path.splitext(submission.file.name)[1]
+        yield safe_entry_name(label) + extension, submission.file.name
+
+    response = StreamingHttpResponse(stream_zip(entries()), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="{}.zip"'.format(
+      safe_entry_name('{} submissions'.format(assignment.description))
+    )
+    return response
+
+class AssignmentSubmissionUpdateAPIView(ClassroomMixin, generics.GenericAPIView):
   permission_classes = (permissions.IsAuthenticated, )
 
   def patch(self, request, *args, **kwargs):
-    instance = AssignmentSubmission.objects.get(id__iexact=kwargs.get('pk'))
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    instance = get_object_or_404(
+      AssignmentSubmission,
+      id=kwargs.get('pk'),
+      assignment_id=kwargs.get('assignment'),
+      assignment_id__classroom_id=classroom
+    )
     serializer = AssignmentSubmissionTeacherUpdateSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     instance = serializer.update(instance, serializer.validated_data)
     return Response({
       'message' : 'Marks updated successfully.',
       'submission' : AssignmentSubmissionDetailListSerializer(instance).data
-    },status=status.HTTP_200_OK)
\ No newline at end of file
+    },status=status.HTTP_200_OK)
+
+class AssignmentGradesBulkAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Grades many submissions of an assignment in one request. The body is a
+  JSON `grades` list (or a bare list) of entries naming a `submission`, a
+  `student_id`, a `username`, an `email` or a `student` (username or
+  email) plus the `marks`, or an uploaded CSV `file` with the same
+  columns. Either every
+  entry is saved or, if any is invalid, none is and the errors are listed.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def post(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+    assignment = get_object_or_404(classroom.assignments, id=kwargs.get('assignment'))
+
+    upload = request.FILES.get('file')
+    try:
+      if upload is not None:
+        data = {'grades': list(iter_grade_rows(upload.file))}
+      elif isinstance(request.data, list):
+        data = {'grades': request.data}
+      else:
+        data = request.data
+    except (UnicodeDecodeError, csv.Error):
+      return Response({
+        'error': _('The grades file must be a UTF-8 encoded CSV file.')
+      }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = GradeBulkSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    report = grade_submissions(assignment, serializer.validated_data['grades'])
+    if report['errors']:
+      return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report, status=status.HTTP_200_OK)
+
+class ClassroomGradebookAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  The students x assignments marks matrix of a classroom with each
+  student's total and percentage, served from the materialized gradebook.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    return Response({
+      'gradebook': render_gradebook(get_gradebook(classroom.pk))
+    }, status=status.HTTP_200_OK)
+
+class AssignmentStatisticsAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Distribution of the marks of one assignment: mean, median, spread,
+  percentiles, a histogram over 0..max_marks and the number of enrolled
+  students without a submission.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+    assignment = get_object_or_404(classroom.assignments, id=kwargs.get('assignment'))
+
+    return Response({
+      'statistics': assignment_statistics(assignment)
+    }, status=status.HTTP_200_OK)
+
+class ClassroomStatisticsAPIView(ClassroomMixin, generics.GenericAPIView):
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def get(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    if user.is_student or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    return Response({
+      'statistics': classroom_statistics(classroom)
+    }, status=status.HTTP_200_OK)
+
+def uploadError(error):
+  return Response({
+    'error': error.message
+  }, status=error.status_code)
+
+class ChunkedUploadCreateAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Starts a resumable upload. Teachers upload files for their assignments
+  and reference materials; students upload submissions, in which case
+  `object_id` is the assignment being submitted to.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def post(self, request, *args, **kwargs):
+    classroom = self.get_classroom()
+    user = request.user
+    serializer = ChunkedUploadCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    submitting = data['target'] == ChunkedUpload.SUBMISSION
+    if submitting != bool(user.is_student) or not hasClassroomPermission(user, classroom):
+      return unauthorizedRequest()
+
+    try:
+      upload = start_upload(classroom, user, **data)
+    except UploadError as error:
+      return uploadError(error)
+
+    return Response({
+      'upload': ChunkedUploadSerializer(upload).data
+    }, status=status.HTTP_201_CREATED)
+
+class ChunkedUploadMixin(ClassroomMixin):
+  def get_object(self):
+    return get_object_or_404(
+      ChunkedUpload, pk=parse_classroom_id(self.kwargs.get('pk')),
+      classroom=self.get_classroom(), owner=self.request.user
+    )
+
+class ChunkedUploadAPIView(ChunkedUploadMixin, generics.GenericAPIView):
+  '''
+  GET (or HEAD) reports how many bytes have been received, so an
+  interrupted client knows where to resume. PATCH streams the request body
+  into the file at the position given by the `Upload-Offset` header; an
+  optional `Upload-Checksum: sha256 <hex>` header verifies the chunk.
+  '''
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def offset_response(self, upload):
+    response = Response({
+      'upload': ChunkedUploadSerializer(upload).data
+    }, status=status.HTTP_200_OK)
+    response['Upload-Offset'] = upload.offset
+    response['Upload-Length'] = upload.size
+    return response
+
+  def get(self, request, *args, **kwargs):
+    return self.offset_response(self.get_object())
+
+  def patch(self, request, *args, **kwargs):
+    upload = self.get_object()
+    try:
+      offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+      length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+      return Response({
+        'error': _('Upload-Offset and Content-Length headers are required.')
+      }, status=status.HTTP_400_BAD_REQUEST)
+
+    checksum = request.META.get('HTTP_UPLOAD_CHECKSUM', '').split()
+    chunk_sha256 = checksum[1] if len(checksum) == 2 and checksum[0].lower() == 'sha256' else None
+
+    try:
+      # Read the raw body straight from the WSGI stream, chunk by chunk.
+      upload = write_chunk(upload, offset, request._request, length, chunk_sha256)
+    except UploadError as error:
+      return uploadError(error)
+    return self.offset_response(upload)
+
+class ChunkedUploadCompleteAPIView(ChunkedUploadMixin, generics.GenericAPIView):
+  permission_classes = (permissions.IsAuthenticated, )
+
+  def post(self, request, *args, **kwargs):
+    upload = self.get_object()
+    try:
+      instance = complete_upload(upload)
+    except UploadError as error:
+      return uploadError(error)
+
+    return Response({
+      'message': _('The file has been uploaded.'),
+      'file': instance.file.url,
+    }, status=status.HTTP_200_OK)
+
+class MediaFileAPIView(ClassroomMixin, generics.GenericAPIView):
+  '''
+  Serves uploaded files. Avatars are public; classroom files require the
+  user to be a member of the classroom in the path, and submissions are
+  only visible to the classroom teacher and the submitting student.
+  '''
+  permission_classes = ()
+
+  def can_access(self, user, path):
+    parts = path.split('/')
+    if parts[0] == 'avatars':
+      return True
+    if not user.is_authenticated or len(parts) < 3:
+      return False
+    if parts[0] not in ('assignments', 'notes', 'submissions'):
+      return user.is_superuser
+
+    try:
+      classroom = resolve_classroom(self.request, parts[1])
+    except Http404:
+      return False
+    if parts[0] == 'submissions' and user.is_student:
+      return AssignmentSubmission.objects.filter(
+        assignment_id__classroom_id=classroom, student_id=user, file=path
+      ).exists()
+    return hasClassroomPermission(user, classroom)
+
+  def get(self, request, *args, **kwargs):
+    name = normalize_media_name(kwargs.get('path'))
+    if not self.can_access(request.user, name):
+      raise Http404
+    return serve_media(request, name)
@@ -0,0 +1,66 @@
+import io
+import os
+import re
+import time
+import zipfile
+
+from django.core.files.storage import default_storage
+
+'''
+ZIP archives written on the fly. zipfile can write to an unseekable
+stream (it falls back to data descriptors), so entries are produced into
+a small in-memory buffer that is drained after every chunk; memory use
+stays at one read chunk however large the archive gets. Entries are
+stored uncompressed since uploads are mostly PDFs, images and video.
+'''
+
+READ_SIZE = 64 * 1024
+UNSAFE_CHARACTERS = re.compile(r'[^\w.\- ]+')
+
+
+class _StreamBuffer(io.RawIOBase):
+  def __init__(self):
+    self._chunks = []
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    self._chunks.append(bytes(data))
+    return len(data)
+
+  def drain(self):
+    data = b''.join(self._chunks)
+    self._chunks = []
+    return data
+
+
+def safe_entry_name(name):
+  return UNSAFE_CHARACTERS.sub('_', name).strip() or 'file'
+
+
+def stream_zip(entries):
+  """
+  Yields the bytes of a ZIP archive built from (entry name, storage name)
+  pairs. Files missing from storage are skipped.
+  """
+  buffer = _StreamBuffer()
+  with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+    for entry_name, storage_name in entries:
+      try:
+        path = default_storage.path(storage_name)
+        modified = time.localtime(os.path.getmtime(path))[:6]
+        source = open(path, 'rb')
+      except (OSError, ValueError):
+        continue
+
+      info = zipfile.ZipInfo(entry_name, date_time=modified)
+      with source, archive.open(info, mode='w', force_zip64=True) as target:
+        while True:
+          data = source.read(READ_SIZE)
+          if not data:
+            break
+          target.write(data)
+          yield buffer.drain()
+      yield buffer.drain()
+  yield buffer.drain()
@@ -0,0 +1,134 @@
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+
+from classroom.api.serializers import (
+  AssignmentSerializer,
+  ClassroomSerializer,
+  ClassroomStudentsSerializer,
+  JoinRequestSerializer,
+  ReferenceMaterialSerializer,
+)
+from classroom.models import Assignment, AssignmentSubmission, Classroom, ClassroomStudents, JoinRequests, ReferenceMaterial
+from quiz.api.serializers import QuizSerializer
+from quiz.models import Quiz
+
+'''
+Everything the client shows when a classroom is opened, in one response.
+Each section is a single query capped at SECTION_LIMIT rows (the rest is
+reachable through the paginated list endpoints), and all counts come from
+one more query, so the cost does not grow with the size of the classroom.
+'''
+
+SECTIONS = ('classroom', 'assignments', 'reference_materials', 'students', 'quizzes', 'join_requests', 'summary')
+TEACHER_SECTIONS = ('join_requests', )
+SECTION_LIMIT = 50
+
+
+class UnknownSection(ValueError):
+  pass
+
+
+def parse_sections(value, user):
+  """ Turns a `sections=a,b` selector into the tuple of sections the user may see. """
+  if not value:
+    requested = SECTIONS
+  else:
+    requested = tuple(section.strip() for section in value.split(',') if section.strip())
+    unknown = [section for section in requested if section not in SECTIONS]
+    if unknown:
+      raise UnknownSection(', '.join(unknown))
+  if user.is_student:
+    requested = tuple(section for section in requested if section not in TEACHER_SECTIONS)
+  return requested
+
+
+def _count(queryset, group):
+  """ A subquery counting the rows of `queryset`, grouped on the classroom column `group`. """
+  return Subquery(
+    queryset.order_by().values(group).annotate(total=Count('pk')).values('total'),
+    output_field=IntegerField()
+  )
+
+
+def _counts(classroom, user):
+  """ All section counts in one query, as subqueries on the classroom row. """
+  today = timezone.now().date()
+  counts = {
+    'assignments': _count(Assignment.objects.filter(classroom_id=classroom), 'classroom_id'),
+    'upcoming_assignments': _count(Assignment.objects.filter(classroom_id=classroom, deadline__gte=today), 'classroom_id'),
+    'reference_materials': _count(ReferenceMaterial.objects.filter(classroom_id=classroom), 'classroom_id'),
+    'students': _count(ClassroomStudents.objects.filter(classroom_id=classroom), 'classroom_id'),
+    'quizzes': _count(Quiz.objects.filter(classroom=classroom), 'classroom'),
+  }
+  submissions = AssignmentSubmission.objects.filter(assignment_id__classroom_id=classroom)
+  if user.is_student:
+    counts['submitted_assignments'] = _count(submissions.filter(student_id=user), 'assignment_id__classroom_id')
+  else:
+    counts['join_requests'] = _count(JoinRequests.objects.filter(classroom_id=classroom), 'classroom_id')
+    counts['submissions'] = _count(submissions, 'assignment_id__classroom_id')
+    # Students who left keep their submissions; only the enrolled ones are expected.
+    enrolled = ClassroomStudents.objects.filter(classroom_id=classroom).values('student_id')
+    counts['enrolled_submissions'] = _count(submissions.filter(student_id__in=enrolled), 'assignment_id__classroom_id')
+  # Prefixed, since most names clash with the reverse relations of Classroom.
+  annotations = {'count_' + name: count for name, count in counts.items()}
+  row = Classroom.objects.filter(pk=classroom.pk).annotate(**annotations).values(*annotations).get()
+  return {name[len('count_'):]: value or 0 for name, value in row.items()}
+
+
+def _summary(counts, user):
+  if user.is_student:
+    return {
+      'pending_assignments': max(counts['assignments'] - counts['submitted_assignments'], 0),
+      'upcoming_assignments': counts['upcoming_assignments'],
+    }
+  return {
+    'pending_join_requests': counts['join_requests'],
+    'missing_submissions': max(counts['assignments'] * counts['students'] - counts['enrolled_submissions'], 0),
+    'upcoming_assignments': counts['upcoming_assignments'],
+  }
+
+
+def _assignments(classroom, user):
+  queryset = classroom.assignments.order_by('id')
+  if user.is_student:
+    queryset = queryset.annotate(submitted=Exists(
+      AssignmentSubmission.objects.filter(assignment_id=OuterRef('pk'), student_id=user)
+    ))
+  else:
+    queryset = queryset.annotate(submissions=Count('assignment_submissions'))
+  assignments = list(queryset[:SECTION_LIMIT])
+  data = AssignmentSerializer(assignments, many=True).data
+  for item, assignment in zip(data, assignments):
+    if user.is_student:
+      item['submitted'] = assignment.submitted
+    else:
+      item['submissions'] = assignment.submissions
+  return data
+
+
+def build_dashboard(classroom, user, sections=SECTIONS):
+  dashboard = {}
+  if 'classroom' in sections:
+    dashboard['classroom'] = ClassroomSerializer(classroom).data
+  if 'assignments' in sections:
+    dashboard['assignments'] = _assignments(classroom, user)
+  if 'reference_materials' in sections:
+    dashboard['reference_materials'] = ReferenceMaterialSerializer(
+      classroom.reference_materials.order_by('id')[:SECTION_LIMIT], many=True
+    ).data
+  if 'students' in sections:
+    dashboard['students'] = ClassroomStudentsSerializer(
+      classroom.students.select_related('student_id').order_by('id')[:SECTION_LIMIT], many=True
+    ).data
+  if 'quizzes' in sections:
+    dashboard['quizzes'] = QuizSerializer(classroom.quizzes.order_by('id')[:SECTION_LIMIT], many=True).data
+  if 'join_requests' in sections:
+    dashboard['join_requests'] = JoinRequestSerializer(
+      classroom.pending_requests.select_related('student_id').order_by('id')[:SECTION_LIMIT], many=True
+    ).data
+
+  counts = _counts(classroom, user)
+  dashboard['counts'] = counts
+  if 'summary' in sections:
+    dashboard['summary'] = _summary(counts, user)
+  return dashboard
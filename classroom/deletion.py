@@ -0,0 +1,136 @@
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from background import run_in_background
+from classroom.models import (
+  Classroom,
+  ClassroomDeletion,
+  ClassroomStudents,
+  ClassroomVersion,
+  JoinRequests,
+  Assignment,
+  ReferenceMaterial,
+  AssignmentSubmission,
+  ChunkedUpload
+)
+from classroom.versions import deferred_bumps
+from quiz.models import Quiz, QuizStudentPermission, Question, Answer, Sitting, StudentAnswer
+
+'''
+Background deletion of classrooms. The request only marks the classroom
+deleted (it disappears from every lookup at once) and records a
+ClassroomDeletion; the job then removes the classroom's rows leaf tables
+first, a bounded batch of primary keys at a time, so the collector never
+has more than one batch in memory and never has to cascade. Stored files
+are released by the post_delete handlers as each batch commits. Progress
+is written back to the ClassroomDeletion row after every batch.
+'''
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _steps(classroom_id):
+  """ (name, queryset, related) for everything that hangs off the classroom, leaves first. """
+  return (
+    ('student answers', StudentAnswer.objects.filter(sitting__quiz__classroom_id=classroom_id), ()),
+    ('quiz sittings', Sitting.objects.filter(quiz__classroom_id=classroom_id), ()),
+    ('quiz answers', Answer.objects.filter(question__quiz__classroom_id=classroom_id), ()),
+    ('quiz questions', Question.objects.filter(quiz__classroom_id=classroom_id), ()),
+    ('quiz permissions', QuizStudentPermission.objects.filter(quiz__classroom_id=classroom_id), ()),
+    ('quizzes', Quiz.objects.filter(classroom_id=classroom_id), ()),
+    ('submissions', AssignmentSubmission.objects.filter(assignment_id__classroom_id=classroom_id), ('assignment_id', )),
+    ('assignments', Assignment.objects.filter(classroom_id=classroom_id), ()),
+    ('reference materials', ReferenceMaterial.objects.filter(classroom_id=classroom_id), ()),
+    ('uploads', ChunkedUpload.objects.filter(classroom_id=classroom_id), ()),
+    ('join requests', JoinRequests.objects.filter(classroom_id=classroom_id), ()),
+    ('students', ClassroomStudents.objects.filter(classroom_id=classroom_id), ()),
+  )
+
+
+def mark_deleted(classroom, user):
+  """ Hides the classroom right away and queues its deletion. Returns the ClassroomDeletion. """
+  with transaction.atomic():
+    classroom.deleted_at = timezone.now()
+    classroom.save(update_fields=['deleted_at'])
+    deletion, _created = ClassroomDeletion.objects.get_or_create(
+      classroom_id=classroom.pk,
+      defaults={'course_name': classroom.course_name, 'requested_by': user},
+    )
+    run_in_background(delete_classroom, deletion.pk, key='classroom-deletion:{}'.format(deletion.pk))
+  return deletion
+
+
+def _release_upload(upload):
+  # Completed uploads live on as their object's file, which the object's
+  # own delete releases; only partial files are left to clean up here.
+  if not upload.completed and upload.path:
+    transaction.on_commit(lambda: default_storage.delete(upload.path))
+
+
+def _delete_batch(queryset, related, batch_size):
+  """ Deletes one batch of `queryset` and returns (rows deleted, files released). """
+  pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+  if not pks:
+    return 0, 0
+  model = queryset.model
+  batch = model.objects.filter(pk__in=pks).select_related(*related)
+  files = 0
+  with transaction.atomic(), deferred_bumps():
+    if model is ChunkedUpload:
+      for upload in batch:
+        _release_upload(upload)
+    elif hasattr(model, 'file'):
+      files = batch.exclude(file='').count()
+    deleted = batch.delete()[0]
+  return deleted, files
+
+
+def delete_classroom(deletion_id, batch_size=BATCH_SIZE):
+  deletion = ClassroomDeletion.objects.get(pk=deletion_id)
+  if deletion.status == ClassroomDeletion.DONE:
+    return
+  classroom_id = deletion.classroom_id
+  steps = _steps(classroom_id)
+
+  ClassroomDeletion.objects.filter(pk=deletion_id).update(
+    status=ClassroomDeletion.RUNNING,
+    total=F('deleted') + sum(queryset.count() for _name, queryset, _related in steps) + 1,
+  )
+  try:
+    for name, queryset, related in steps:
+      ClassroomDeletion.objects.filter(pk=deletion_id).update(step=name)
+      while True:
+        deleted, files = _delete_batch(queryset, related, batch_size)
+        if not deleted:
+          break
+        ClassroomDeletion.objects.filter(pk=deletion_id).update(
+          deleted=F('deleted') + deleted, files=F('files') + files
+        )
+
+    # Nothing is left to cascade; post_delete drops the gradebook.
+    Classroom.objects.filter(pk=classroom_id).delete()
+    ClassroomVersion.objects.filter(pk=classroom_id).delete()
+  except Exception as error:
+    logger.exception('Deleting classroom %s failed', classroom_id)
+    ClassroomDeletion.objects.filter(pk=deletion_id).update(status=ClassroomDeletion.FAILED, error=str(error))
+    return
+
+  ClassroomDeletion.objects.filter(pk=deletion_id).update(
+    status=ClassroomDeletion.DONE, step='', deleted=F('deleted') + 1, finished=timezone.now()
+  )
+
+
+def resume_deletions():
+  """ Runs deletions left unfinished by a restart, synchronously. Returns how many ran. """
+  pending = ClassroomDeletion.objects.exclude(status=ClassroomDeletion.DONE).values_list('pk', flat=True)
+  count = 0
+  for deletion_id in list(pending):
+    delete_classroom(deletion_id)
+    count += 1
+  return count
@@ -0,0 +1,146 @@
+import csv
+import io
+import itertools
+
+from django.contrib import auth
+from django.db import transaction
+
+from classroom.gradebook import add_students
+from classroom.models import ClassroomStudents, JoinRequests
+from classroom.versions import bump_classroom_version, deferred_bumps
+
+BATCH_SIZE = 1000
+
+ROSTER_HEADERS = ('email', 'username', 'user')
+
+
+def enroll_students(classroom, student_ids):
+  """
+  Enrolls the given users with batched inserts and returns the ids that
+  were newly enrolled. Users already in the classroom are skipped, and
+  `ignore_conflicts` covers enrollments that race with this one. Their
+  pending join requests are deleted in the same transaction.
+  """
+  student_ids = set(student_ids)
+  if not student_ids:
+    return []
+  enrolled = set(
+    ClassroomStudents.objects
+    .filter(classroom_id=classroom, student_id__in=student_ids)
+    .values_list('student_id', flat=True)
+  )
+  new_ids = sorted(student_ids - enrolled)
+  ClassroomStudents.objects.bulk_create(
+    [ClassroomStudents(classroom_id=classroom, student_id_id=student_id) for student_id in new_ids],
+    batch_size=BATCH_SIZE,
+    ignore_conflicts=True,
+  )
+
+  # Pending requests to join are answered by the enrollment.
+  JoinRequests.objects.filter(classroom_id=classroom, student_id__in=student_ids).delete()
+
+  # bulk_create does not send post_save, so update the gradebook and the
+  # classroom version (which cached memberships are keyed on) here.
+  add_students(classroom.pk, new_ids)
+  bump_classroom_version(classroom.pk)
+  return new_ids
+
+
+def resolve_join_requests(classroom, request_ids=None, accept=True):
+  """
+  Accepts or rejects pending join requests of a classroom in one
+  transaction; `request_ids=None` means every pending request. Returns the
+  number of requests handled.
+  """
+  with transaction.atomic(), deferred_bumps():
+    pending = JoinRequests.objects.select_for_update().filter(classroom_id=classroom)
+    if request_ids is not None:
+      pending = pending.filter(id__in=request_ids)
+    handled = list(pending.values_list('id', 'student_id'))
+    if not handled:
+      return 0
+
+    if accept:
+      # Enrolling deletes the students' requests along with the inserts.
+      enroll_students(classroom, [student_id for _id, student_id in handled])
+    else:
+      JoinRequests.objects.filter(id__in=[request_id for request_id, _student in handled]).delete()
+  return len(handled)
+
+
+def iter_roster(stream, encoding='utf-8'):
+  """
+  Yields one username or email per row of a roster file, read lazily.
+  Only the first non-empty cell of each row is used and a header row is
+  skipped.
+  """
+  wrapper = None
+  if not isinstance(stream, io.TextIOBase):
+    stream = wrapper = io.TextIOWrapper(stream, encoding=encoding, newline='')
+  try:
+    for row in csv.reader(stream):
+      entry = next((cell.strip() for cell in row if cell.strip()), None)
+      if entry and entry.lower() not in ROSTER_HEADERS:
+        yield entry
+  finally:
+    # Leave the underlying file open for the caller.
+    if wrapper is not None:
+      wrapper.detach()
+
+
+def read_roster(stream, encoding='utf-8'):
+  """
+  Reads a seekable roster file through once, so an undecodable byte or a
+  malformed row anywhere raises (UnicodeDecodeError or csv.Error) before
+  any student is enrolled, then returns the lazy iter_roster over it.
+  """
+  for _entry in iter_roster(stream, encoding):
+    pass
+  stream.seek(0)
+  return iter_roster(stream, encoding)
+
+
+def _match_roster_batch(entries):
+  User = auth.get_user_model()
+  emails = [entry for entry in entries if '@' in entry]
+  usernames = [entry for entry in entries if '@' not in entry]
+
+  matches = {}
+  if emails:
+    for user_id, email, is_student in User.objects.filter_by_emails(emails).values_list('id', 'email_lower', 'is_student'):
+      matches[email] = (user_id, is_student)
+  if usernames:
+    for user_id, username, is_student in User.objects.filter_by_usernames(usernames).values_list('id', 'username_lower', 'is_student'):
+      matches[username] = (user_id, is_student)
+  return matches
+
+
+def enroll_roster(classroom, entries, batch_size=BATCH_SIZE):
+  """
+  Enrolls the students named in `entries` (usernames or emails) batch by
+  batch, so arbitrarily long rosters run in constant memory apart from the
+  report of entries that could not be enrolled.
+  """
+  report = {'enrolled': 0, 'already_enrolled': 0, 'unknown': [], 'not_students': []}
+  entries = iter(entries)
+
+  while True:
+    batch = list(itertools.islice(entries, batch_size))
+    if not batch:
+      return report
+
+    matches = _match_roster_batch(batch)
+    student_ids = set()
+    for entry in batch:
+      match = matches.get(entry.lower())
+      if match is None:
+        report['unknown'].append(entry)
+      elif not match[1]:
+        report['not_students'].append(entry)
+      else:
+        student_ids.add(match[0])
+
+    with transaction.atomic(), deferred_bumps():
+      enrolled = enroll_students(classroom, student_ids)
+    report['enrolled'] += len(enrolled)
+    report['already_enrolled'] += len(student_ids) - len(enrolled)
@@ -0,0 +1,186 @@
+import math
+import statistics
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from classroom.models import Assignment, AssignmentSubmission, ClassroomStudents
+from classroom.versions import gradebook_generation
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+'''
+Grade distributions per assignment and across a classroom. The marks are
+pulled as one column and summarised in a single vectorized pass with NumPy
+when it is installed (a plain Python fallback gives the same numbers).
+Results are cached under the classroom's gradebook generation, a database
+counter that moves with every grade, enrollment or assignment change in
+the writer's transaction, so no process ever serves a result older than
+the latest grade and nothing has to be invalidated explicitly. Reading a
+cached result costs the one primary-key query for the generation.
+
+Only enrolled students count: a student without a submission is
+"missing", submissions of students who have left are ignored.
+'''
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+STATISTICS_TIMEOUT = 60 * 60
+
+
+def _cache_key(kind, classroom_id, object_id):
+  return 'grade-statistics:{}:{}:{}:{}'.format(kind, classroom_id, gradebook_generation(classroom_id), object_id)
+
+
+def _cached(key, compute):
+  result = cache.get(key)
+  if result is None:
+    result = compute()
+    cache.set(key, result, STATISTICS_TIMEOUT)
+  return result
+
+
+def _round(value):
+  return None if value is None or math.isnan(value) else round(float(value), 2)
+
+
+def _histogram_edges(upper, bins):
+  return [upper * index / bins for index in range(bins + 1)]
+
+
+def _describe_numpy(values, upper, bins):
+  values = numpy.asarray(values, dtype=float)
+  counts, edges = numpy.histogram(numpy.clip(values, 0, upper), bins=bins, range=(0, upper))
+  percentiles = numpy.percentile(values, PERCENTILES)
+  return {
+    'mean': values.mean(),
+    'median': numpy.median(values),
+    'std': values.std(),
+    'min': values.min(),
+    'max': values.max(),
+    'percentiles': dict(zip(PERCENTILES, percentiles.tolist())),
+    'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+  }
+
+
+def _percentile(ordered, q):
+  # Linear interpolation between closest ranks, as numpy.percentile does.
+  position = (len(ordered) - 1) * q / 100
+  lower, upper = math.floor(position), math.ceil(position)
+  return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _describe_python(values, upper, bins):
+  ordered = sorted(values)
+  counts = [0] * bins
+  for value in ordered:
+    value = min(max(value, 0), upper)
+    counts[min(int(value * bins / upper), bins - 1)] += 1
+  return {
+    'mean': statistics.fmean(ordered),
+    'median': statistics.median(ordered),
+    'std': statistics.pstdev(ordered),
+    'min': ordered[0],
+    'max': ordered[-1],
+    'percentiles': {q: _percentile(ordered, q) for q in PERCENTILES},
+    'histogram': {'edges': _histogram_edges(upper, bins), 'counts': counts},
+  }
+
+
+def describe(values, upper, bins=HISTOGRAM_BINS):
+  """ Summary statistics of `values`, with a histogram over [0, upper]. """
+  upper = upper or 1
+  if not values:
+    return {
+      'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+      'percentiles': {q: None for q in PERCENTILES},
+      'histogram': {'edges': _histogram_edges(upper, bins), 'counts': [0] * bins},
+    }
+  described = (_describe_numpy if numpy is not None else _describe_python)(values, upper, bins)
+  for name in ('mean', 'median', 'std', 'min', 'max'):
+    described[name] = _round(described[name])
+  described['percentiles'] = {q: _round(value) for q, value in described['percentiles'].items()}
+  described['histogram']['edges'] = [_round(edge) for edge in described['histogram']['edges']]
+  return described
+
+
+def _enrolled_marks(assignment):
+  """ One row per enrolled student: their marks for `assignment`, or None. """
+  submission = AssignmentSubmission.objects.filter(
+    assignment_id=assignment, student_id=OuterRef('student_id')
+  ).values('marks')[:1]
+  return list(
+    ClassroomStudents.objects.filter(classroom_id=assignment.classroom_id_id)
+    .annotate(marks=Subquery(submission))
+    .values_list('marks', flat=True)
+  )
+
+
+def assignment_statistics(assignment):
+  def compute():
+    marks = _enrolled_marks(assignment)
+    submitted = [value for value in marks if value is not None]
+    return dict(
+      describe(submitted, assignment.max_marks),
+      assignment=assignment.pk,
+      max_marks=assignment.max_marks,
+      submitted=len(submitted),
+      missing=len(marks) - len(submitted),
+    )
+  return _cached(_cache_key('assignment', assignment.classroom_id_id, assignment.pk), compute)
+
+
+def classroom_statistics(classroom):
+  """
+  Per-assignment summaries for the whole classroom plus the distribution of
+  all marks as percentages of their assignment's maximum. Takes three
+  queries however many assignments there are.
+  """
+  def compute():
+    assignments = list(
+      Assignment.objects.filter(classroom_id=classroom).order_by('id').values_list('id', 'description', 'max_marks')
+    )
+    students = ClassroomStudents.objects.filter(classroom_id=classroom)
+    enrolled = students.count()
+    rows = list(
+      AssignmentSubmission.objects.filter(
+        assignment_id__classroom_id=classroom,
+        student_id__in=students.values('student_id'),
+      ).values_list('assignment_id', 'marks')
+    )
+
+    by_assignment = {assignment_id: [] for assignment_id, _d, _m in assignments}
+    for assignment_id, marks in rows:
+      by_assignment[assignment_id].append(marks)
+
+    if numpy is not None and rows:
+      ids, marks = numpy.array(rows, dtype=float).T
+      keys = numpy.array([assignment_id for assignment_id, _d, _m in assignments], dtype=float)
+      ceilings = numpy.array([max_marks or 1 for _id, _d, max_marks in assignments], dtype=float)
+      percentages = (marks * 100 / ceilings[numpy.searchsorted(keys, ids)]).tolist()
+    else:
+      maximum = {assignment_id: max_marks for assignment_id, _d, max_marks in assignments}
+      percentages = [marks * 100 / (maximum[assignment_id] or 1) for assignment_id, marks in rows]
+
+    summaries = []
+    for assignment_id, description, max_marks in assignments:
+      marks = by_assignment[assignment_id]
+      described = describe(marks, max_marks)
+      summaries.append({
+        'assignment': assignment_id,
+        'description': description,
+        'max_marks': max_marks,
+        'submitted': len(marks),
+        'missing': enrolled - len(marks),
+        'mean': described['mean'],
+        'median': described['median'],
+      })
+    return {
+      'students': enrolled,
+      'assignments': summaries,
+      'overall_percentage': describe(percentages, 100),
+    }
+  return _cached(_cache_key('classroom', classroom.pk, 'summary'), compute)
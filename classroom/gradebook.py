@@ -0,0 +1,192 @@
+import time
+
+from django.contrib import auth
+from django.core.cache import cache
+from django.db import transaction
+
+from classroom.models import Assignment, AssignmentSubmission, ClassroomStudents
+from classroom.versions import bump_gradebook_generation, gradebook_generation
+
+'''
+Materialized per-classroom gradebook: the students x assignments marks
+matrix with running totals, kept in the cache and patched in place as
+submissions are graded, students join or leave and assignments change.
+Reading it costs one primary-key query and one cache hit however many
+assignments the classroom has; it is only rebuilt (three queries) when
+missing or out of date.
+
+The cached gradebook is stored with the classroom's gradebook generation,
+a database counter (see classroom.versions) that every change moves in
+its own transaction. A reader only uses an entry built for the current
+generation, so a change made by any process is seen by all of them at
+once. The writer's process patches its copy forward on commit, under a
+short cache lock, when the entry is exactly one generation behind (or a
+second patch of the same bulk change); otherwise the next read rebuilds.
+Patches are idempotent, so one applied to a rebuild that already
+contains the change does no harm.
+'''
+
+GRADEBOOK_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 5
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.01
+
+
+def _cache_key(classroom_id):
+  return 'classroom-gradebook:{}'.format(classroom_id)
+
+
+def _student_row(name):
+  return {'name': name, 'marks': {}, 'total': 0}
+
+
+def build_gradebook(classroom_id):
+  assignments = {
+    assignment_id: {'description': description, 'max_marks': max_marks}
+    for assignment_id, description, max_marks in
+    Assignment.objects.filter(classroom_id=classroom_id).values_list('id', 'description', 'max_marks')
+  }
+  students = {
+    enrollment.student_id_id: _student_row(enrollment.student_id.get_fullname())
+    for enrollment in ClassroomStudents.objects.filter(classroom_id=classroom_id).select_related('student_id')
+  }
+  submissions = AssignmentSubmission.objects.filter(
+    assignment_id__classroom_id=classroom_id
+  ).values_list('assignment_id', 'student_id', 'marks')
+  for assignment_id, student_id, marks in submissions:
+    row = students.get(student_id)
+    if row is not None:
+      row['marks'][assignment_id] = marks
+      row['total'] += marks
+  return {'assignments': assignments, 'students': students}
+
+
+def get_gradebook(classroom_id):
+  key = _cache_key(classroom_id)
+  generation = gradebook_generation(classroom_id)
+  cached = cache.get(key)
+  if cached is not None and cached[0] == generation:
+    return cached[1]
+  gradebook = build_gradebook(classroom_id)
+  # A rebuild that raced with a change is not stored.
+  if gradebook_generation(classroom_id) == generation:
+    cache.set(key, (generation, gradebook), GRADEBOOK_TIMEOUT)
+  return gradebook
+
+
+def invalidate_gradebook(classroom_id):
+  cache.delete(_cache_key(classroom_id))
+
+
+def _apply(classroom_id, generation, change):
+  key, lock = _cache_key(classroom_id), _cache_key(classroom_id) + ':lock'
+  for _attempt in range(LOCK_ATTEMPTS):
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+      break
+    time.sleep(LOCK_WAIT)
+  else:
+    return
+  try:
+    cached = cache.get(key)
+    if cached is not None and cached[0] in (generation - 1, generation):
+      change(cached[1])
+      cache.set(key, (generation, cached[1]), GRADEBOOK_TIMEOUT)
+  finally:
+    cache.delete(lock)
+
+
+def _patch(classroom_id, change):
+  """ Moves the gradebook generation now and applies `change(gradebook)` to this process's copy on commit. """
+  bump_gradebook_generation(
+    classroom_id, lambda generation: transaction.on_commit(lambda: _apply(classroom_id, generation, change))
+  )
+
+
+def _set_marks(gradebook, assignment_id, student_id, marks):
+  row = gradebook['students'].get(student_id)
+  if row is None:
+    return
+  row['total'] += (marks or 0) - row['marks'].pop(assignment_id, 0)
+  if marks is not None:
+    row['marks'][assignment_id] = marks
+
+
+def record_grades(classroom_id, assignment_id, grades):
+  """ Records `(student_id, marks)` pairs of one assignment; `None` marks remove the cell. """
+  grades = list(grades)
+  def change(gradebook):
+    for student_id, marks in grades:
+      _set_marks(gradebook, assignment_id, student_id, marks)
+  _patch(classroom_id, change)
+
+
+def record_assignment(classroom_id, assignment_id, description, max_marks):
+  def change(gradebook):
+    gradebook['assignments'][assignment_id] = {'description': description, 'max_marks': max_marks}
+  _patch(classroom_id, change)
+
+
+def remove_assignment(classroom_id, assignment_id):
+  def change(gradebook):
+    gradebook['assignments'].pop(assignment_id, None)
+    for row in gradebook['students'].values():
+      row['total'] -= row['marks'].pop(assignment_id, 0)
+  _patch(classroom_id, change)
+
+
+def add_students(classroom_id, student_ids):
+  student_ids = list(student_ids)
+  if not student_ids:
+    return
+  def change(gradebook):
+    User = auth.get_user_model()
+    missing = [student_id for student_id in student_ids if student_id not in gradebook['students']]
+    rows = {
+      student.id: _student_row(student.get_fullname())
+      for student in User.objects.filter(id__in=missing).only('first_name', 'last_name')
+    }
+    # Students may have submitted before (re)joining.
+    submissions = AssignmentSubmission.objects.filter(
+      assignment_id__classroom_id=classroom_id, student_id__in=list(rows)
+    ).values_list('assignment_id', 'student_id', 'marks')
+    for assignment_id, student_id, marks in submissions:
+      rows[student_id]['marks'][assignment_id] = marks
+      rows[student_id]['total'] += marks
+    gradebook['students'].update(rows)
+  _patch(classroom_id, change)
+
+
+def remove_students(classroom_id, student_ids):
+  student_ids = list(student_ids)
+  def change(gradebook):
+    for student_id in student_ids:
+      gradebook['students'].pop(student_id, None)
+  _patch(classroom_id, change)
+
+
+def rename_student(classroom_id, student_id, name):
+  def change(gradebook):
+    row = gradebook['students'].get(student_id)
+    if row is not None:
+      row['name'] = name
+  _patch(classroom_id, change)
+
+
+def render_gradebook(gradebook):
+  """ Lays the gradebook out for the API, with totals and percentages. """
+  assignments = sorted(gradebook['assignments'].items())
+  max_total = sum(assignment['max_marks'] for _id, assignment in assignments)
+  students = []
+  for student_id, row in sorted(gradebook['students'].items()):
+    students.append({
+      'id': student_id,
+      'name': row['name'],
+      'marks': row['marks'],
+      'total': row['total'],
+      'percentage': round(100.0 * row['total'] / max_total, 2) if max_total else None,
+    })
+  return {
+    'assignments': [dict(assignment, id=assignment_id) for assignment_id, assignment in assignments],
+    'max_total': max_total,
+    'students': students,
+  }
@@ -0,0 +1,128 @@
+import csv
+import io
+
+from django.contrib import auth
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from classroom.gradebook import record_grades
+from classroom.models import AssignmentSubmission
+
+BATCH_SIZE = 1000
+
+GRADE_COLUMNS = {
+  'submission': ('submission', 'submission_id', 'id'),
+  'student_id': ('student_id', ),
+  'username': ('username', ),
+  'email': ('email', ),
+  'student': ('student', ),
+  'marks': ('marks', 'grade', 'score'),
+}
+
+# How each entry may name its student; `student` is a username or an email.
+STUDENT_KEYS = ('student_id', 'username', 'email', 'student')
+
+
+def iter_grade_rows(stream, encoding='utf-8'):
+  """
+  Yields one `{<identifier>: ..., 'marks': ...}` dict per row of a grades
+  CSV, the identifier being one of `submission`, `student_id`, `username`,
+  `email` or `student`. The header names the columns; aliases such as
+  `submission_id` or `grade` are understood.
+  """
+  if not isinstance(stream, io.TextIOBase):
+    stream = io.TextIOWrapper(stream, encoding=encoding, newline='')
+  for row in csv.DictReader(stream):
+    entry = {}
+    for key, value in row.items():
+      if not key or value is None or not value.strip():
+        continue
+      key = key.strip().lower()
+      for column, aliases in GRADE_COLUMNS.items():
+        if key in aliases and column not in entry:
+          entry[column] = value.strip()
+    yield entry
+
+
+def _student_key(entry):
+  """
+  `(kind, value)` naming the entry's student, or None. The kind comes from
+  the field the entry used, never from what the value looks like, so a
+  numeric username is not mistaken for an id.
+  """
+  if entry.get('student_id') is not None:
+    return 'id', entry['student_id']
+  if entry.get('username') is not None:
+    return 'username', entry['username'].lower()
+  if entry.get('email') is not None:
+    return 'email', entry['email'].lower()
+  if entry.get('student') is not None:
+    value = entry['student'].lower()
+    return ('email' if '@' in value else 'username'), value
+  return None
+
+
+def _match_students(keys):
+  """ Maps `(kind, value)` student keys to user ids. """
+  User = auth.get_user_model()
+  emails = [value for kind, value in keys if kind == 'email']
+  usernames = [value for kind, value in keys if kind == 'username']
+
+  matches = {(kind, value): value for kind, value in keys if kind == 'id'}
+  if emails:
+    matches.update(
+      (('email', email), user_id) for email, user_id in
+      User.objects.filter_by_emails(emails).values_list('email_lower', 'id')
+    )
+  if usernames:
+    matches.update(
+      (('username', username), user_id) for username, user_id in
+      User.objects.filter_by_usernames(usernames).values_list('username_lower', 'id')
+    )
+  return matches
+
+
+def grade_submissions(assignment, grades):
+  """
+  Sets the marks of many submissions of `assignment` at once. `grades` is
+  a list of validated entries naming a submission id or a student (by
+  `student_id`, `username`, `email` or `student`) and the marks. Every entry is checked before anything
+  is written; if one fails nothing is saved and the errors are returned by
+  position. Otherwise all marks are stored with one bulk_update.
+  """
+  students = {_student_key(entry) for entry in grades} - {None}
+  student_ids = _match_students(students) if students else {}
+
+  with transaction.atomic():
+    by_id = {
+      submission.pk: submission
+      for submission in AssignmentSubmission.objects.select_for_update().filter(assignment_id=assignment)
+    }
+    by_student = {submission.student_id_id: submission for submission in by_id.values()}
+
+    errors, graded = [], {}
+    for position, entry in enumerate(grades):
+      if entry.get('submission') is not None:
+        submission = by_id.get(entry['submission'])
+      else:
+        submission = by_student.get(student_ids.get(_student_key(entry)))
+      if submission is None:
+        errors.append({'row': position + 1, 'errors': [_('No submission found for this entry.')]})
+      elif entry['marks'] > assignment.max_marks:
+        errors.append({'row': position + 1, 'errors': [
+          _('Marks cannot exceed the maximum of {}.').format(assignment.max_marks)
+        ]})
+      elif submission.pk in graded and graded[submission.pk].marks != entry['marks']:
+        errors.append({'row': position + 1, 'errors': [_('This submission is graded twice in this import.')]})
+      else:
+        submission.marks = entry['marks']
+        graded[submission.pk] = submission
+
+    if errors:
+      return {'graded': 0, 'errors': errors}
+    AssignmentSubmission.objects.bulk_update(graded.values(), ['marks'], batch_size=BATCH_SIZE)
+    record_grades(
+      assignment.classroom_id_id, assignment.pk,
+      [(submission.student_id_id, submission.marks) for submission in graded.values()]
+    )
+  return {'graded': len(graded), 'errors': []}
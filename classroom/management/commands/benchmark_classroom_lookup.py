@@ -0,0 +1,70 @@
+import random
+import time
+import uuid
+
+from django.contrib import auth
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from classroom.models import Classroom
+
+User = auth.get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the old `id__iexact` classroom lookup, which casts the UUID primary '
+        'key to text, with the primary-key lookup the views now use, on a table of '
+        'synthetic classrooms created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classrooms', type=int, default=200000, help='Synthetic classrooms to create.')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per method.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def _create_classrooms(self, count, batch_size):
+        teacher = User.objects.create(username='bench-teacher', email='bench-teacher@example.test', is_teacher=True)
+        ids = []
+        for start in range(0, count, batch_size):
+            batch = [
+                Classroom(id=uuid.uuid4(), room_number=number, course_name='Course {}'.format(number), teacher_id=teacher)
+                for number in range(start, min(start + batch_size, count))
+            ]
+            Classroom.objects.bulk_create(batch)
+            ids.extend(classroom.id for classroom in batch)
+        return ids
+
+    def _time(self, lookup, values):
+        started = time.perf_counter()
+        for value in values:
+            # exists(): outside Postgres UUIDs are stored without dashes, so
+            # the text comparison finds nothing there (after the same scan).
+            lookup(value).exists()
+        return (time.perf_counter() - started) * 1000 / len(values)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                started = time.monotonic()
+                ids = self._create_classrooms(options['classrooms'], options['batch_size'])
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE classroom_classroom;')
+                self.stdout.write('Created {} classrooms in {:.1f}s.'.format(len(ids), time.monotonic() - started))
+
+                sample = random.sample(ids, min(options['lookups'], len(ids)))
+                methods = (
+                    ('id__iexact', lambda value: Classroom.objects.filter(id__iexact=str(value)), sample),
+                    ('pk (UUID)', lambda value: Classroom.objects.filter(pk=value), sample),
+                )
+                for name, lookup, values in methods:
+                    self.stdout.write('{:<12} {:8.3f} ms per lookup'.format(name, self._time(lookup, values)))
+                    self.stdout.write(lookup(values[0]).explain())
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,83 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.media_gc import build_filter, find_orphans, find_unreferenced_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Finds files in MEDIA_ROOT that no database row refers to and deletes or '
+        'quarantines them. Without --delete or --quarantine it only reports. '
+        'Runs in fixed memory: referenced names go into a Bloom filter and the '
+        'tree is walked one directory at a time.'
+    )
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--delete', action='store_true', help='Delete orphaned files.')
+        action.add_argument(
+            '--quarantine', metavar='DIRECTORY',
+            help=(
+                'Move orphaned files here, keeping their relative paths, instead of deleting them. '
+                'Best kept outside MEDIA_ROOT, or later runs will see the quarantine as orphans.'
+            )
+        )
+        parser.add_argument(
+            '--grace-period', type=int, default=24 * 60 * 60,
+            help='Leave files changed within this many seconds alone (uploads still in flight).'
+        )
+        parser.add_argument('--error-rate', type=float, default=0.001, help='False positive rate of the Bloom filter.')
+        parser.add_argument('--verbose-list', action='store_true', help='Print every orphan found.')
+
+    def _dispose(self, root, name, options):
+        path = os.path.join(root, name)
+        if options['delete']:
+            os.remove(path)
+        elif options['quarantine']:
+            destination = os.path.join(options['quarantine'], name)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(path, destination)
+
+    def _collect(self, orphans, root, options):
+        count = size = 0
+        for name, stat in orphans:
+            if options['verbose_list']:
+                self.stdout.write(name)
+            try:
+                self._dispose(root, name, options)
+            except FileNotFoundError:
+                continue
+            count += 1
+            size += stat.st_size
+        return count, size
+
+    def handle(self, *args, **options):
+        root = os.path.abspath(settings.MEDIA_ROOT)
+        if not os.path.isdir(root):
+            raise CommandError('MEDIA_ROOT {} does not exist.'.format(root))
+        skip = ()
+        if options['quarantine']:
+            quarantine = os.path.abspath(options['quarantine'])
+            if quarantine.startswith(root + os.sep):
+                skip = (os.path.relpath(quarantine, root).replace(os.sep, '/'), )
+            options['quarantine'] = quarantine
+
+        started = time.monotonic()
+        bloom = build_filter(options['error_rate'])
+        orphans, size = self._collect(find_orphans(root, bloom, options['grace_period'], skip), root, options)
+
+        # Quarantined names still hold their blob; only deletes free blobs.
+        blobs = blob_size = 0
+        if not options['quarantine']:
+            blobs, blob_size = self._collect(find_unreferenced_blobs(root, options['grace_period']), root, options)
+
+        elapsed = time.monotonic() - started
+        verb = 'Deleted' if options['delete'] else 'Quarantined' if options['quarantine'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            '{} {} orphaned files ({} bytes) and {} unreferenced blobs ({} bytes) in {:.2f}s.'.format(
+                verb, orphans, size, blobs, blob_size, elapsed
+            )
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom.uploads import expire_uploads, upload_options
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes chunked uploads nobody has written to for a while, together with '
+        'the partial files of unfinished ones. Meant to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=None,
+            help='Seconds since the last chunk (defaults to CHUNKED_UPLOADS["EXPIRE_AFTER"]).'
+        )
+
+    def handle(self, *args, **options):
+        max_age = options['max_age'] if options['max_age'] is not None else upload_options()['EXPIRE_AFTER']
+        started = time.monotonic()
+        count = expire_uploads(max_age)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Expired {} uploads idle for more than {}s in {:.2f}s.'.format(count, max_age, elapsed)
+        ))
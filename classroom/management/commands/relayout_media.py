@@ -0,0 +1,109 @@
+import os
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from classroom.models import Assignment, ReferenceMaterial, AssignmentSubmission
+from classroom.storage import classroom_storage
+
+SHARDED = re.compile(r'^[a-z]+/[^/]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}(\.[^/]*)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves classroom files saved under the old flat, id-based names into '
+        'the sharded <kind>/<classroom>/<aa>/<bb>/<key> layout, one batch of '
+        'rows at a time. Safe to re-run: files already in the new layout are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved.')
+
+    def _relink(self, instance, field):
+        """ Links the file under its new name and returns (old name, old path, new name, new path). """
+        old_name = getattr(instance, field.attname).name
+        new_name = field.generate_filename(instance, os.path.basename(old_name))
+        old_path, new_path = classroom_storage.path(old_name), classroom_storage.path(new_name)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        # A second hard link rather than a rename: the old name keeps working
+        # until the row pointing at the new one is committed, and the blob's
+        # link count (its reference count) is the same once the old one goes.
+        os.link(old_path, new_path)
+        return old_name, old_path, new_name, new_path
+
+    def _move_batch(self, model, batch):
+        """ Returns (moved, missing on disk, skipped because the row changed meanwhile). """
+        field = model._meta.get_field('file')
+        links, missing = [], 0
+        for instance in batch:
+            try:
+                links.append((instance.pk, ) + self._relink(instance, field))
+            except FileNotFoundError:
+                missing += 1
+
+        moved, stale = [], []
+        try:
+            with transaction.atomic():
+                for link in links:
+                    pk, old_name, _old_path, new_name, _new_path = link
+                    # Only rows still pointing at the file that was linked: a
+                    # row re-uploaded or deleted since it was read keeps its
+                    # new value, and the link made for it is dropped.
+                    updated = model.objects.filter(pk=pk, **{field.attname: old_name}).update(
+                        **{field.attname: new_name}
+                    )
+                    (moved if updated else stale).append(link)
+        except Exception:
+            for _pk, _old_name, _old_path, _new_name, new_path in links:
+                os.remove(new_path)
+            raise
+
+        for _pk, _old_name, _old_path, _new_name, new_path in stale:
+            os.remove(new_path)
+        for _pk, _old_name, old_path, _new_name, _new_path in moved:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+        return len(moved), missing, len(stale)
+
+    def _relayout(self, model, queryset, batch_size, pause, dry_run):
+        moved = missing = skipped = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                return moved, missing, skipped
+            last_pk = batch[-1].pk
+            pending = [instance for instance in batch if instance.file and not SHARDED.match(instance.file.name)]
+            if pending and dry_run:
+                moved += len(pending)
+            elif pending:
+                batch_moved, batch_missing, batch_skipped = self._move_batch(model, pending)
+                moved += batch_moved
+                missing += batch_missing
+                skipped += batch_skipped
+                if pause:
+                    time.sleep(pause)
+
+    def handle(self, *args, **options):
+        batch_size, pause, dry_run = options['batch_size'], options['pause'], options['dry_run']
+        started = time.monotonic()
+
+        querysets = (
+            (Assignment, Assignment.objects.all()),
+            (ReferenceMaterial, ReferenceMaterial.objects.all()),
+            (AssignmentSubmission, AssignmentSubmission.objects.select_related('assignment_id')),
+        )
+        for model, queryset in querysets:
+            moved, missing, skipped = self._relayout(model, queryset, batch_size, pause, dry_run)
+            self.stdout.write('{}: {} {}, {} missing on disk, {} changed while moving.'.format(
+                model._meta.verbose_name_plural, 'would move' if dry_run else 'moved', moved, missing, skipped
+            ))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS('Done in {:.2f}s.'.format(elapsed)))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom.deletion import resume_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        'Finishes classroom deletions that were queued or interrupted (e.g. by a '
+        'restart) or that failed. Deletions run in the background normally; this '
+        'runs them in the foreground. Meant to run after deploys or from cron.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = resume_deletions()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Finished {} classroom deletions in {:.2f}s.'.format(count, elapsed)
+        ))
@@ -0,0 +1,124 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+
+'''
+Serving of uploaded files. When a front web server is configured in
+MEDIA_ACCEL the transfer is handed to it (nginx `X-Accel-Redirect`,
+Apache/lighttpd `X-Sendfile`) once Django has checked permissions.
+Otherwise Django serves the file itself: whole files go through
+FileResponse, which uses the server's zero-copy file wrapper, and
+single byte ranges and conditional requests are honoured.
+'''
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def normalize_media_name(path):
+  """
+  Canonical MEDIA_ROOT relative name for a requested path. Absolute paths
+  and `..` segments are refused outright rather than resolved, so a
+  permission check on the first segment always sees the real directory.
+  """
+  if not path or path.startswith('/') or '\\' in path or '..' in path.split('/'):
+    raise Http404
+  name = posixpath.normpath(path)
+  if name in ('.', '') or name.startswith('/'):
+    raise Http404
+  return name
+
+
+def media_path(name):
+  """ Absolute path of a MEDIA_ROOT relative name, refusing anything outside it. """
+  try:
+    path = safe_join(settings.MEDIA_ROOT, name)
+  except SuspiciousFileOperation:
+    raise Http404
+  if not os.path.isfile(path):
+    raise Http404
+  return path
+
+
+def file_etag(stat):
+  return '"{:x}-{:x}"'.format(stat.st_size, stat.st_mtime_ns)
+
+
+def _parse_range(header, size):
+  """ Returns (start, end) for a single satisfiable range, None to send everything, or False. """
+  match = RANGE_RE.match(header.strip())
+  if not match:
+    return None
+  start, end = match.groups()
+  if not start and not end:
+    return None
+  if not start:
+    start, end = max(size - int(end), 0), size - 1
+  else:
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+  if start > end or start >= size:
+    return False
+  return start, end
+
+
+def _read_range(path, start, length):
+  with open(path, 'rb') as source:
+    source.seek(start)
+    while length:
+      data = source.read(min(STREAM_CHUNK_SIZE, length))
+      if not data:
+        break
+      length -= len(data)
+      yield data
+
+
+def serve_media(request, name):
+  path = media_path(name)
+  stat = os.stat(path)
+  etag = file_etag(stat)
+  content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+  if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')) or \
+      request.META.get('HTTP_IF_NONE_MATCH', '').strip() == '*':
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+  accel = getattr(settings, 'MEDIA_ACCEL', {})
+  mode = accel.get('MODE')
+  if mode == 'nginx':
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = accel.get('INTERNAL_PREFIX', '/protected-uploads/') + quote(name)
+  elif mode == 'sendfile':
+    response = HttpResponse(content_type=content_type)
+    response['X-Sendfile'] = path
+  else:
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', etag) == etag:
+      byte_range = _parse_range(request.META['HTTP_RANGE'], stat.st_size)
+
+    if byte_range is False:
+      response = HttpResponse(status=416)
+      response['Content-Range'] = 'bytes */{}'.format(stat.st_size)
+      return response
+    if byte_range:
+      start, end = byte_range
+      response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+      response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, stat.st_size)
+      response['Content-Length'] = end - start + 1
+    else:
+      response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+
+  response['ETag'] = etag
+  response['Last-Modified'] = http_date(stat.st_mtime)
+  response['Cache-Control'] = 'private'
+  return response
@@ -0,0 +1,115 @@
+import hashlib
+import math
+import os
+import time
+
+from django.apps import apps
+from django.db import models
+
+from accounts.avatars import variant_names
+from classroom.models import ChunkedUpload
+from classroom.storage import BLOB_DIR
+
+'''
+Garbage collection of files in MEDIA_ROOT that no row refers to any more
+(replaced uploads, rows removed by cascades, ...). Referenced names are
+streamed from every FileField in the project into a Bloom filter, so memory
+stays fixed however many files there are; MEDIA_ROOT is then walked one
+directory at a time and every name the filter has definitely not seen is
+an orphan. A false positive only keeps an orphan until the next run (the
+hashes are salted per run), it never removes a referenced file.
+
+Names are hard links into the content-addressed blob store, so blobs are
+not walked as names: once the orphaned names are gone, a blob whose link
+count has dropped to one is unreferenced and is removed as well.
+'''
+
+READ_CHUNK_SIZE = 2000
+
+
+class BloomFilter:
+  def __init__(self, capacity, error_rate=0.001):
+    capacity = max(capacity, 1)
+    self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    self.hashes = max(1, round(self.size / capacity * math.log(2)))
+    self.bits = bytearray((self.size + 7) // 8)
+    self.salt = os.urandom(16)
+
+  def _positions(self, value):
+    digest = hashlib.blake2b(value.encode(), key=self.salt, digest_size=16).digest()
+    first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+    return ((first + index * second) % self.size for index in range(self.hashes))
+
+  def add(self, value):
+    for position in self._positions(value):
+      self.bits[position >> 3] |= 1 << (position & 7)
+
+  def __contains__(self, value):
+    return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _file_fields():
+  for model in apps.get_models():
+    for field in model._meta.get_fields():
+      if isinstance(field, models.FileField) and field.concrete:
+        yield model, field
+
+
+def iter_referenced_names():
+  """ Streams every stored file name the database refers to. """
+  for model, field in _file_fields():
+    names = model._default_manager.exclude(**{field.name: ''}).exclude(**{field.name + '__isnull': True})
+    for name in names.values_list(field.name, flat=True).iterator(chunk_size=READ_CHUNK_SIZE):
+      yield name
+      if name.startswith('avatars/'):
+        yield from variant_names(name)
+  # Unfinished chunked uploads write straight into their final location;
+  # finished ones are referenced by their target, expired ones are gone.
+  unfinished = ChunkedUpload.objects.filter(completed=False).exclude(path='')
+  yield from unfinished.values_list('path', flat=True).iterator(chunk_size=READ_CHUNK_SIZE)
+
+
+def count_referenced_names():
+  total = sum(model._default_manager.count() for model, _field in _file_fields())
+  return total * (1 + len(variant_names(''))) + ChunkedUpload.objects.count()
+
+
+def build_filter(error_rate=0.001):
+  bloom = BloomFilter(count_referenced_names(), error_rate)
+  for name in iter_referenced_names():
+    bloom.add(name)
+  return bloom
+
+
+def walk(root, skip=(), relative=''):
+  """ Yields (name, stat) for the files under root, one directory listing at a time. """
+  with os.scandir(os.path.join(root, relative)) as entries:
+    for entry in entries:
+      name = relative + entry.name
+      if entry.is_dir(follow_symlinks=False):
+        if name not in skip:
+          yield from walk(root, skip, name + '/')
+      elif entry.is_file(follow_symlinks=False):
+        yield name, entry.stat(follow_symlinks=False)
+
+
+def find_orphans(root, bloom, grace_period, skip=()):
+  """ Yields the names under root that nothing references and that are older than the grace period. """
+  cutoff = time.time() - grace_period
+  skip = set(skip) | {BLOB_DIR}
+  for name, stat in walk(root, skip):
+    # ctime rather than mtime: linking a new name to an old blob changes
+    # the inode's ctime only.
+    if stat.st_ctime < cutoff and name not in bloom:
+      yield name, stat
+
+
+def find_unreferenced_blobs(root, grace_period):
+  """ Blobs no name links to any more, plus stale temporary files of the blob store. """
+  directory = os.path.join(root, BLOB_DIR)
+  if not os.path.isdir(directory):
+    return
+  cutoff = time.time() - grace_period
+  for name, stat in walk(directory):
+    if stat.st_ctime < cutoff and (stat.st_nlink <= 1 or name.startswith('tmp/')):
+      yield BLOB_DIR + '/' + name, stat
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+
+from classroom.models import ClassroomStudents
+from classroom.versions import current_version
+
+'''
+Classroom membership checks for permission tests. The teacher is a column
+of the classroom row the view has already loaded, so `teaches` is a plain
+comparison. Whether a user has joined is cached per user and classroom
+under the classroom's version: every enrollment and removal moves that
+database counter in its own transaction, so a change is seen by every
+process at once, without invalidating anything, and a check costs no query
+when the classroom was loaded with its version (see resolve_classroom).
+'''
+
+MEMBERSHIP_TIMEOUT = 60 * 10
+
+
+def _cache_key(user_id, classroom_id, version):
+  return 'classroom-membership:{}:{}:{}'.format(user_id, classroom_id, version)
+
+
+def teaches(user, classroom):
+  return classroom.teacher_id_id == user.pk
+
+
+def attends(user, classroom):
+  key = _cache_key(user.pk, classroom.pk, current_version(classroom))
+  joined = cache.get(key)
+  if joined is None:
+    joined = ClassroomStudents.objects.filter(classroom_id=classroom.pk, student_id=user.pk).exists()
+    cache.set(key, joined, MEMBERSHIP_TIMEOUT)
+  return joined
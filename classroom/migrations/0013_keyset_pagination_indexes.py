@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0012_auto_20200525_0954'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['classroom_id', 'id'], name='classroom_a_classro_3fe370_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentsubmission',
+            index=models.Index(fields=['assignment_id', 'id'], name='classroom_a_assignm_8c41ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classroomstudents',
+            index=models.Index(fields=['classroom_id', 'id'], name='classroom_c_classro_b4ae03_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joinrequests',
+            index=models.Index(fields=['classroom_id', 'id'], name='classroom_j_classro_a93ca1_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.14 on 2026-10-18 01:24
+
+import classroom.models
+import classroom.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0014_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignment',
+            name='file',
+            field=models.FileField(storage=classroom.storage.DeduplicatingStorage(), upload_to=classroom.models.upload_assignment_file),
+        ),
+        migrations.AlterField(
+            model_name='assignmentsubmission',
+            name='file',
+            field=models.FileField(storage=classroom.storage.DeduplicatingStorage(), upload_to=classroom.models.upload_submission_file),
+        ),
+        migrations.AlterField(
+            model_name='referencematerial',
+            name='file',
+            field=models.FileField(storage=classroom.storage.DeduplicatingStorage(), upload_to=classroom.models.upload_notes_file),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.0.14 on 2026-10-18 01:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('classroom', '0015_deduplicating_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='deleted at'),
+        ),
+        migrations.CreateModel(
+            name='ClassroomDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classroom_id', models.UUIDField(unique=True)),
+                ('course_name', models.CharField(max_length=60)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=10)),
+                ('step', models.CharField(blank=True, max_length=60)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('files', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='classroom_deletions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
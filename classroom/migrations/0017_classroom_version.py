@@ -0,0 +1,20 @@
+# Generated by Django 3.0.14 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0016_classroom_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassroomVersion',
+            fields=[
+                ('classroom_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0018_chunkedupload_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroomversion',
+            name='gradebook',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,23 +1,37 @@
+import os
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
-def upload_assignment_file(instance, filename):
-  print(instance.id)
-  return "assignments/{classroom}/{filename}".format(
-    classroom=str(instance.classroom_id.id),
-    filename="Assignment"+str(instance.id)
+from classroom.storage import classroom_storage
+
+'''
+Upload paths: <kind>/<classroom>/<aa>/<bb>/<key><ext>. The key is a fresh
+UUID chosen before the file is written, so names never depend on the row
+id (which is still None for new rows) and never collide; the first two
+byte pairs of the key fan files out over 65536 directories per classroom.
+'''
+def sharded_upload_path(kind, classroom_id, filename):
+  key = uuid.uuid4().hex
+  return "{kind}/{classroom}/{shard}/{sub_shard}/{key}{extension}".format(
+    kind=kind,
+    classroom=str(classroom_id),
+    shard=key[:2],
+    sub_shard=key[2:4],
+    key=key,
+    extension=os.path.splitext(filename)[1].lower()[:10]
   )
+
+def upload_assignment_file(instance, filename):
+  return sharded_upload_path("assignments", instance.classroom_id_id, filename)
+
 def upload_notes_file(instance, filename):
-	return "notes/{classroom}/{filename}".format(
-            classroom=str(instance.classroom_id.id),
-            filename="ReferenceMaterial"+str(instance.id)
-        )
+  return sharded_upload_path("notes", instance.classroom_id_id, filename)
+
 def upload_submission_file(instance, filename):
-    return "submissions/{classroom}/{filename}".format(
-        classroom=str(instance.assignment_id.classroom_id.id),
-        filename="Submission"+str(instance.id)
-    )
+  return sharded_upload_path("submissions", instance.assignment_id.classroom_id_id, filename)
 
 class Classroom(models.Model):
   id                    = models.UUIDField(_("classroom id"), primary_key=True, editable=False)
@@ -25,6 +39,7 @@ class Classroom(models.Model):
   course_name           = models.CharField(_("course name"), max_length=60, blank=False)
   teacher_id            = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="teaching_classrooms", on_delete=models.CASCADE)
   joining_permission    = models.BooleanField(_("joining permission"), default=True)
+  deleted_at            = models.DateTimeField(_("deleted at"), null=True, blank=True)
 
   class Meta:
     verbose_name = _("Classroom")
@@ -57,6 +72,7 @@ class ClassroomStudents(models.Model):
 
   class Meta:
     unique_together = (('classroom_id', 'student_id'), )
+    indexes = [models.Index(fields=['classroom_id', 'id'])]
 
 class JoinRequests(models.Model):
   classroom_id  = models.ForeignKey(Classroom, related_name='pending_requests', on_delete=models.CASCADE)
@@ -64,16 +80,20 @@ class JoinRequests(models.Model):
 
   class Meta:
     unique_together = (('classroom_id', 'student_id'), )
+    indexes = [models.Index(fields=['classroom_id', 'id'])]
 
 class Assignment(models.Model):
   classroom_id    = models.ForeignKey(Classroom, related_name="assignments", on_delete=models.CASCADE)
   teacher         = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="owns_assignment", on_delete=models.CASCADE)
   description     = models.CharField(_("description"), max_length=75, blank=False)
-  file            = models.FileField(upload_to=upload_assignment_file, blank=False)
+  file            = models.FileField(upload_to=upload_assignment_file, blank=False, storage=classroom_storage)
   deadline        = models.DateField(_("deadline"), blank=True)
   max_marks       = models.IntegerField(default=100)
   publish_grades  = models.BooleanField(verbose_name=_('publish'),default=False)
 
+  class Meta:
+    indexes = [models.Index(fields=['classroom_id', 'id'])]
+
   def get_submissions(self):
     return self.assignment_submissions.all()
 
@@ -81,13 +101,76 @@ class ReferenceMaterial(models.Model):
   classroom_id    = models.ForeignKey(Classroom, related_name="reference_materials", on_delete=models.CASCADE)
   teacher_id      = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="owns_reference_material", on_delete=models.CASCADE)
   description     = models.CharField(max_length=100, blank=False)
-  file            = models.FileField(upload_to=upload_notes_file, blank=False)
+  file            = models.FileField(upload_to=upload_notes_file, blank=False, storage=classroom_storage)
 
 class AssignmentSubmission(models.Model):
   assignment_id   = models.ForeignKey(Assignment, related_name="assignment_submissions", on_delete=models.CASCADE)
   student_id      = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="owns_solution", on_delete=models.CASCADE)
-  file            = models.FileField(upload_to=upload_submission_file, blank=False)
+  file            = models.FileField(upload_to=upload_submission_file, blank=False, storage=classroom_storage)
   marks           = models.PositiveIntegerField(default=0)
 
   class Meta:
-    unique_together = (('assignment_id', 'student_id'),)
\ No newline at end of file
+    unique_together = (('assignment_id', 'student_id'),)
+    indexes = [models.Index(fields=['assignment_id', 'id'])]
+
+'''
+A file being uploaded in chunks straight to its final location in
+MEDIA_ROOT. `object_id` is the Assignment or ReferenceMaterial whose file
+is replaced, or for submissions the Assignment being submitted to.
+'''
+class ChunkedUpload(models.Model):
+  ASSIGNMENT          = 'assignment'
+  REFERENCE_MATERIAL  = 'reference_material'
+  SUBMISSION          = 'submission'
+  TARGETS = (
+    (ASSIGNMENT, _('assignment')),
+    (REFERENCE_MATERIAL, _('reference material')),
+    (SUBMISSION, _('submission')),
+  )
+
+  id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  owner       = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="chunked_uploads", on_delete=models.CASCADE)
+  classroom   = models.ForeignKey(Classroom, related_name="chunked_uploads", on_delete=models.CASCADE)
+  target      = models.CharField(max_length=20, choices=TARGETS)
+  object_id   = models.PositiveIntegerField()
+  filename    = models.CharField(max_length=255)
+  path        = models.CharField(max_length=255)
+  size        = models.BigIntegerField()
+  offset      = models.BigIntegerField(default=0)
+  sha256      = models.CharField(max_length=64, blank=True)
+  completed   = models.BooleanField(default=False)
+  created     = models.DateTimeField(auto_now_add=True)
+  updated     = models.DateTimeField(auto_now=True, db_index=True)
+
+'''
+Progress of a classroom being deleted in the background. The row outlives
+the classroom, so it keeps the classroom id as a plain value.
+'''
+class ClassroomDeletion(models.Model):
+  PENDING   = 'pending'
+  RUNNING   = 'running'
+  DONE      = 'done'
+  FAILED    = 'failed'
+  STATUSES = (
+    (PENDING, _('pending')),
+    (RUNNING, _('running')),
+    (DONE, _('done')),
+    (FAILED, _('failed')),
+  )
+
+  classroom_id    = models.UUIDField(unique=True)
+  course_name     = models.CharField(max_length=60)
+  requested_by    = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="classroom_deletions", null=True, on_delete=models.SET_NULL)
+  status          = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+  step            = models.CharField(max_length=60, blank=True)
+  total           = models.PositiveIntegerField(default=0)
+  deleted         = models.PositiveIntegerField(default=0)
+  files           = models.PositiveIntegerField(default=0)
+  error           = models.TextField(blank=True)
+  created         = models.DateTimeField(auto_now_add=True)
+  finished        = models.DateTimeField(null=True, blank=True)
+
+class ClassroomVersion(models.Model):
+  classroom_id    = models.UUIDField(primary_key=True)
+  version         = models.PositiveIntegerField(default=0)
+  gradebook       = models.PositiveIntegerField(default=0)
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from classroom import gradebook
+from classroom.models import Assignment, AssignmentSubmission, Classroom, ClassroomStudents, JoinRequests, ReferenceMaterial
+from classroom.versions import bump_classroom_version
+
+
+@receiver(post_delete, sender=Classroom)
+def drop_gradebook(sender, instance, **kwargs):
+  gradebook.invalidate_gradebook(instance.pk)
+
+
+@receiver(post_save, sender=ClassroomStudents)
+def add_gradebook_student(sender, instance, created, **kwargs):
+  if created:
+    gradebook.add_students(instance.classroom_id_id, [instance.student_id_id])
+
+
+@receiver(post_delete, sender=ClassroomStudents)
+def remove_gradebook_student(sender, instance, **kwargs):
+  gradebook.remove_students(instance.classroom_id_id, [instance.student_id_id])
+
+
+@receiver(post_save, sender=Assignment)
+def update_gradebook_assignment(sender, instance, **kwargs):
+  gradebook.record_assignment(instance.classroom_id_id, instance.pk, instance.description, instance.max_marks)
+
+
+@receiver(post_delete, sender=Assignment)
+def remove_gradebook_assignment(sender, instance, **kwargs):
+  gradebook.remove_assignment(instance.classroom_id_id, instance.pk)
+
+
+def _record_marks(submission, marks):
+  try:
+    classroom_id = submission.assignment_id.classroom_id_id
+  except Assignment.DoesNotExist:
+    # Deleted along with its assignment, which drops the whole column.
+    return
+  gradebook.record_grades(classroom_id, submission.assignment_id_id, [(submission.student_id_id, marks)])
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+def update_gradebook_marks(sender, instance, **kwargs):
+  _record_marks(instance, instance.marks)
+
+
+@receiver(post_delete, sender=AssignmentSubmission)
+def remove_gradebook_marks(sender, instance, **kwargs):
+  _record_marks(instance, None)
+
+
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=ReferenceMaterial)
+@receiver(post_delete, sender=AssignmentSubmission)
+def release_file(sender, instance, **kwargs):
+  ''' Drops this row's reference to its stored file once the delete is committed. '''
+  if instance.file:
+    storage, name = instance.file.storage, instance.file.name
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=ReferenceMaterial)
+@receiver(post_delete, sender=ReferenceMaterial)
+@receiver(post_save, sender=ClassroomStudents)
+@receiver(post_delete, sender=ClassroomStudents)
+@receiver(post_save, sender=JoinRequests)
+@receiver(post_delete, sender=JoinRequests)
+def bump_version(sender, instance, **kwargs):
+  bump_classroom_version(instance.classroom_id_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def bump_student_versions(sender, instance, created, **kwargs):
+  ''' Student and join request lists show names and avatars. '''
+  if created or not instance.is_student:
+    return
+  classroom_ids = set(ClassroomStudents.objects.filter(student_id=instance).values_list('classroom_id', flat=True))
+  classroom_ids.update(JoinRequests.objects.filter(student_id=instance).values_list('classroom_id', flat=True))
+  for classroom_id in classroom_ids:
+    bump_classroom_version(classroom_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def rename_gradebook_student(sender, instance, created, update_fields=None, **kwargs):
+  ''' Gradebooks keep each student's name. '''
+  if created or not instance.is_student:
+    return
+  if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+    return
+  name = instance.get_fullname()
+  for classroom_id in ClassroomStudents.objects.filter(student_id=instance).values_list('classroom_id', flat=True):
+    gradebook.rename_student(classroom_id, instance.pk, name)
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+'''
+Content-addressed storage for classroom files. Every distinct file is
+kept once as a blob under `blobs/<aa>/<bb>/<sha256>`; the names handed out
+to FileFields are hard links to that blob, so URLs, permissions and the
+media view keep working with the usual upload paths while duplicates cost
+no extra disk. The blob's link count is its reference count: deleting a
+name drops one link and the blob goes away with its last reference.
+The digest is stored in an extended attribute of the shared inode so a
+delete does not have to re-hash the file.
+'''
+
+BLOB_DIR = 'blobs'
+DIGEST_XATTR = 'user.iclass.sha256'
+READ_SIZE = 64 * 1024
+
+
+def blob_name(digest):
+  return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+@deconstructible
+class DeduplicatingStorage(FileSystemStorage):
+  def _blob_path(self, digest):
+    return self.path(blob_name(digest))
+
+  def _hash_chunks(self, content):
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+      hasher.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return hasher.hexdigest()
+
+  def _write_temporary(self, content):
+    """ Streams content into a temporary file next to the blobs, hashing it on the way. """
+    directory = self.path(os.path.join(BLOB_DIR, 'tmp'))
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    descriptor, path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, 'wb') as temporary:
+      for chunk in content.chunks():
+        chunk = chunk if isinstance(chunk, bytes) else chunk.encode()
+        hasher.update(chunk)
+        temporary.write(chunk)
+    return hasher.hexdigest(), path
+
+  def _publish_blob(self, source, digest):
+    blob = self._blob_path(digest)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    try:
+      os.setxattr(source, DIGEST_XATTR, digest.encode())
+    except (AttributeError, OSError):
+      pass
+    try:
+      os.link(source, blob)
+    except FileExistsError:
+      pass
+
+  def _link(self, digest, name):
+    """ Hard-links the blob to an available name and returns that name. """
+    while True:
+      full_path = self.path(name)
+      os.makedirs(os.path.dirname(full_path), exist_ok=True)
+      try:
+        os.link(self._blob_path(digest), full_path)
+        return name
+      except FileExistsError:
+        name = self.get_available_name(name)
+
+  def _save(self, name, content):
+    temporary = None
+    try:
+      # Seekable uploads are hashed first, so a duplicate is recognised
+      # without writing a single byte.
+      if hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)():
+        content.seek(0)
+        digest = self._hash_chunks(content)
+        content.seek(0)
+      else:
+        digest, temporary = self._write_temporary(content)
+
+      while True:
+        try:
+          return self._link(digest, name)
+        except FileNotFoundError:
+          # No blob with this content yet (or it was just released).
+          if temporary is None:
+            digest, temporary = self._write_temporary(content)
+          self._publish_blob(temporary, digest)
+    finally:
+      if temporary is not None:
+        os.remove(temporary)
+
+  def _digest_of(self, path):
+    try:
+      return os.getxattr(path, DIGEST_XATTR).decode()
+    except (AttributeError, OSError):
+      hasher = hashlib.sha256()
+      with open(path, 'rb') as source:
+        for data in iter(lambda: source.read(READ_SIZE), b''):
+          hasher.update(data)
+      return hasher.hexdigest()
+
+  def deduplicate(self, name, digest):
+    """
+    Moves a file that was written in place (e.g. a finished chunked upload)
+    into the blob store, replacing it with a link if the content is known.
+    """
+    path = self.path(name)
+    blob = self._blob_path(digest)
+    if os.path.exists(blob):
+      staging = path + '.dedup'
+      os.link(blob, staging)
+      os.replace(staging, path)
+    else:
+      self._publish_blob(path, digest)
+
+  def delete(self, name):
+    path = self.path(name)
+    try:
+      linked = os.stat(path).st_nlink > 1
+    except FileNotFoundError:
+      return
+    digest = self._digest_of(path) if linked else None
+    super().delete(name)
+    if digest is None:
+      return
+
+    blob = self._blob_path(digest)
+    try:
+      if os.stat(blob).st_nlink <= 1:
+        os.remove(blob)
+    except FileNotFoundError:
+      pass
+
+
+classroom_storage = DeduplicatingStorage()
@@ -1,3 +1,973 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.activity import ActivityTracker, record_activity
+from accounts.models import User
+from classroom.archives import READ_SIZE as ARCHIVE_READ_SIZE, stream_zip
+from classroom.deletion import delete_classroom
+from classroom.enrollment import resolve_join_requests
+from classroom.gradebook import build_gradebook, get_gradebook
+from classroom.grade_statistics import assignment_statistics, describe
+from classroom.membership import attends, teaches
+from classroom.management.commands.relayout_media import SHARDED, Command as RelayoutCommand
+from classroom.storage import BLOB_DIR, DIGEST_XATTR, DeduplicatingStorage, blob_name, classroom_storage
+from classroom.models import (
+  sharded_upload_path, Classroom, ClassroomDeletion, ClassroomStudents, JoinRequests, Assignment, AssignmentSubmission, ChunkedUpload
+)
+from classroom.uploads import expire_uploads
+from classroom.versions import classroom_version, with_versions
+from quiz.models import Answer, Question, Quiz, Sitting, StudentAnswer
+
+
+class ClassroomListQueryTests(TestCase):
+  @classmethod
+  def setUpTestData(cls):
+    cls.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    cls.student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    for number in range(12):
+      classroom = Classroom.objects.create(
+        id=uuid.uuid4(), room_number=number,
+        course_name='Course {}'.format(number), teacher_id=cls.teacher
+      )
+      ClassroomStudents.objects.create(classroom_id=classroom, student_id=cls.student)
+
+  def list_classrooms(self, user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.get('/classrooms')
+
+  def test_student_classroom_list_is_a_single_query(self):
+    with self.assertNumQueries(1):
+      response = self.list_classrooms(self.student)
+    self.assertEqual(len(response.data['classrooms']), 12)
+
+  def test_teacher_classroom_list_is_a_single_query(self):
+    with self.assertNumQueries(1):
+      response = self.list_classrooms(self.teacher)
+    self.assertEqual(len(response.data['classrooms']), 12)
+
+
+class ClassroomLookupTests(TestCase):
+  def test_malformed_and_unknown_classroom_ids_return_404(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    client = APIClient()
+    client.force_authenticate(teacher)
+    for classroom_id in ('not-a-uuid', uuid.uuid4()):
+      for route in ('assignments', 'students', 'dashboard', 'quizzes'):
+        with self.assertNumQueries(0 if classroom_id == 'not-a-uuid' else 1):
+          response = client.get('/classrooms/{}/{}'.format(classroom_id, route))
+        self.assertEqual(response.status_code, 404, route)
+
+
+class MembershipCacheTests(TestCase):
+  def setUp(self):
+    cache.clear()
+
+  def test_membership_follows_enrollment_changes(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    load = lambda: with_versions(Classroom.objects).get(pk=classroom.pk)
+
+    self.assertTrue(teaches(teacher, classroom))
+    self.assertFalse(attends(student, load()))
+
+    enrollment = ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+    self.assertTrue(attends(student, load()))
+    loaded = load()
+    with self.assertNumQueries(0):
+      self.assertTrue(attends(student, loaded))
+
+    # A removal moves the version in the database, so no process can still
+    # find the entry cached before it.
+    with mock.patch('classroom.membership.cache.delete') as delete:
+      enrollment.delete()
+    delete.assert_not_called()
+    self.assertFalse(attends(student, load()))
+
+  def test_handing_a_classroom_over_changes_its_teacher(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    successor = User.objects.create(username='successor', email='successor@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    self.assertTrue(teaches(teacher, classroom))
+    self.assertFalse(teaches(successor, classroom))
+
+    classroom.teacher_id = successor
+    classroom.save()
+
+    self.assertFalse(teaches(teacher, classroom))
+    self.assertTrue(teaches(successor, classroom))
+
+
+class KeysetPaginationTests(TestCase):
+  def test_students_are_paged_under_the_existing_key(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    for number in range(5):
+      student = User.objects.create(
+        username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True
+      )
+      ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    url = '/classrooms/{}/students'.format(classroom.id)
+
+    first = client.get(url, {'page_size': 3}).data
+    self.assertEqual(len(first['students']), 3)
+    self.assertIsNone(first['previous'])
+
+    second = client.get(first['next']).data
+    self.assertEqual(len(second['students']), 2)
+    self.assertIsNone(second['next'])
+
+  def test_activity_of_the_listed_students_is_fetched_together(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    students = [
+      User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      for number in range(3)
+    ]
+    for student in students:
+      ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+    with mock.patch('accounts.activity.tracker', ActivityTracker()), mock.patch('accounts.activity.run_in_background'):
+      record_activity(students[1])
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    with mock.patch('classroom.api.serializers.is_active_now', side_effect=AssertionError('one lookup per student')):
+      response = client.get('/classrooms/{}/students'.format(classroom.id))
+    self.assertEqual([row['active_now'] for row in response.data['students']], [False, True, False])
+
+  def test_lists_are_whole_unless_a_page_is_asked_for(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    ClassroomStudents.objects.bulk_create([
+      ClassroomStudents(classroom_id=classroom, student_id=User.objects.create(
+        username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True
+      ))
+      for number in range(60)
+    ])
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    url = '/classrooms/{}/students'.format(classroom.id)
+
+    response = client.get(url).data
+    self.assertEqual(list(response), ['students'])
+    self.assertEqual(len(response['students']), 60)
+    self.assertEqual(len(client.get(url, {'page_size': 50}).data['students']), 50)
+
+
+class JoinRequestBulkTests(TestCase):
+  def test_accept_all_pending_requests(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    students = [
+      User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      for number in range(3)
+    ]
+    for student in students:
+      JoinRequests.objects.create(classroom_id=classroom, student_id=student)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=students[0])
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    with CaptureQueriesContext(connection) as queries:
+      response = client.post('/classrooms/{}/join_requests/bulk'.format(classroom.id), {'all': True}, format='json')
+
+    self.assertEqual(response.data, {'accepted': 3})
+    self.assertFalse(classroom.pending_requests.exists())
+    self.assertEqual(classroom.students.count(), 3)
+    # Reading the requests, then one delete (collect and DELETE) with the enrollment.
+    touching = [query for query in queries if '"classroom_joinrequests"' in query['sql']]
+    self.assertEqual(len(touching), 3)
+
+  def test_reject_deletes_only_the_chosen_requests(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    requests = [
+      JoinRequests.objects.create(
+        classroom_id=classroom,
+        student_id=User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      )
+      for number in range(3)
+    ]
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    response = client.delete(
+      '/classrooms/{}/join_requests/bulk'.format(classroom.id), {'ids': [requests[0].id, requests[1].id]}, format='json'
+    )
+
+    self.assertEqual(response.data, {'rejected': 2})
+    self.assertEqual(list(classroom.pending_requests.values_list('id', flat=True)), [requests[2].id])
+    self.assertFalse(classroom.students.exists())
+
+  def test_bulk_accept_takes_the_same_queries_for_any_number_of_requests(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+
+    def accept(count):
+      classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+      for number in range(count):
+        student = User.objects.create(
+          username='{}-{}'.format(classroom.id, number), email='{}-{}@example.com'.format(classroom.id, number), is_student=True
+        )
+        JoinRequests.objects.create(classroom_id=classroom, student_id=student)
+      version = classroom_version(classroom.pk)
+      with CaptureQueriesContext(connection) as queries:
+        resolve_join_requests(classroom)
+      self.assertEqual(classroom_version(classroom.pk), version + 1)
+      return len(queries)
+
+    self.assertEqual(accept(3), accept(30))
+
+
+class RosterEnrollmentTests(TestCase):
+  def test_roster_enrolls_students_and_reports_unknown_entries(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    User.objects.create(username='alice', email='alice@example.com', is_student=True)
+    User.objects.create(username='bob', email='bob@example.com', is_student=True)
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    response = client.post(
+      '/classrooms/{}/students/roster'.format(classroom.id),
+      {'entries': ['Alice@Example.com', 'bob', 'teacher', 'nobody']},
+      format='json'
+    )
+
+    self.assertEqual(response.data['enrolled'], 2)
+    self.assertEqual(response.data['unknown'], ['nobody'])
+    self.assertEqual(response.data['not_students'], ['teacher'])
+    self.assertEqual(classroom.students.count(), 2)
+
+  def test_roster_file_is_checked_before_anyone_is_enrolled(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    User.objects.create(username='alice', email='alice@example.com', is_student=True)
+    client = APIClient()
+    client.force_authenticate(teacher)
+    url = '/classrooms/{}/students/roster'.format(classroom.id)
+
+    with mock.patch('classroom.enrollment.BATCH_SIZE', 1):
+      undecodable = SimpleUploadedFile('roster.csv', b'username\nalice\n' + b'x' * 10000 + b'\n\xff\xfe\n')
+      response = client.post(url, {'file': undecodable}, format='multipart')
+    self.assertEqual(response.status_code, 400)
+
+    malformed = SimpleUploadedFile('roster.csv', b'alice\n' + b'"' + b'x' * 200000 + b'"\n')
+    response = client.post(url, {'file': malformed}, format='multipart')
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual(classroom.students.count(), 0)
+
+    response = client.post(url, {'file': SimpleUploadedFile('roster.csv', b'username\nalice\n')}, format='multipart')
+    self.assertEqual(response.data['enrolled'], 1)
+
+  def test_enrolling_deletes_pending_join_requests(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    alice = User.objects.create(username='alice', email='alice@example.com', is_student=True)
+    bob = User.objects.create(username='bob', email='bob@example.com', is_student=True)
+    JoinRequests.objects.create(classroom_id=classroom, student_id=alice)
+    JoinRequests.objects.create(classroom_id=classroom, student_id=bob)
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    client.post('/classrooms/{}/students/roster'.format(classroom.id), {'entries': ['alice']}, format='json')
+
+    self.assertEqual(list(JoinRequests.objects.filter(classroom_id=classroom).values_list('student_id', flat=True)), [bob.id])
+
+
+class GradeBulkTests(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    self.classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=self.teacher)
+    self.assignment = Assignment.objects.create(
+      classroom_id=self.classroom, teacher=self.teacher, description='Homework',
+      file='assignments/homework.pdf', deadline='2030-01-01', max_marks=20
+    )
+    self.submissions = [
+      AssignmentSubmission.objects.create(
+        assignment_id=self.assignment,
+        student_id=User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True),
+        file='submissions/{}.pdf'.format(number)
+      )
+      for number in range(3)
+    ]
+    self.client = APIClient()
+    self.client.force_authenticate(self.teacher)
+    self.url = '/classrooms/{}/assignments/{}/submissions/grades'.format(self.classroom.id, self.assignment.id)
+
+  def test_csv_grades_are_saved_together(self):
+    grades = 'student,student_id,marks\nstudent0,,12\nSTUDENT1@example.com,,20\n,{},7\n'.format(self.submissions[2].student_id_id)
+    response = self.client.post(self.url, {'file': SimpleUploadedFile('grades.csv', grades.encode())}, format='multipart')
+
+    self.assertEqual(response.data, {'graded': 3, 'errors': []})
+    self.assertEqual(
+      list(self.assignment.assignment_submissions.order_by('id').values_list('marks', flat=True)),
+      [12, 20, 7]
+    )
+
+  def test_numeric_usernames_are_not_taken_for_ids(self):
+    numeric = User.objects.create(
+      username=str(self.submissions[0].student_id_id), email='numeric@example.com', is_student=True
+    )
+    submission = AssignmentSubmission.objects.create(
+      assignment_id=self.assignment, student_id=numeric, file='submissions/numeric.pdf'
+    )
+    grades = 'username,marks\n{},15\n'.format(numeric.username)
+    response = self.client.post(self.url, {'file': SimpleUploadedFile('grades.csv', grades.encode())}, format='multipart')
+
+    self.assertEqual(response.data, {'graded': 1, 'errors': []})
+    submission.refresh_from_db()
+    self.submissions[0].refresh_from_db()
+    self.assertEqual((submission.marks, self.submissions[0].marks), (15, 0))
+
+    response = self.client.post(self.url, [{'student': numeric.username, 'marks': 16}], format='json')
+    self.assertEqual(response.data, {'graded': 1, 'errors': []})
+    response = self.client.post(self.url, [{'username': 'student0', 'student_id': numeric.id, 'marks': 1}], format='json')
+    self.assertEqual(response.status_code, 400)
+
+  def test_marks_above_maximum_reject_the_whole_batch(self):
+    response = self.client.post(self.url, [
+      {'submission': self.submissions[0].id, 'marks': 10},
+      {'submission': self.submissions[1].id, 'marks': 21},
+    ], format='json')
+
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual([error['row'] for error in response.data['errors']], [2])
+    self.assertFalse(self.assignment.assignment_submissions.exclude(marks=0).exists())
+
+
+class GradebookTests(TransactionTestCase):
+  # The gradebook is patched in on_commit callbacks, which TestCase never runs.
+  def test_gradebook_follows_changes_without_rebuilding(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    students = [
+      User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      for number in range(2)
+    ]
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=students[0])
+    assignment = Assignment.objects.create(
+      classroom_id=classroom, teacher=teacher, description='Homework',
+      file='assignments/homework.pdf', deadline='2030-01-01', max_marks=20
+    )
+    get_gradebook(classroom.pk)
+
+    submission = AssignmentSubmission.objects.create(assignment_id=assignment, student_id=students[0], file='submissions/0.pdf')
+    submission.marks = 15
+    submission.save()
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=students[1])
+
+    # Only the generation is read: the patches kept the cached copy current.
+    with self.assertNumQueries(1):
+      gradebook = get_gradebook(classroom.pk)
+    self.assertEqual(gradebook, build_gradebook(classroom.pk))
+    self.assertEqual(gradebook['students'][students[0].pk]['total'], 15)
+
+    assignment.delete()
+    self.assertEqual(get_gradebook(classroom.pk)['students'][students[0].pk]['total'], 0)
+
+  def test_student_name_changes_reach_the_gradebook(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    student = User.objects.create(username='student', email='student@example.com', first_name='Ann', is_student=True)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+    self.assertEqual(get_gradebook(classroom.pk)['students'][student.pk]['name'], 'Ann')
+
+    student.first_name, student.last_name = 'Anne', 'Smith'
+    student.save()
+
+    with self.assertNumQueries(1):
+      self.assertEqual(get_gradebook(classroom.pk)['students'][student.pk]['name'], 'Anne Smith')
+
+  def test_changes_made_by_another_process_are_not_served_stale(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+    assignment = Assignment.objects.create(
+      classroom_id=classroom, teacher=teacher, description='Homework',
+      file='assignments/homework.pdf', deadline='2030-01-01', max_marks=20
+    )
+    submission = AssignmentSubmission.objects.create(assignment_id=assignment, student_id=student, file='submissions/0.pdf')
+    self.assertEqual(get_gradebook(classroom.pk)['students'][student.pk]['total'], 0)
+
+    # Graded elsewhere: this process's cached copy is never patched.
+    with mock.patch('classroom.gradebook._apply'):
+      submission.marks = 12
+      submission.save()
+
+    self.assertEqual(get_gradebook(classroom.pk)['students'][student.pk]['total'], 12)
+
+
+class DashboardTests(TestCase):
+  def test_dashboard_sections_take_a_fixed_number_of_queries(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    for number in range(5):
+      student = User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+      assignment = Assignment.objects.create(
+        classroom_id=classroom, teacher=teacher, description='Homework {}'.format(number),
+        file='assignments/{}.pdf'.format(number), deadline='2030-01-01'
+      )
+      AssignmentSubmission.objects.create(assignment_id=assignment, student_id=student, file='submissions/{}.pdf'.format(number))
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    client.get('/classrooms/{}/dashboard'.format(classroom.id))
+    # Classroom, five sections and the counts.
+    with self.assertNumQueries(7):
+      response = client.get('/classrooms/{}/dashboard'.format(classroom.id))
+
+    dashboard = response.data['dashboard']
+    self.assertEqual(len(dashboard['students']), 5)
+    self.assertEqual(dashboard['counts']['submissions'], 5)
+    self.assertEqual(dashboard['summary']['missing_submissions'], 20)
+
+    response = client.get('/classrooms/{}/dashboard?sections=students,nonsense'.format(classroom.id))
+    self.assertEqual(response.status_code, 400)
+
+  def test_missing_submissions_only_count_enrolled_students(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    assignment = Assignment.objects.create(
+      classroom_id=classroom, teacher=teacher, description='Homework', file='assignments/0.pdf', deadline='2030-01-01'
+    )
+    enrolled = User.objects.create(username='enrolled', email='enrolled@example.com', is_student=True)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=enrolled)
+    for number in range(3):
+      student = User.objects.create(username='left{}'.format(number), email='left{}@example.com'.format(number), is_student=True)
+      AssignmentSubmission.objects.create(assignment_id=assignment, student_id=student, file='submissions/{}.pdf'.format(number))
+
+    client = APIClient()
+    client.force_authenticate(teacher)
+    dashboard = client.get('/classrooms/{}/dashboard?sections=summary'.format(classroom.id)).data['dashboard']
+    self.assertEqual(dashboard['counts']['submissions'], 3)
+    self.assertEqual(dashboard['summary']['missing_submissions'], 1)
+
+    AssignmentSubmission.objects.create(assignment_id=assignment, student_id=enrolled, file='submissions/enrolled.pdf')
+    dashboard = client.get('/classrooms/{}/dashboard?sections=summary'.format(classroom.id)).data['dashboard']
+    self.assertEqual(dashboard['summary']['missing_submissions'], 0)
+
+
+class GradeStatisticsTests(TransactionTestCase):
+  def test_describe_matches_numpy_conventions(self):
+    described = describe([2, 4, 4, 4, 5, 5, 7, 9], 10, bins=5)
+    self.assertEqual(described['mean'], 5.0)
+    self.assertEqual(described['median'], 4.5)
+    self.assertEqual(described['std'], 2.0)
+    self.assertEqual(described['percentiles'][25], 4.0)
+    self.assertEqual(described['percentiles'][90], 7.6)
+    self.assertEqual(described['histogram']['counts'], [0, 1, 5, 1, 1])
+
+  def test_statistics_are_recomputed_after_a_grade_change(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    assignment = Assignment.objects.create(
+      classroom_id=classroom, teacher=teacher, description='Homework',
+      file='assignments/homework.pdf', deadline='2030-01-01', max_marks=10
+    )
+    students = [
+      User.objects.create(username='student{}'.format(number), email='student{}@example.com'.format(number), is_student=True)
+      for number in range(3)
+    ]
+    for student in students:
+      ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+    submission = AssignmentSubmission.objects.create(assignment_id=assignment, student_id=students[0], file='submissions/0.pdf')
+
+    self.assertEqual(assignment_statistics(assignment)['missing'], 2)
+    with self.assertNumQueries(1):
+      assignment_statistics(assignment)
+
+    # Graded by another process: nothing in this process's cache is touched.
+    with mock.patch('classroom.gradebook._apply'), mock.patch('classroom.grade_statistics.cache.delete') as delete:
+      submission.marks = 8
+      submission.save()
+    delete.assert_not_called()
+    statistics = assignment_statistics(assignment)
+    self.assertEqual(statistics['mean'], 8.0)
+    self.assertEqual(statistics['histogram']['counts'][-2], 1)
+
+
+class ConditionalListTests(TransactionTestCase):
+  def test_lists_answer_not_modified_until_the_classroom_changes(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    client = APIClient()
+    client.force_authenticate(teacher)
+    url = '/classrooms/{}/assignments'.format(classroom.id)
+
+    etag = client.get(url)['ETag']
+    # The classroom with its version; no membership, list query or serialization.
+    with self.assertNumQueries(1):
+      response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, 304)
+    self.assertNotEqual(client.get(url + '?page_size=10')['ETag'], etag)
+
+    Assignment.objects.create(
+      classroom_id=classroom, teacher=teacher, description='Homework',
+      file='assignments/homework.pdf', deadline='2030-01-01'
+    )
+    # The version lives in the database, not in a per-process cache.
+    cache.clear()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(len(response.data['assignments']), 1)
+    self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+  def test_student_list_tags_change_with_the_activity_period(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    client = APIClient()
+    client.force_authenticate(teacher)
+    url = '/classrooms/{}/students'.format(classroom.id)
+
+    with mock.patch('classroom.api.views.activity_period', return_value=1):
+      etag = client.get(url)['ETag']
+      self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    with mock.patch('classroom.api.views.activity_period', return_value=2):
+      self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ClassroomDeletionTests(TransactionTestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+
+  def test_classroom_is_hidden_at_once_and_deleted_in_the_background(self):
+    cache.clear()
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=student)
+
+    with override_settings(MEDIA_ROOT=self.media_root):
+      assignment = Assignment(classroom_id=classroom, teacher=teacher, description='Homework', deadline='2030-01-01')
+      assignment.file.save('homework.pdf', ContentFile(b'homework'))
+      submission = AssignmentSubmission(assignment_id=assignment, student_id=student)
+      submission.file.save('answer.pdf', ContentFile(b'answer'))
+      path = submission.file.path
+
+      client = APIClient()
+      client.force_authenticate(teacher)
+      response = client.delete('/classrooms/{}'.format(classroom.id))
+      self.assertEqual(response.status_code, 202)
+      self.assertEqual(client.get('/classrooms/{}'.format(classroom.id)).status_code, 404)
+
+      for _attempt in range(100):
+        deletion = ClassroomDeletion.objects.get(classroom_id=classroom.id)
+        if deletion.status in (ClassroomDeletion.DONE, ClassroomDeletion.FAILED):
+          break
+        time.sleep(0.05)
+
+    self.assertEqual(deletion.status, ClassroomDeletion.DONE)
+    self.assertEqual(deletion.files, 2)
+    self.assertFalse(Classroom.objects.filter(pk=classroom.pk).exists())
+    self.assertFalse(os.path.exists(path))
+    response = client.get('/classrooms/{}/deletion'.format(classroom.id))
+    self.assertEqual(response.data['deletion']['progress'], 100)
+
+
+class ClassroomDeletionProgressTests(TestCase):
+  def test_every_row_is_counted_once(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    now = timezone.now()
+    quiz = Quiz.objects.create(
+      classroom=classroom, owner=teacher, name='Quiz', duration=timedelta(minutes=10),
+      start_time=now, end_time=now, max_attempts=1
+    )
+    question = Question.objects.create(quiz=quiz, text='Question', points=1)
+    answer = Answer.objects.create(question=question, text='Answer', is_correct=True)
+    sitting = Sitting.objects.create(student=student, quiz=quiz, submission_time=now)
+    for _number in range(2):
+      StudentAnswer.objects.create(sitting=sitting, question=question, answer=answer, submission_time=now)
+    deletion = ClassroomDeletion.objects.create(classroom_id=classroom.pk, course_name=classroom.course_name)
+
+    delete_classroom(deletion.pk, batch_size=1)
+
+    deletion.refresh_from_db()
+    self.assertEqual(deletion.status, ClassroomDeletion.DONE)
+    # Six quiz rows and the classroom itself.
+    self.assertEqual((deletion.deleted, deletion.total), (7, 7))
+
+
+class OrphanedMediaTests(TestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+
+  def test_orphans_and_their_blobs_are_removed(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+
+    with override_settings(MEDIA_ROOT=self.media_root):
+      assignment = Assignment(classroom_id=classroom, teacher=teacher, description='Homework', deadline='2030-01-01')
+      assignment.file.save('homework.pdf', ContentFile(b'homework'))
+      kept = assignment.file.path
+      orphan = classroom_storage.path(classroom_storage.save('assignments/replaced.pdf', ContentFile(b'replaced')))
+      time.sleep(0.05)
+
+      call_command('collect_orphaned_media', '--grace-period=0', stdout=io.StringIO())
+      self.assertTrue(os.path.exists(orphan))
+
+      call_command('collect_orphaned_media', '--delete', '--grace-period=0', stdout=io.StringIO())
+
+    self.assertTrue(os.path.exists(kept))
+    self.assertFalse(os.path.exists(orphan))
+    blobs = [name for _directory, _dirs, names in os.walk(os.path.join(self.media_root, 'blobs')) for name in names]
+    self.assertEqual(len(blobs), 1)
+
+
+class DeduplicatingStorageTests(TransactionTestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+    self.storage = DeduplicatingStorage(location=self.media_root)
+
+  def blobs(self):
+    return sorted(
+      name for _directory, _dirs, names in os.walk(os.path.join(self.media_root, BLOB_DIR)) for name in names
+    )
+
+  def test_identical_content_is_stored_once(self):
+    first = self.storage.save('notes/first.txt', ContentFile(b'same'))
+    second = self.storage.save('notes/first.txt', ContentFile(b'same'))
+    other = self.storage.save('notes/other.txt', ContentFile(b'other'))
+
+    self.assertNotEqual(first, second)
+    self.assertEqual(os.stat(self.storage.path(first)).st_ino, os.stat(self.storage.path(second)).st_ino)
+    self.assertNotEqual(os.stat(self.storage.path(first)).st_ino, os.stat(self.storage.path(other)).st_ino)
+    self.assertEqual(self.storage.open(second).read(), b'same')
+    self.assertEqual(self.blobs(), sorted(hashlib.sha256(data).hexdigest() for data in (b'same', b'other')))
+    self.assertEqual(os.stat(self.storage.path(blob_name(hashlib.sha256(b'same').hexdigest()))).st_nlink, 3)
+
+  def test_digest_is_kept_on_the_inode(self):
+    name = self.storage.save('notes/file.txt', ContentFile(b'content'))
+    try:
+      stored = os.getxattr(self.storage.path(name), DIGEST_XATTR)
+    except OSError:
+      self.skipTest('extended attributes are not supported here')
+    self.assertEqual(stored.decode(), hashlib.sha256(b'content').hexdigest())
+
+    with mock.patch('classroom.storage.hashlib.sha256') as sha256:
+      self.storage.delete(name)
+    sha256.assert_not_called()
+    self.assertEqual(self.blobs(), [])
+
+  def test_blob_goes_with_its_last_name(self):
+    first = self.storage.save('notes/file.txt', ContentFile(b'content'))
+    second = self.storage.save('notes/file.txt', ContentFile(b'content'))
+    # Without the attribute the digest is recomputed from the file.
+    for name in (first, second):
+      try:
+        os.removexattr(self.storage.path(name), DIGEST_XATTR)
+      except OSError:
+        pass
+
+    self.storage.delete(first)
+    self.assertFalse(self.storage.exists(first))
+    self.assertEqual(self.blobs(), [hashlib.sha256(b'content').hexdigest()])
+
+    self.storage.delete(second)
+    self.assertEqual(self.blobs(), [])
+    self.storage.delete(second)
+
+  def test_deleting_a_row_releases_its_file_on_commit(self):
+    teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=teacher)
+    with override_settings(MEDIA_ROOT=self.media_root):
+      kept = Assignment(classroom_id=classroom, teacher=teacher, description='Kept', deadline='2030-01-01')
+      kept.file.save('homework.pdf', ContentFile(b'homework'))
+      deleted = Assignment(classroom_id=classroom, teacher=teacher, description='Deleted', deadline='2030-01-01')
+      deleted.file.save('homework.pdf', ContentFile(b'homework'))
+      path = deleted.file.path
+
+      with transaction.atomic():
+        deleted.delete()
+        self.assertTrue(os.path.exists(path))
+      self.assertFalse(os.path.exists(path))
+      self.assertEqual(self.blobs(), [hashlib.sha256(b'homework').hexdigest()])
+
+      kept.delete()
+      self.assertFalse(os.path.exists(kept.file.path))
+      self.assertEqual(self.blobs(), [])
+
+
+class StreamZipTests(TestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+    settings_override = override_settings(MEDIA_ROOT=self.media_root)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+
+  def test_archive_is_streamed_in_read_sized_chunks(self):
+    large, small = os.urandom(3 * ARCHIVE_READ_SIZE + 100), b'small file'
+    large_name = default_storage.save('submissions/large.bin', ContentFile(large))
+    small_name = default_storage.save('submissions/small.txt', ContentFile(small))
+
+    chunks = [chunk for chunk in stream_zip([
+      ('student/large.bin', large_name), ('missing.txt', 'submissions/missing.txt'), ('student/small.txt', small_name),
+    ]) if chunk]
+
+    # Each chunk is one read plus at most a local header or data descriptor.
+    self.assertTrue(all(len(chunk) <= ARCHIVE_READ_SIZE + 1024 for chunk in chunks))
+    self.assertGreaterEqual(sum(len(chunk) >= ARCHIVE_READ_SIZE for chunk in chunks), 3)
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+      self.assertIsNone(archive.testzip())
+      self.assertEqual(archive.namelist(), ['student/large.bin', 'student/small.txt'])
+      self.assertEqual(archive.read('student/large.bin'), large)
+      self.assertEqual(archive.read('student/small.txt'), small)
+
+
+class MediaLayoutTests(TestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+    settings_override = override_settings(MEDIA_ROOT=self.media_root)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+
+    self.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    self.classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=self.teacher)
+
+  def flat_assignment(self, name, content):
+    return Assignment.objects.create(
+      classroom_id=self.classroom, teacher=self.teacher, description=name, deadline='2030-01-01',
+      file=classroom_storage.save('assignments/' + name, ContentFile(content))
+    )
+
+  def test_upload_paths_are_sharded_by_a_fresh_key(self):
+    first = sharded_upload_path('notes', self.classroom.id, 'Lecture.Notes.PDF')
+    second = sharded_upload_path('notes', self.classroom.id, 'Lecture.Notes.PDF')
+
+    self.assertNotEqual(first, second)
+    self.assertRegex(first, SHARDED)
+    kind, classroom, shard, sub_shard, key = first.split('/')
+    self.assertEqual((kind, classroom), ('notes', str(self.classroom.id)))
+    self.assertEqual((shard, sub_shard), (key[:2], key[2:4]))
+    self.assertTrue(key.endswith('.pdf'))
+    self.assertTrue(sharded_upload_path('notes', self.classroom.id, 'x.' + 'a' * 20).endswith('.' + 'a' * 9))
+
+  def test_relayout_moves_flat_files_and_skips_rows_that_changed(self):
+    moved = self.flat_assignment('moved.pdf', b'moved')
+    raced = self.flat_assignment('raced.pdf', b'raced')
+    old_path = classroom_storage.path(moved.file.name)
+
+    command = RelayoutCommand()
+    relink = command._relink
+    def relink_while_reuploaded(instance, field):
+      link = relink(instance, field)
+      if instance.pk == raced.pk:
+        Assignment.objects.filter(pk=raced.pk).update(file='assignments/reuploaded.pdf')
+      return link
+
+    output = io.StringIO()
+    with mock.patch.object(command, '_relink', side_effect=relink_while_reuploaded):
+      call_command(command, stdout=output)
+
+    moved.refresh_from_db()
+    raced.refresh_from_db()
+    self.assertRegex(moved.file.name, SHARDED)
+    self.assertEqual(moved.file.read(), b'moved')
+    self.assertFalse(os.path.exists(old_path))
+    self.assertEqual(raced.file.name, 'assignments/reuploaded.pdf')
+    self.assertIn('assignments: moved 1, 0 missing on disk, 1 changed while moving.', output.getvalue())
+    names = [name for _directory, _dirs, names in os.walk(os.path.join(self.media_root, 'assignments')) for name in names]
+    self.assertEqual(len(names), 2)
+
+
+class MediaAccessTests(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+    settings_override = override_settings(MEDIA_ROOT=self.media_root)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+
+    self.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    self.student = User.objects.create(username='student', email='student@example.com', is_student=True)
+    self.outsider = User.objects.create(username='outsider', email='outsider@example.com', is_student=True)
+    classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=self.teacher)
+    ClassroomStudents.objects.create(classroom_id=classroom, student_id=self.student)
+    assignment = Assignment(classroom_id=classroom, teacher=self.teacher, description='Homework', deadline='2030-01-01')
+    assignment.file.save('homework.pdf', ContentFile(b'homework'))
+    submission = AssignmentSubmission(assignment_id=assignment, student_id=self.student)
+    submission.file.save('answer.pdf', ContentFile(b'answer'))
+    self.assignment_name = assignment.file.name
+    self.submission_name = submission.file.name
+
+  def request(self, path, user=None, method='get', **headers):
+    client = APIClient()
+    if user is not None:
+      client.force_authenticate(user)
+    return getattr(client, method)('/uploads/' + path, **headers)
+
+  def fetch(self, path, user=None, **headers):
+    response = self.request(path, user, **headers)
+    return response.status_code, b''.join(getattr(response, 'streaming_content', [])) or response.content
+
+  def test_traversal_through_the_public_avatars_directory_is_refused(self):
+    for path in ('avatars/../' + self.submission_name, 'avatars/%2e%2e/' + self.submission_name):
+      self.assertEqual(self.fetch(path)[0], 404)
+    self.assertEqual(self.fetch('avatars/./../' + self.submission_name, self.outsider)[0], 404)
+
+  def test_anonymous_users_cannot_fetch_classroom_files(self):
+    self.assertEqual(self.fetch(self.submission_name)[0], 404)
+    self.assertEqual(self.fetch(self.assignment_name)[0], 404)
+
+  def test_access_follows_classroom_roles(self):
+    self.assertEqual(self.fetch(self.submission_name, self.teacher), (200, b'answer'))
+    self.assertEqual(self.fetch(self.submission_name, self.student), (200, b'answer'))
+    self.assertEqual(self.fetch(self.assignment_name, self.student), (200, b'homework'))
+    self.assertEqual(self.fetch(self.assignment_name, self.outsider)[0], 404)
+    self.assertEqual(self.fetch(self.submission_name, self.outsider)[0], 404)
+
+  def test_byte_ranges(self):
+    response = self.request(self.assignment_name, self.student, HTTP_RANGE='bytes=2-5')
+    self.assertEqual(response.status_code, 206)
+    self.assertEqual(response['Content-Range'], 'bytes 2-5/8')
+    self.assertEqual(b''.join(response.streaming_content), b'mewo')
+    self.assertEqual(self.fetch(self.assignment_name, self.student, HTTP_RANGE='bytes=-4'), (206, b'work'))
+
+    response = self.request(self.assignment_name, self.student, HTTP_RANGE='bytes=8-')
+    self.assertEqual(response.status_code, 416)
+    self.assertEqual(response['Content-Range'], 'bytes */8')
+
+  def test_a_stale_if_range_sends_the_whole_file(self):
+    status = self.fetch(self.assignment_name, self.student, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+    self.assertEqual(status, (200, b'homework'))
+
+  def test_matching_etag_is_not_modified(self):
+    etag = self.request(self.assignment_name, self.student)['ETag']
+    response = self.request(self.assignment_name, self.student, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, 304)
+    self.assertEqual(response['ETag'], etag)
+    self.assertEqual(self.fetch(self.assignment_name, self.student, HTTP_IF_NONE_MATCH='"other"'), (200, b'homework'))
+
+  def test_head_sends_headers_only(self):
+    response = self.request(self.assignment_name, self.student, method='head')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response['Content-Length'], '8')
+    self.assertIn('ETag', response)
+    self.assertEqual(b''.join(response.streaming_content), b'')
+    self.assertEqual(self.request(self.assignment_name, self.outsider, method='head').status_code, 404)
+
+  @override_settings(MEDIA_ACCEL={'MODE': 'nginx', 'INTERNAL_PREFIX': '/protected-uploads/'})
+  def test_nginx_serves_the_file_after_the_permission_check(self):
+    response = self.request(self.assignment_name, self.student)
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response['X-Accel-Redirect'], '/protected-uploads/' + self.assignment_name)
+    self.assertEqual(response.content, b'')
+    self.assertEqual(self.request(self.assignment_name, self.outsider).status_code, 404)
+
+    os.makedirs(os.path.join(self.media_root, 'avatars'))
+    with open(os.path.join(self.media_root, 'avatars', 'my phötö#1.png'), 'wb') as avatar:
+      avatar.write(b'png')
+    response = self.request('avatars/my phötö%231.png')
+    self.assertEqual(response['X-Accel-Redirect'], '/protected-uploads/avatars/my%20ph%C3%B6t%C3%B6%231.png')
+
+
+class ChunkedUploadTests(TransactionTestCase):
+  def setUp(self):
+    cache.clear()
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root)
+    settings_override = override_settings(MEDIA_ROOT=self.media_root)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+
+    self.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+    self.classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=self.teacher)
+    self.assignment = Assignment.objects.create(
+      classroom_id=self.classroom, teacher=self.teacher, description='Homework',
+      file='assignments/old.pdf', deadline='2030-01-01'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(self.teacher)
+    self.data = os.urandom(150 * 1024)
+
+  def start(self):
+    response = self.client.post('/classrooms/{}/uploads'.format(self.classroom.id), {
+      'target': ChunkedUpload.ASSIGNMENT, 'object_id': self.assignment.id, 'filename': 'notes.pdf',
+      'size': len(self.data), 'sha256': hashlib.sha256(self.data).hexdigest(),
+    }, format='json')
+    self.assertEqual(response.status_code, 201)
+    return '/classrooms/{}/uploads/{}'.format(self.classroom.id, response.data['upload']['id'])
+
+  def patch(self, url, offset, chunk, **headers):
+    return self.client.generic(
+      'PATCH', url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers
+    )
+
+  def test_a_file_uploaded_in_two_chunks_is_attached_to_its_target(self):
+    url = self.start()
+    first, second = self.data[:100 * 1024], self.data[100 * 1024:]
+
+    response = self.patch(url, 0, first, HTTP_UPLOAD_CHECKSUM='sha256 ' + hashlib.sha256(first).hexdigest())
+    self.assertEqual(response['Upload-Offset'], str(len(first)))
+    # A resent or out of order chunk is refused without touching the file.
+    self.assertEqual(self.patch(url, 0, first).status_code, 409)
+    self.assertEqual(self.patch(url, len(first), second, HTTP_UPLOAD_CHECKSUM='sha256 ' + '0' * 64).status_code, 400)
+    self.assertEqual(self.client.get(url)['Upload-Offset'], str(len(first)))
+    self.assertEqual(self.client.post(url + '/complete').status_code, 409)
+
+    response = self.patch(url, len(first), second)
+    self.assertEqual(response['Upload-Offset'], str(len(self.data)))
+    response = self.client.post(url + '/complete')
+    self.assertEqual(response.status_code, 200)
+
+    self.assignment.refresh_from_db()
+    with self.assignment.file.open('rb') as uploaded:
+      self.assertEqual(uploaded.read(), self.data)
+    self.assertEqual(self.client.post(url + '/complete').status_code, 409)
+
+  def test_idle_uploads_expire_with_their_partial_files(self):
+    url = self.start()
+    self.patch(url, 0, self.data[:1024])
+    upload = ChunkedUpload.objects.get()
+    partial = default_storage.path(upload.path)
+    self.assertTrue(os.path.exists(partial))
+
+    self.assertEqual(expire_uploads(60), 0)
+    ChunkedUpload.objects.update(updated=timezone.now() - timedelta(hours=2))
+    self.assertEqual(expire_uploads(60), 1)
+    self.assertFalse(ChunkedUpload.objects.exists())
+    self.assertFalse(os.path.exists(partial))
+    self.assertEqual(self.patch(url, 1024, self.data[1024:2048]).status_code, 404)
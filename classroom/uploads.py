@@ -0,0 +1,246 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from classroom.models import Assignment, AssignmentSubmission, ChunkedUpload, ReferenceMaterial
+
+'''
+Resumable chunked uploads. A client creates an upload with the total
+size (and optionally the SHA-256 of the whole file), then sends the bytes
+in any number of PATCH requests carrying the current `Upload-Offset`.
+Each chunk is first read from the request into a temporary file, hashed
+and size-checked as it arrives, and only then appended to the file's
+final location under a short row lock, so a slow client never holds a
+transaction open. After a disconnect the client asks for the current
+offset and carries on from there. Completing the upload points the
+target's FileField at the written file. Uploads left unfinished for
+EXPIRE_AFTER seconds are removed by the expire_chunked_uploads command.
+'''
+
+DEFAULTS = {
+  'MAX_SIZE': 2 * 1024 ** 3,
+  'MAX_CHUNK_SIZE': 16 * 1024 ** 2,
+  'READ_SIZE': 64 * 1024,
+  'EXPIRE_AFTER': 60 * 60 * 24,
+  'MAX_HASHERS': 256,
+}
+
+FIELD_MODELS = {
+  ChunkedUpload.ASSIGNMENT: Assignment,
+  ChunkedUpload.REFERENCE_MATERIAL: ReferenceMaterial,
+  ChunkedUpload.SUBMISSION: AssignmentSubmission,
+}
+
+
+class UploadError(Exception):
+  def __init__(self, message, status_code):
+    super().__init__(message)
+    self.message = message
+    self.status_code = status_code
+
+
+def upload_options():
+  return dict(DEFAULTS, **getattr(settings, 'CHUNKED_UPLOADS', {}))
+
+
+'''
+Running SHA-256 state per upload, kept in-process between chunks for the
+MAX_HASHERS most recently written uploads. When a chunk lands in another
+worker, after a restart or once the state has been evicted, it is rebuilt
+once from the bytes already on disk.
+'''
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def _hasher_for(upload):
+  with _hashers_lock:
+    offset, hasher = _hashers.pop(upload.pk, (None, None))
+  if offset == upload.offset:
+    return hasher
+
+  hasher = hashlib.sha256()
+  read_size = upload_options()['READ_SIZE']
+  with open(default_storage.path(upload.path), 'rb') as partial:
+    remaining = upload.offset
+    while remaining:
+      data = partial.read(min(read_size, remaining))
+      if not data:
+        break
+      hasher.update(data)
+      remaining -= len(data)
+  return hasher
+
+
+def _remember_hasher(upload, hasher):
+  with _hashers_lock:
+    _hashers[upload.pk] = (upload.offset, hasher)
+    while len(_hashers) > upload_options()['MAX_HASHERS']:
+      _hashers.popitem(last=False)
+
+
+def _forget_hasher(upload_id):
+  with _hashers_lock:
+    _hashers.pop(upload_id, None)
+
+
+def _target_instance(upload, user=None):
+  if upload.target == ChunkedUpload.SUBMISSION:
+    assignment = Assignment.objects.get(id=upload.object_id, classroom_id=upload.classroom_id)
+    instance = AssignmentSubmission.objects.filter(assignment_id=assignment, student_id=upload.owner_id).first()
+    return instance or AssignmentSubmission(assignment_id=assignment, student_id_id=upload.owner_id)
+  return FIELD_MODELS[upload.target].objects.get(id=upload.object_id, classroom_id=upload.classroom_id)
+
+
+def start_upload(classroom, owner, target, object_id, filename, size, sha256=''):
+  """ Reserves the final file name and returns a new ChunkedUpload. """
+  if size > upload_options()['MAX_SIZE']:
+    raise UploadError(_('The file exceeds the maximum upload size.'), 413)
+
+  upload = ChunkedUpload(
+    owner=owner, classroom=classroom, target=target, object_id=object_id,
+    filename=os.path.basename(filename), size=size, sha256=sha256.lower(),
+  )
+  try:
+    instance = _target_instance(upload)
+  except (Assignment.DoesNotExist, ReferenceMaterial.DoesNotExist):
+    raise UploadError(_('The upload target does not exist.'), 404)
+
+  name = instance.file.field.generate_filename(instance, upload.filename)
+  upload.path = default_storage.save(name, ContentFile(b''))
+  upload.save()
+  return upload
+
+
+def _check_chunk(upload, offset, length):
+  if upload.completed:
+    raise UploadError(_('The upload has already been completed.'), 409)
+  if offset != upload.offset:
+    raise UploadError(_('Upload-Offset does not match the current offset.'), 409)
+  if upload.offset + length > upload.size:
+    raise UploadError(_('The chunk goes past the declared file size.'), 413)
+
+
+def _spool_chunk(stream, length, chunk_sha256):
+  """ Reads up to `length` bytes into a temporary file. Returns (file, bytes read). """
+  read_size = upload_options()['READ_SIZE']
+  spool = tempfile.TemporaryFile()
+  chunk_hasher = hashlib.sha256()
+  read = 0
+  try:
+    while read < length:
+      data = stream.read(min(read_size, length - read))
+      if not data:
+        break
+      spool.write(data)
+      chunk_hasher.update(data)
+      read += len(data)
+    if chunk_sha256 and chunk_hasher.hexdigest() != chunk_sha256.lower():
+      raise UploadError(_('The chunk checksum does not match.'), 400)
+  except BaseException:
+    spool.close()
+    raise
+  spool.seek(0)
+  return spool, read
+
+
+def write_chunk(upload, offset, stream, length, chunk_sha256=None):
+  """
+  Appends `length` bytes read from `stream` at `offset`. The chunk is read
+  (and its checksum verified) before the row is locked; the lock is only
+  held while the spooled bytes are copied into place, so two clients
+  still cannot write the same range.
+  """
+  options = upload_options()
+  if length > options['MAX_CHUNK_SIZE']:
+    raise UploadError(_('The chunk is too large.'), 413)
+  # Refuse a chunk that cannot apply before reading any of it.
+  _check_chunk(upload, offset, length)
+
+  spool, read = _spool_chunk(stream, length, chunk_sha256)
+  with spool, transaction.atomic():
+    try:
+      upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+    except ChunkedUpload.DoesNotExist:
+      raise UploadError(_('The upload has expired.'), 404)
+    _check_chunk(upload, offset, read)
+
+    hasher = _hasher_for(upload)
+    with open(default_storage.path(upload.path), 'r+b') as destination:
+      destination.seek(upload.offset)
+      while True:
+        data = spool.read(options['READ_SIZE'])
+        if not data:
+          break
+        destination.write(data)
+        hasher.update(data)
+      destination.truncate(upload.offset + read)
+
+    # Only bytes that reached the server count, so an interrupted request
+    # leaves the upload resumable from wherever it stopped.
+    upload.offset += read
+    upload.save(update_fields=['offset', 'updated'])
+    _remember_hasher(upload, hasher)
+  return upload
+
+
+def complete_upload(upload):
+  """ Verifies the finished file and attaches it to the upload's target. """
+  with transaction.atomic():
+    upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+    if upload.completed:
+      raise UploadError(_('The upload has already been completed.'), 409)
+    if upload.offset != upload.size:
+      raise UploadError(_('The upload is missing data.'), 409)
+    digest = _hasher_for(upload).hexdigest()
+    if upload.sha256 and digest != upload.sha256:
+      raise UploadError(_('The file checksum does not match.'), 400)
+
+    try:
+      instance = _target_instance(upload)
+    except (Assignment.DoesNotExist, ReferenceMaterial.DoesNotExist):
+      raise UploadError(_('The upload target does not exist.'), 404)
+    # The bytes are already in place, so only the stored name changes.
+    instance.file.name = upload.path
+    instance.save()
+    if hasattr(instance.file.storage, 'deduplicate'):
+      instance.file.storage.deduplicate(upload.path, digest)
+
+    upload.completed = True
+    upload.save(update_fields=['completed', 'updated'])
+
+  _forget_hasher(upload.pk)
+  return instance
+
+
+def expire_uploads(max_age=None):
+  """
+  Deletes uploads nobody has written to for `max_age` seconds (EXPIRE_AFTER
+  by default): unfinished ones together with their partial files, finished
+  ones only as rows, since their file now belongs to the target. Rows that
+  are being written to right now are skipped. Returns how many went.
+  """
+  if max_age is None:
+    max_age = upload_options()['EXPIRE_AFTER']
+  cutoff = timezone.now() - timedelta(seconds=max_age)
+  with transaction.atomic():
+    stale = list(
+      ChunkedUpload.objects.select_for_update(skip_locked=True)
+      .filter(updated__lt=cutoff).values_list('pk', 'path', 'completed')
+    )
+    ChunkedUpload.objects.filter(pk__in=[pk for pk, _path, _completed in stale]).delete()
+    partial = [path for _pk, path, completed in stale if not completed and path]
+    transaction.on_commit(lambda: [default_storage.delete(path) for path in partial])
+  for pk, _path, _completed in stale:
+    _forget_hasher(pk)
+  return len(stale)
@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from classroom.models import ClassroomVersion
+
+'''
+Per-classroom version counter for conditional GETs. Any write to a
+classroom's assignments, reference materials, students, join requests or
+quizzes moves it (see the signal handlers), so list endpoints can build
+their ETag from it and answer If-None-Match with a single primary-key
+lookup instead of the list query; cached memberships are keyed on it too
+(see classroom.membership). The counter is a database row bumped in
+the writer's own transaction, so every process sees the same version and
+it commits (or rolls back) together with the change it stands for.
+
+The same row carries the classroom's gradebook generation, which moves
+with every grade, enrollment and assignment change instead (see
+classroom.gradebook); it is bumped the same way.
+
+Bulk operations run under `deferred_bumps()`: the per-row signal handlers
+then only note the classroom, and each noted classroom's row is updated
+once when the block ends, so the cost of a bulk write does not grow with
+its rows and writers hold the row lock for a single statement.
+'''
+
+_deferred = threading.local()
+
+VERSION = 'version'
+GRADEBOOK = 'gradebook'
+
+
+def _counter(classroom_id, field):
+  value = ClassroomVersion.objects.filter(pk=classroom_id).values_list(field, flat=True).first()
+  return value or 0
+
+
+def classroom_version(classroom_id):
+  return _counter(classroom_id, VERSION)
+
+
+def gradebook_generation(classroom_id):
+  """ A counter that moves on every change to the classroom's grades, students or assignments. """
+  return _counter(classroom_id, GRADEBOOK)
+
+
+def with_versions(classrooms):
+  """ Annotates a Classroom queryset with each row's `version`, read in the same query. """
+  version = ClassroomVersion.objects.filter(pk=OuterRef('pk')).values(VERSION)[:1]
+  return classrooms.annotate(version=Coalesce(Subquery(version), 0))
+
+
+def current_version(classroom):
+  """ The version annotated by with_versions(), or read now when the row was loaded without it. """
+  version = getattr(classroom, 'version', None)
+  return classroom_version(classroom.pk) if version is None else version
+
+
+def _bump(classroom_id, fields, callbacks=()):
+  """ Moves `fields` of the classroom's row by one; `callbacks` get the new gradebook generation. """
+  versions = ClassroomVersion.objects.filter(pk=classroom_id)
+  increments = {field: F(field) + 1 for field in fields}
+  if not versions.update(**increments):
+    _row, created = ClassroomVersion.objects.get_or_create(
+      classroom_id=classroom_id, defaults={field: 1 for field in fields}
+    )
+    if not created:
+      versions.update(**increments)
+  if callbacks:
+    # The row stays locked by this transaction, so no other writer can have moved it since.
+    generation = versions.values_list(GRADEBOOK, flat=True).get()
+    for callback in callbacks:
+      callback(generation)
+
+
+def _request(classroom_id, field, callback=None):
+  pending = getattr(_deferred, 'pending', None)
+  if pending is None:
+    _bump(classroom_id, (field, ), [callback] if callback else ())
+    return
+  fields, callbacks = pending.setdefault(classroom_id, (set(), []))
+  fields.add(field)
+  if callback:
+    callbacks.append(callback)
+
+
+def bump_classroom_version(classroom_id):
+  """ Moves the classroom's version as part of the current transaction. """
+  _request(classroom_id, VERSION)
+
+
+def bump_gradebook_generation(classroom_id, then):
+  """
+  Moves the classroom's gradebook generation as part of the current
+  transaction and calls `then(generation)` with its new value.
+  """
+  _request(classroom_id, GRADEBOOK, then)
+
+
+@contextmanager
+def deferred_bumps():
+  """
+  Collects the bumps of a bulk operation and moves each classroom's
+  counters once on leaving the block. Use inside the operation's
+  transaction; nested blocks join the outermost one.
+  """
+  if getattr(_deferred, 'pending', None) is not None:
+    yield
+    return
+  _deferred.pending = {}
+  try:
+    yield
+    pending = _deferred.pending
+  finally:
+    _deferred.pending = None
+  for classroom_id in sorted(pending, key=str):
+    fields, callbacks = pending[classroom_id]
+    _bump(classroom_id, fields, callbacks)
@@ -100,6 +100,54 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs on a dedicated pool (see accounts.hashing): WORKERS
+# hashes at a time, up to QUEUE_SIZE waiting, further requests get a 503.
+# Keep QUEUE_SIZE small (a couple of hashes per worker): every waiting
+# login holds a request worker. `manage.py benchmark_logins` reports the
+# login p99 with other traffic running in parallel.
+
+PASSWORD_HASHING = {
+    'WORKERS': 4,
+    'QUEUE_SIZE': 8,
+    'TIMEOUT': 10,
+    'RETRY_AFTER': 1,
+}
+
+# Last-seen timestamps are buffered per process and written to
+# User.last_login in one bulk UPDATE every FLUSH_INTERVAL seconds
+# (see accounts.activity).
+
+USER_ACTIVITY = {
+    'FLUSH_INTERVAL': 60,
+    'RESOLUTION': 30,
+    'ACTIVE_WINDOW': 300,
+    'BATCH_SIZE': 500,
+}
+
+# Size of the in-process pool used by background.run_in_background.
+
+BACKGROUND_WORKERS = 2
+
+# Square avatar thumbnails generated in the background (see accounts.avatars).
+
+AVATAR_VARIANTS = {
+    'SIZES': (32, 64, 256),
+    'FORMAT': 'JPEG',
+    'QUALITY': 85,
+}
+
+# Resumable chunked uploads for assignment, reference material and
+# submission files (see classroom.uploads). Sizes are in bytes; uploads
+# idle for EXPIRE_AFTER seconds are removed by expire_chunked_uploads.
+
+CHUNKED_UPLOADS = {
+    'MAX_SIZE': 2 * 1024 ** 3,
+    'MAX_CHUNK_SIZE': 16 * 1024 ** 2,
+    'READ_SIZE': 64 * 1024,
+    'EXPIRE_AFTER': 60 * 60 * 24,
+    'MAX_HASHERS': 256,
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -121,12 +169,47 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# `auth_tokens` holds verified knox tokens; entries are additionally capped by
+# each token's own expiry, so TIMEOUT can never outlive REST_KNOX['TOKEN_TTL'].
+# A hit still reads the token row, so it is safe as a per-process cache.
+# `default` also holds classroom memberships and gradebooks, keyed on the
+# database-backed counters of classroom.versions so they are never stale.
+# A shared backend (memcached, redis) is still worth it with several worker
+# processes: each would otherwise build and hold its own copies.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'auth_tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tokens',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 MEDIA_URL = '/uploads/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'uploads')
 
+# Uploaded files are served by classroom.api.views.MediaFileAPIView after a
+# permission check. Set MODE to 'nginx' (X-Accel-Redirect to an `internal`
+# location at INTERNAL_PREFIX aliased to MEDIA_ROOT) or 'sendfile'
+# (X-Sendfile) to hand the transfer to the front server; with MODE None
+# Django streams the file itself.
+MEDIA_ACCEL = {
+    'MODE': None,
+    'INTERNAL_PREFIX': '/protected-uploads/',
+}
+
 AUTH_USER_MODEL = 'accounts.User'
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('knox.auth.TokenAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('accounts.api.authentication.CachedTokenAuthentication',),
 }
 
 from datetime import timedelta
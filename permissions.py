@@ -20,6 +20,14 @@ class EitherTeachesorAttends(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return 
 
+'''
+Custom permission restricting a view to superusers,
+e.g. for roster imports.
+'''
+class IsSuperUser(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_superuser
+
 class IsStudent(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user.is_student
@@ -4,6 +4,7 @@ from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.http import HttpResponse, Http404
+from django.shortcuts import get_object_or_404
 
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
@@ -25,12 +26,13 @@ from .serializers import (
 )
 
 from accounts.models import User
-from classroom.models import Classroom
+from classroom.membership import attends, teaches
+from classroom.api.mixins import ClassroomMixin, VersionedListMixin
 
 def hasClassroomPermission(user, classroom):
     if user.is_student:
-        return classroom.students.filter(student_id=user).exists()
-    return classroom.teacher_id.id == user.id
+        return attends(user, classroom)
+    return teaches(user, classroom)
 
 def ownsQuiz(user, quiz):
     return user.id == quiz.owner.id
@@ -41,15 +43,18 @@ def unauthorizedRequest():
     }, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class QuizListCreateAPIView(generics.GenericAPIView):
+class QuizListCreateAPIView(VersionedListMixin, generics.GenericAPIView):
     permission_classes = (permissions.IsAuthenticated, )
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id__exact=self.kwargs.get('classroom'))
+        classroom = self.get_classroom()
 
         if not hasClassroomPermission(user, classroom):
             return unauthorizedRequest()
+        not_modified = self.not_modified()
+        if not_modified:
+            return not_modified
 
         quizzes = classroom.quizzes.all()
 
@@ -60,7 +65,7 @@ class QuizListCreateAPIView(generics.GenericAPIView):
 
     def post(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id__exact=self.kwargs.get('classroom'))
+        classroom = self.get_classroom()
 
         if not hasClassroomPermission(user, classroom) or user.is_student:
             return unauthorizedRequest()
@@ -105,13 +110,13 @@ class QuizListCreateAPIView(generics.GenericAPIView):
             'quiz': QuizSerializer(quiz_instance, context=self.get_serializer_context()).data
         }, status=status.HTTP_201_CREATED)
 
-class QuizUpdateRetriveAPIView(generics.GenericAPIView):
+class QuizUpdateRetriveAPIView(ClassroomMixin, generics.GenericAPIView):
     permission_classes = (permissions.IsAuthenticated, )
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id__exact = kwargs.get('classroom'))
-        quiz = Quiz.objects.get(id__exact = kwargs.get('pk'))
+        classroom = self.get_classroom()
+        quiz = get_object_or_404(classroom.quizzes, id=self.kwargs.get('pk'))
         print(quiz.classroom)
         if not hasClassroomPermission(user, classroom):
             return unauthorizedRequest()
@@ -138,8 +143,8 @@ class QuizUpdateRetriveAPIView(generics.GenericAPIView):
 
     def patch(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id_exact=kwargs.get('classroom'))
-        quiz = Quiz.objects.get(id_exact=kwargs.get('pk'))
+        classroom = self.get_classroom()
+        quiz = get_object_or_404(classroom.quizzes, id=self.kwargs.get('pk'))
 
         if not hasClassroomPermission(user, classroom) or not ownsQuiz(user, quiz):
             return unauthorizedRequest()
@@ -153,15 +158,15 @@ class QuizUpdateRetriveAPIView(generics.GenericAPIView):
             'quiz': QuizSerializer(instance).data
         }, status=status.HTTP_200_OK)
 
-class QuizStudentPermissionAPIView(generics.GenericAPIView):
+class QuizStudentPermissionAPIView(ClassroomMixin, generics.GenericAPIView):
     permission_classes = (permissions.IsAuthenticated, )
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id__iexact=self.kwargs.get('classroom'))
-        quiz = Quiz.objects.get(id__iexact=self.kwargs.get('pk'))
+        classroom = self.get_classroom()
+        quiz = get_object_or_404(classroom.quizzes, id=self.kwargs.get('pk'))
 
-        if not hasClassroomPermission(user, classroom) and ownsQuiz(user, quiz):
+        if not hasClassroomPermission(user, classroom) or not ownsQuiz(user, quiz):
             return unauthorizedRequest()
 
         data = quiz.permissions.all()
@@ -174,14 +179,18 @@ class QuizStudentPermissionAPIView(generics.GenericAPIView):
 
     def patch(self, request, *args, **kwargs):
         user = request.user
-        classroom = Classroom.objects.get(id__iexact=self.kwargs.get('classroom'))
-        quiz = Quiz.objects.get(id__iexact=self.kwargs.get('pk'))
+        classroom = self.get_classroom()
+        quiz = get_object_or_404(classroom.quizzes, id=self.kwargs.get('pk'))
 
-        if not hasClassroomPermission(user, classroom) and ownsQuiz(user, quiz):
+        if not hasClassroomPermission(user, classroom) or not ownsQuiz(user, quiz):
             return unauthorizedRequest()
 
         for record in request.data:
-            instance = QuizStudentPermission.objects.get(id__iexact=record.get('id'))
+            try:
+                permission_id = int(record.get('id'))
+            except (TypeError, ValueError):
+                raise Http404
+            instance = get_object_or_404(quiz.permissions, id=permission_id)
             if instance.allowed_to_attempt ^ (record.get('allowed_to_attempt') is 'True'):
                 instance.allowed_to_attempt = not instance.allowed_to_attempt
                 instance.save()
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from classroom.versions import bump_classroom_version
+from quiz.models import Quiz
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def bump_version(sender, instance, **kwargs):
+    bump_classroom_version(instance.classroom_id)
@@ -1,3 +1,48 @@
+import datetime
+import uuid
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from classroom.models import Classroom, ClassroomStudents
+from quiz.models import Quiz, QuizStudentPermission
+
+
+class QuizStudentPermissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create(username='teacher', email='teacher@example.com', is_teacher=True)
+        self.student = User.objects.create(username='student', email='student@example.com', is_student=True)
+        self.classroom = Classroom.objects.create(id=uuid.uuid4(), room_number=1, course_name='Course', teacher_id=self.teacher)
+        ClassroomStudents.objects.create(classroom_id=self.classroom, student_id=self.student)
+        self.quiz = Quiz.objects.create(
+            classroom=self.classroom, owner=self.teacher, name='Quiz', duration=datetime.timedelta(minutes=30),
+            start_time=timezone.now(), end_time=timezone.now() + datetime.timedelta(days=1), max_attempts=1,
+        )
+        self.permission = QuizStudentPermission.objects.create(quiz=self.quiz, student=self.student)
+        self.url = '/classrooms/{}/quizzes/{}/permissions'.format(self.classroom.id, self.quiz.id)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_permissions_are_looked_up_within_the_quiz(self):
+        other_quiz = Quiz.objects.create(
+            classroom=self.classroom, owner=self.teacher, name='Other', duration=datetime.timedelta(minutes=30),
+            start_time=timezone.now(), end_time=timezone.now(), max_attempts=1,
+        )
+        other = QuizStudentPermission.objects.create(quiz=other_quiz, student=self.student)
+        client = self.client_for(self.teacher)
+
+        for record in ({'id': other.id}, {'id': 'abc'}, {'id': None}):
+            response = client.patch(self.url, [dict(record, allowed_to_attempt=True)], format='json')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(client.patch(self.url, [{'id': self.permission.id}], format='json').status_code, 200)
 
-# Create your tests here.
+    def test_only_the_quiz_owner_may_change_permissions(self):
+        response = self.client_for(self.student).patch(self.url, [{'id': self.permission.id}], format='json')
+        self.assertEqual(response.status_code, 401)